@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Sustitutos de mysql, mysqldump y mysqlbinlog para el banco de pruebas.
+
+Responden a las consultas y opciones que usa el sistema de backup con datos
+sintéticos deterministas (ver synth.py), sin servidor MySQL. El estado del
+servidor falso (tamaño del volcado, binlog escrito, ritmo de crecimiento) se
+lee del JSON indicado en HELEN_FAKE_STATE.
+
+Uso: python fake_mysql.py <mysql|mysqldump|mysqlbinlog> [opciones...]
+(run_bench.py crea en una carpeta bin/ los ejecutables con esos nombres).
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synth  # noqa: E402
+
+# —————— CONFIGURACIÓN DE LAS HERRAMIENTAS FALSAS ——————
+VALUE_OPTIONS = ('-h', '-P', '-u', '-e', '-D')  # ← opciones cortas con el valor en el argumento siguiente
+SESSION_PARSE_LIMIT = 64 * 1024                  # ← sentencias más largas se consumen sin interpretar
+BATCH_UNITS     = 512                            # ← transacciones de binlog generadas por bloque
+POLL_INTERVAL   = 0.05
+# ——————————————————————————
+
+
+def parse_args(argv):
+    """Separar opciones y argumentos posicionales"""
+    options, positional = {}, []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg in VALUE_OPTIONS:
+            options[arg] = argv[i + 1]
+            i += 2
+            continue
+        if arg.startswith('--') and '=' in arg:
+            key, value = arg.split('=', 1)
+            options[key] = value
+        elif arg.startswith('-'):
+            options[arg] = True
+        else:
+            positional.append(arg)
+        i += 1
+    return options, positional
+
+
+# —————————————— mysql ——————————————
+
+class SqlError(Exception):
+    """Error que el servidor devolvería para una sentencia"""
+
+    def __init__(self, code, sqlstate, message):
+        super().__init__(f"ERROR {code} ({sqlstate})", message)
+        self.code = code
+        self.text = f"ERROR {code} ({sqlstate})"
+        self.message = message
+
+
+def _check(state, sql):
+    """Errores del servidor falso: conexión cortada, variables que no tiene, columnas sin tabla"""
+    if state['lost_on'] and state['lost_on'] in sql:
+        raise SqlError(2013, 'HY000', "Lost connection to MySQL server during query")
+    variable = re.match(r"(?:SET\s+(?:SESSION\s+|GLOBAL\s+)?|SELECT\s+@@(?:SESSION\.|GLOBAL\.)?)(\w+)", sql, re.I)
+    if variable and variable.group(1).lower() in state['unknown_variables']:
+        raise SqlError(1193, 'HY000', f"Unknown system variable '{variable.group(1)}'")
+    column = re.fullmatch(r"SELECT\s+([A-Za-z_]\w*)", sql, re.I)
+    if column and column.group(1).upper() != 'NULL':
+        raise SqlError(1054, '42S22', f"Unknown column '{column.group(1)}' in 'field list'")
+
+
+def _rows(state, sql):
+    """Filas (como tuplas) de una consulta; None si la sentencia no devuelve resultado"""
+    _check(state, sql)
+    upper = sql.upper()
+    names = synth.table_names(state)
+    if upper.startswith(('SHOW MASTER STATUS', 'SHOW BINARY LOG STATUS')):
+        name, size = synth.binary_logs(state)[-1]
+        return [(name, size, '', '', '')]
+    if upper.startswith('SHOW VARIABLES LIKE'):
+        name = sql.split("'")[1]
+        return [] if name.lower() in state['unknown_variables'] else [(name, '0')]
+    if upper.startswith('SHOW GLOBAL STATUS'):
+        return [('Threads_running', state['threads_running']),
+                ('Innodb_rows_read', int(state['rows_read_rate'] * time.time()))]
+    if 'REPLICATION_APPLIER_STATUS_BY_WORKER' in upper:
+        return [(state['replica_lag'],)]
+    if upper.startswith('SHOW BINARY LOGS'):
+        return [(name, size, 'No') for name, size in synth.binary_logs(state)]
+    if 'SUM(DATA_LENGTH)' in upper:
+        return [(int(state['dump_mb'] * 1024**2),)]
+    if 'UPDATE_TIME, CREATE_TIME' in upper:
+        return [(name, '2023-11-14 00:00:00', '2023-01-01 00:00:00') for name in names]
+    if 'INFORMATION_SCHEMA.KEY_COLUMN_USAGE' in upper:
+        return [(name, 'id', 'int', 1) for name in names]
+    if upper.startswith('SELECT MIN('):
+        name = sql.rsplit('.', 1)[-1].strip().strip('`')
+        return [(1, synth.table_rows(state, names.index(name)))]
+    if 'INFORMATION_SCHEMA.TABLES' in upper:
+        return [(name, 'BASE TABLE', synth.table_size(state, i), synth.table_rows(state, i))
+                for i, name in enumerate(names)]
+    if 'INFORMATION_SCHEMA.TRIGGERS' in upper:
+        return [(names[0], f"trg_{names[0]}", 'BEFORE', 'INSERT', "SET NEW.nombre = CONCAT(NEW.nombre, ';')")]
+    if upper.startswith('SHOW CREATE TABLE'):
+        name = sql.rsplit('.', 1)[-1].strip().strip('`')
+        return [(name, synth.create_statement(state, name))]
+    if upper.startswith('CHECKSUM TABLE'):
+        return [(f"{state['db']}.{name}", 1000 + i) for i, name in enumerate(names)]
+    if upper.startswith('SELECT NOW()'):
+        return [(time.strftime('%Y-%m-%d %H:%M:%S'),)]
+    if upper.startswith('SELECT NULL'):
+        return [(None,)]
+    if upper.startswith('SELECT'):
+        match = re.match(r"SELECT\s+'((?:[^'\\]|\\.|'')*)'", sql, re.I | re.S)
+        return [(_unquote(match.group(1)) if match else 1,)]
+    return None     # SET, FLUSH, UNLOCK, CREATE DATABASE...: se aceptan sin más
+
+
+def _log(state, text):
+    """Apuntar en query_log lo que recibe el servidor falso (sentencias e invocaciones de mysqldump)"""
+    if state['query_log']:
+        with open(state['query_log'], 'a', encoding='utf-8') as f:
+            f.write(text.replace('\n', ' ') + '\n')
+
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0'}
+
+
+def _unquote(text):
+    """Contenido de un literal de cadena SQL ('' y escapes con barra invertida)"""
+    text = text.replace("''", "'")
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), m.group(1)), text, flags=re.S)
+
+
+def _xml(text):
+    for char, entity in (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ('\0', '&#0;')):
+        text = text.replace(char, entity)
+    return text
+
+
+def _xml_resultset(sql, rows):
+    """Resultado en el formato de mysql -X"""
+    out = ['<?xml version="1.0"?>\n\n<resultset statement="', _xml(sql), '\n"',
+           ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">']
+    for row in rows:
+        out.append("\n  <row>\n")
+        for i, value in enumerate(row):
+            if value is None:
+                out.append(f'\t<field name="c{i}" xsi:nil="true" />\n')
+            else:
+                out.append(f'\t<field name="c{i}">{_xml(str(value))}</field>\n')
+        out.append("  </row>\n")
+    out.append("</resultset>\n")
+    return "".join(out).encode('utf-8')
+
+
+def _answer(state, statement, out, header, xml=False):
+    sql = statement.strip().rstrip(';').strip()
+    if not sql:
+        return
+    _log(state, sql)
+    rows = _rows(state, sql)
+    if rows is None:
+        return
+    if xml:
+        out.write(_xml_resultset(sql, rows))
+        out.flush()
+        return
+    if header:
+        out.write(b"result\n")
+    for row in rows:
+        out.write(("\t".join(str(value) for value in row) + "\n").encode('utf-8'))
+    out.flush()
+
+
+def mysql(argv):
+    """
+    Consultas con -e o sesión por stdin (metadatos del pool o restauración).
+
+    Como el cliente real, un error sale por stderr y termina el proceso salvo
+    con --force; con la conexión cortada y --skip-reconnect cada sentencia
+    siguiente falla con "server has gone away".
+    """
+    options, _ = parse_args(argv)
+    state = synth.load_state()
+    out = sys.stdout.buffer
+    header = '-N' not in options and '--skip-column-names' not in options
+    force = '--force' in options or '-f' in options
+    xml = '-X' in options or '--xml' in options
+    if '-e' in options:
+        for statement in options['-e'].split(';'):
+            try:
+                _answer(state, statement, out, header)
+            except SqlError as e:
+                sys.stderr.write(f"{e.text} at line 1: {e.message}\n")
+                if not force:
+                    sys.exit(1)
+        return
+
+    # Las restauraciones envían GB de SQL: solo se interpretan las sentencias cortas
+    pending = []
+    pending_size = 0
+    lost = False
+    for number, line in enumerate(sys.stdin.buffer, 1):
+        if pending_size + len(line) > SESSION_PARSE_LIMIT:
+            pending, pending_size = [], 0
+            continue
+        pending.append(line)
+        pending_size += len(line)
+        if line.rstrip().endswith(b';'):
+            state = synth.load_state()      # sesión persistente del pool: el banco puede cambiar la carga
+            try:
+                if lost:
+                    raise SqlError(2006, 'HY000', "MySQL server has gone away")
+                _answer(state, b''.join(pending).decode('utf-8', 'replace'), out, header, xml)
+            except SqlError as e:
+                sys.stderr.write(f"{e.text} at line {number}: {e.message}\n")
+                sys.stderr.flush()
+                if not force:
+                    sys.exit(1)
+                lost = lost or (e.code == 2013 and '--skip-reconnect' in options)
+            pending, pending_size = [], 0
+
+
+# —————————————— mysqldump ——————————————
+
+def _key_range(where):
+    """(desde, hasta) de un --where por rangos de PK como los de parallel_dump (None = abierto)"""
+    if where is None:
+        return None
+    low = re.search(r">=\s*(\d+)", where)
+    high = re.search(r"<\s*(\d+)", where)
+    return (int(low.group(1)) if low else None, int(high.group(1)) if high else None)
+
+
+def mysqldump(argv):
+    options, positional = parse_args(argv)
+    state = synth.load_state()
+    out = sys.stdout.buffer
+    names = synth.table_names(state)
+    wanted = positional[1:] or names
+    structure = '--no-create-info' not in options and '-t' not in options
+    data = '--no-data' not in options and '-d' not in options
+    triggers = '--skip-triggers' not in options
+    _log(state, ' '.join(['mysqldump', *(arg for arg in argv if not arg.startswith('--defaults'))]))
+
+    out.write(synth.DUMP_HEADER.format(db=positional[0]).encode())
+    for name in wanted:
+        if name in names:
+            synth.dump_table(state, names.index(name), out.write, structure, data, triggers,
+                             mbps=state['dump_mbps'], where=_key_range(options.get('--where')))
+    if '--routines' in options or '-R' in options:
+        out.write(synth.ROUTINES.format(db=positional[0]).encode())
+    out.write(synth.DUMP_FOOTER.encode())
+
+
+# —————————————— mysqlbinlog ——————————————
+
+def _file_size(state, name):
+    for log_name, size in synth.binary_logs(state):
+        if log_name == name:
+            return size
+    return None
+
+
+def _remote_text(state, options, files):
+    """Salida de texto de --read-from-remote-server (con --stop-never si se pidió)"""
+    out = sys.stdout.buffer
+    database = options.get('--database')
+    skip_gtids = '--skip-gtids' in options
+    follow = '--stop-never' in options
+    stop = int(options['--stop-position']) if '--stop-position' in options else None
+    tables = {}
+    out.write(synth.TEXT_HEADER)
+
+    name = files[0]
+    position = int(options.get('--start-position', 4))
+    while True:
+        size = _file_size(state, name)
+        end = size if stop is None or follow else min(stop, size)
+        while position + synth.UNIT <= end:
+            count = min((end - position) // synth.UNIT, BATCH_UNITS)
+            events = b''.join(b''.join(synth.transaction(state, synth.file_number(name), position + k * synth.UNIT))
+                              for k in range(count))
+            out.write(synth.decode_events(events, position, tables, skip_gtids, database))
+            position += count * synth.UNIT
+
+        next_name = synth.file_name(synth.file_number(name) + 1)
+        newer = _file_size(state, next_name) is not None
+        if follow and newer:
+            out.write(synth.rotate_text(position, next_name))
+            name, position = next_name, 4
+        elif follow:
+            out.flush()
+            time.sleep(POLL_INTERVAL)
+            state = synth.load_state()      # el banco puede haber añadido binlog
+        elif name != files[-1] and newer:
+            name, position = next_name, 4
+        else:
+            break
+    out.write(synth.TEXT_FOOTER)
+
+
+def mysqlbinlog(argv):
+    options, positional = parse_args(argv)
+    state = synth.load_state()
+    if '--raw' in options:
+        # Descarga tal cual: <prefijo><archivo>
+        name = positional[0]
+        end = _file_size(state, name) or 4
+        with open(options.get('--result-file', '') + name, 'wb') as out:
+            synth.raw_binlog(state, name, int(options.get('--start-position', 4)), end, out.write)
+        return
+    if '--read-from-remote-server' in options:
+        _remote_text(state, options, positional)
+        return
+
+    # Archivo local (binlog ya filtrado por binlog_parser)
+    with open(positional[0], 'rb') as f:
+        data = f.read()
+    out = sys.stdout.buffer
+    out.write(synth.TEXT_HEADER)
+    out.write(synth.decode_events(data[4:], 4, {}, '--skip-gtids' in options))
+    out.write(synth.TEXT_FOOTER)
+
+
+TOOLS = {'mysql': mysql, 'mysqldump': mysqldump, 'mysqlbinlog': mysqlbinlog}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in TOOLS:
+        print("Uso: python fake_mysql.py <mysql|mysqldump|mysqlbinlog> [opciones...]", file=sys.stderr)
+        sys.exit(2)
+    if '--version' in sys.argv[2:] or '-V' in sys.argv[2:]:
+        print(f"{sys.argv[1]}  Ver 8.0.36-bench for Linux on x86_64 (banco de pruebas)")
+        sys.exit(0)
+    try:
+        TOOLS[sys.argv[1]](sys.argv[2:])
+    except BrokenPipeError:
+        sys.exit(1)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Banco de pruebas de rendimiento de extremo a extremo.
+
+Instala las herramientas MySQL falsas (fake_mysql.py) en una carpeta bin/,
+apunta el sistema a ellas con HELEN_MYSQL_BIN_DIR y ejecuta cada fase en su
+propio proceso:
+
+    full           backup completo (main.main sin backup previo)
+    incremental-N  se añade binlog al servidor falso y main.main lo anexa
+    nightly        NightlyProcessor._nightly_process (división, verificación y nuevo ciclo)
+    restore        restore.restore_backup del día recién procesado
+
+Por fase informa los MB de SQL producidos o aplicados, el tiempo, los MB/s, la
+CPU del proceso de backup, la CPU de las herramientas (procesos hijos) y la
+memoria máxima del proceso. Con --json se guardan los resultados y con
+--baseline se comparan con una ejecución anterior: si alguna fase baja de
+(1 - tolerancia) veces sus MB/s el banco termina con código 1.
+
+Uso: python bench/run_bench.py [--dump-mb 64] [--binlog-mb 16] [--rounds 2]
+     [--threads 4] [--compression zstd] [--repeat 3] [--json resultados.json]
+     [--baseline base.json]
+
+Solo POSIX: usa resource y scripts ejecutables sin extensión .exe.
+"""
+import argparse
+import json
+import os
+import resource
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+import synth  # noqa: E402
+
+# —————— CONFIGURACIÓN DEL BANCO ——————
+TOOLS           = ('mysql', 'mysqldump', 'mysqlbinlog')
+RESULT_PREFIX   = '@@bench '                # ← línea con el resultado de cada fase en su log
+DEFAULT_TOLERANCE = 0.15
+# ——————————————————————————
+
+
+# —————————————— Fases (proceso hijo) ——————————————
+
+def _logical_size(config):
+    """Tamaño sin comprimir del backup acumulado"""
+    import main
+    import pitr
+
+    backup_file, state_file = main.backup_paths(config)
+    return pitr.logical_end(pitr.index_path(state_file), backup_file)
+
+
+def _latest_day(config):
+    import process
+
+    daily_dir = process.create_nightly_processor(config).daily_backup_dir
+    days = [d for d in os.listdir(daily_dir)
+            if os.path.exists(os.path.join(daily_dir, d, 'backup_info.json'))]
+    return os.path.join(daily_dir, max(days)) if days else None
+
+
+def _phase_full(config):
+    import main
+
+    main.main(config)
+    return _logical_size, None
+
+
+def _phase_incremental(config):
+    import main
+
+    before = _logical_size(config)
+    main.main(config)
+    return (lambda cfg: _logical_size(cfg) - before), None
+
+
+def _phase_nightly(config):
+    import process
+
+    size = _logical_size(config)
+    previous = _latest_day(config)
+    process.create_nightly_processor(config)._nightly_process()
+    if _latest_day(config) in (None, previous):
+        raise RuntimeError("El proceso nocturno no generó la carpeta del día")
+    return (lambda cfg: size), None
+
+
+def _phase_restore(config):
+    import restore
+
+    folder = _latest_day(config)
+    if folder is None:
+        raise RuntimeError("No hay ningún día procesado que restaurar")
+    result = restore.restore_backup(folder, config)
+    return (lambda cfg: result['bytes']), result
+
+
+PHASES = {
+    'full': _phase_full,
+    'incremental': _phase_incremental,
+    'nightly': _phase_nightly,
+    'restore': _phase_restore,
+}
+
+
+def run_phase(phase, workdir):
+    """Ejecutar una fase y escribir su resultado en una línea RESULT_PREFIX"""
+    sys.path.insert(0, REPO_DIR)
+    with open(os.path.join(workdir, 'config.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    import notification
+    notification.TelegramNotifier.send = lambda self, text: None    # el banco nunca avisa por Telegram
+
+    own_before = resource.getrusage(resource.RUSAGE_SELF)
+    tools_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    measure, extra = PHASES[phase.split('-')[0]](config)
+    wall = time.perf_counter() - started
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    tools = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    rss_unit = 1 if sys.platform == 'darwin' else 1024      # ru_maxrss: bytes en macOS, KB en Linux
+    result = {
+        'phase': phase,
+        'bytes': measure(config),
+        'wall': wall,
+        'cpu': (own.ru_utime + own.ru_stime) - (own_before.ru_utime + own_before.ru_stime),
+        'tools_cpu': (tools.ru_utime + tools.ru_stime) - (tools_before.ru_utime + tools_before.ru_stime),
+        'peak_rss': own.ru_maxrss * rss_unit,
+        'extra': extra,
+    }
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+# —————————————— Orquestación (proceso padre) ——————————————
+
+def install_tools(workdir):
+    """Crear bin/mysql, bin/mysqldump y bin/mysqlbinlog apuntando a fake_mysql.py"""
+    bin_dir = os.path.join(workdir, 'bin')
+    os.makedirs(bin_dir, exist_ok=True)
+    script = os.path.join(BENCH_DIR, 'fake_mysql.py')
+    for tool in TOOLS:
+        path = os.path.join(bin_dir, tool)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'#!/bin/sh\nexec {shlex.quote(sys.executable)} {shlex.quote(script)} {tool} "$@"\n')
+        os.chmod(path, 0o755)
+    return bin_dir
+
+
+def spawn(phase, workdir, env):
+    """Lanzar una fase en un proceso nuevo; su salida va a <workdir>/logs/<fase>.log"""
+    log_dir = os.path.join(workdir, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"{phase}.log")
+    print(f"⏱️ {phase}...", flush=True)
+    with open(log_path, 'w', encoding='utf-8') as log:
+        code = subprocess.call([sys.executable, os.path.abspath(__file__), '--phase', phase, '--workdir', workdir],
+                               stdout=log, stderr=subprocess.STDOUT, env=env, cwd=workdir)
+    with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+        lines = f.read().splitlines()
+    results = [line[len(RESULT_PREFIX):] for line in lines if line.startswith(RESULT_PREFIX)]
+    if code != 0 or not results:
+        print(f"❌ La fase {phase} falló (código {code}). Últimas líneas de {log_path}:", file=sys.stderr)
+        for line in lines[-20:]:
+            print(f"   {line}", file=sys.stderr)
+        sys.exit(1)
+    return json.loads(results[-1])
+
+
+def report(results):
+    print(f"\n{'fase':<15}{'MB':>10}{'s':>9}{'MB/s':>9}{'CPU s':>9}{'herr. s':>9}{'RSS MB':>9}")
+    for r in results:
+        mb = r['bytes'] / 1024**2
+        print(f"{r['phase']:<15}{mb:>10.1f}{r['wall']:>9.2f}{mb / max(r['wall'], 1e-9):>9.1f}"
+              f"{r['cpu']:>9.2f}{r['tools_cpu']:>9.2f}{r['peak_rss'] / 1024**2:>9.1f}")
+
+
+def compare(results, baseline_path, tolerance):
+    """Fases más lentas que la línea base (MB/s por debajo de la tolerancia)"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {r['phase']: r for r in json.load(f)['results']}
+    slower = []
+    for r in results:
+        base = baseline.get(r['phase'])
+        if not base or not base['bytes'] or not r['bytes']:
+            continue
+        now_rate = r['bytes'] / max(r['wall'], 1e-9)
+        base_rate = base['bytes'] / max(base['wall'], 1e-9)
+        change = now_rate / base_rate - 1
+        mark = '⚠️' if change < -tolerance else '✅'
+        print(f"{mark} {r['phase']}: {now_rate / 1024**2:.1f} MB/s frente a {base_rate / 1024**2:.1f} ({change:+.0%})")
+        if change < -tolerance:
+            slower.append(r['phase'])
+    return slower
+
+
+def run_once(args, attempt):
+    """Una pasada completa de todas las fases en una carpeta de trabajo nueva"""
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='helen_bench_'))
+    if args.workdir and args.repeat > 1:
+        workdir = os.path.join(workdir, f"run{attempt + 1}")
+    os.makedirs(workdir, exist_ok=True)
+    state_file = os.path.join(workdir, 'fake_state.json')
+    state = dict(synth.DEFAULTS, tables=args.tables, dump_mb=args.dump_mb, dump_mbps=args.dump_mbps)
+    synth.save_state(state, state_file)
+
+    config = {
+        'HOST': '127.0.0.1',
+        'PORT': 3306,
+        'USER': 'bench',
+        'PASSWORD': '',
+        'DB_NAME': state['db'],
+        'BACKUP_DIR': os.path.join(workdir, 'backup'),
+        'DUMP_THREADS': args.threads,
+        'RESTORE_THREADS': args.threads,
+        'COMPRESSION': args.compression,
+        'MAX_FILE_SIZE_GB': args.part_gb,
+        'DB_CLIENT': 'cli',                 # todo pasa por las herramientas falsas, también sin PyMySQL
+    }
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    with open(os.path.join(workdir, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+    env = dict(os.environ, HELEN_MYSQL_BIN_DIR=install_tools(workdir), HELEN_FAKE_STATE=state_file)
+    print(f"🧪 Banco en {workdir}: volcado de {args.dump_mb:g} MB, {args.rounds} × {args.binlog_mb:g} MB de binlog")
+
+    results = [spawn('full', workdir, env)]
+    for n in range(1, args.rounds + 1):
+        state['binlog_bytes'] += int(args.binlog_mb * 1024**2)
+        synth.save_state(state, state_file)
+        results.append(spawn(f'incremental-{n}', workdir, env))
+    results.append(spawn('nightly', workdir, env))
+    results.append(spawn('restore', workdir, env))
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento de HelenBackup")
+    parser.add_argument('--dump-mb', type=float, default=64, help="tamaño del volcado completo")
+    parser.add_argument('--tables', type=int, default=8)
+    parser.add_argument('--dump-mbps', type=float, default=0, help="velocidad máxima de mysqldump (0 = sin límite)")
+    parser.add_argument('--binlog-mb', type=float, default=16, help="binlog añadido antes de cada incremental")
+    parser.add_argument('--rounds', type=int, default=2, help="rondas de incremental")
+    parser.add_argument('--threads', type=int, default=4, help="DUMP_THREADS y RESTORE_THREADS")
+    parser.add_argument('--compression', choices=('gzip', 'zstd'), default=None)
+    parser.add_argument('--part-gb', type=float, default=0.02, help="MAX_FILE_SIZE_GB del proceso nocturno")
+    parser.add_argument('--config', default=None, help="JSON con claves de configuración adicionales")
+    parser.add_argument('--workdir', default=None, help="carpeta de trabajo (se conserva)")
+    parser.add_argument('--json', default=None, help="guardar los resultados en este archivo")
+    parser.add_argument('--baseline', default=None, help="resultados anteriores con los que comparar")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--repeat', type=int, default=1, help="repeticiones; se toma la mejor de cada fase")
+    parser.add_argument('--phase', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        run_phase(args.phase, args.workdir)
+        return
+
+    results = None
+    for attempt in range(args.repeat):
+        run = run_once(args, attempt)
+        # Con varias repeticiones se queda la mejor de cada fase (menos ruido)
+        results = run if results is None else [min(a, b, key=lambda r: r['wall']) for a, b in zip(results, run)]
+    report(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+    slower = compare(results, args.baseline, args.tolerance) if args.baseline else []
+    if slower:
+        print(f"❌ Regresión de rendimiento en: {', '.join(slower)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
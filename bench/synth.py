@@ -0,0 +1,422 @@
+"""
+Datos sintéticos deterministas para las herramientas MySQL falsas del banco de pruebas.
+
+Genera el volcado de mysqldump, los binlogs binarios (formato v4 con CRC32,
+como los lee binlog_parser) y su traducción a texto tal y como la escribe
+mysqlbinlog. Todo depende solo de la configuración y de la posición, así que
+dos ejecuciones con los mismos parámetros producen los mismos bytes.
+"""
+import base64
+import json
+import os
+import struct
+import time
+import zlib
+
+# —————— CONFIGURACIÓN DE LOS DATOS SINTÉTICOS ——————
+STATE_ENV       = 'HELEN_FAKE_STATE'        # ← variable con la ruta del estado del servidor falso
+DEFAULTS        = {
+    'db': 'helensystem_data',
+    'tables': 8,                            # ← tablas de la base de datos
+    'dump_mb': 64,                          # ← tamaño total del volcado (tablas con tamaños desiguales)
+    'rows_per_insert': 200,
+    'dump_mbps': 0,                         # ← límite de velocidad de mysqldump (0 = sin límite)
+    'binlog_bytes': 0,                      # ← binlog ya escrito al arrancar
+    'rate': 0,                              # ← crecimiento del binlog en bytes/s (para --stop-never)
+    'rotate': 64 * 1024**2,                 # ← tamaño de cada archivo de binlog
+    'other_schemas': 2,                     # ← transacciones de otras BD por cada una de la nuestra
+    'epoch': 0,
+    'threads_running': 1,                   # ← carga simulada para el throttle (SHOW GLOBAL STATUS)
+    'rows_read_rate': 0,                    # ← Innodb_rows_read por segundo
+    'replica_lag': 0,                       # ← segundos de retraso de réplica
+    'unknown_variables': [],                # ← variables de sistema que el servidor no tiene (MySQL 5.7, MariaDB)
+    'lost_on': None,                        # ← texto de una sentencia con la que el servidor corta la conexión
+    'query_log': None,                      # ← archivo donde mysql apunta cada sentencia recibida (pruebas)
+}
+UNIT            = 600                       # ← bytes de binlog por transacción sintética
+BASE_TIME       = 1700000000                # ← hora del primer evento
+BYTES_PER_SEC   = 2000                      # ← avance de la hora de los eventos con la posición
+DDL_EVERY       = 97                        # ← una de cada tantas transacciones es un ALTER
+# ——————————————————————————
+
+
+def load_state(path=None):
+    """Estado del servidor falso (configuración más posición del binlog)"""
+    path = path or os.environ.get(STATE_ENV)
+    state = dict(DEFAULTS)
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            state.update(json.load(f))
+    return state
+
+
+def save_state(state, path=None):
+    path = path or os.environ[STATE_ENV]
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+# —————————————— Volcado ——————————————
+
+def table_names(state):
+    return [f"tabla_{i:02d}" for i in range(state['tables'])]
+
+
+def table_size(state, i):
+    """Bytes de INSERT de la tabla i: crecen con el índice como en una BD real"""
+    weights = [(j + 1) ** 2 for j in range(state['tables'])]
+    return int(state['dump_mb'] * 1024**2) * weights[i] // sum(weights)
+
+
+def table_rows(state, i):
+    return max(table_size(state, i) // 60, 1)
+
+
+DUMP_HEADER = """-- MySQL dump 10.13  Distrib 8.0.36, for Linux (x86_64)
+--
+-- Host: localhost    Database: {db}
+-- ------------------------------------------------------
+-- Server version\t8.0.36
+
+/*!40101 SET @OLD_CHARACTER_SET_CLIENT=@@CHARACTER_SET_CLIENT */;
+/*!50503 SET NAMES utf8mb4 */;
+/*!40103 SET @OLD_TIME_ZONE=@@TIME_ZONE */;
+/*!40103 SET TIME_ZONE='+00:00' */;
+/*!40014 SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0 */;
+/*!40014 SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0 */;
+"""
+
+DUMP_FOOTER = """/*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
+
+/*!40014 SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS */;
+/*!40014 SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS */;
+/*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;
+
+-- Dump completed on 2023-11-14 22:13:20
+"""
+
+TABLE_DDL = """
+--
+-- Table structure for table `{t}`
+--
+
+DROP TABLE IF EXISTS `{t}`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `{t}` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `nombre` varchar(200) DEFAULT NULL,
+  `valor` decimal(10,2) DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_nombre` (`nombre`)
+) ENGINE=InnoDB AUTO_INCREMENT={ai} DEFAULT CHARSET=utf8mb4;
+/*!40101 SET character_set_client = @saved_cs_client */;
+"""
+
+TABLE_DATA = """
+--
+-- Dumping data for table `{t}`
+--
+
+LOCK TABLES `{t}` WRITE;
+/*!40000 ALTER TABLE `{t}` DISABLE KEYS */;
+"""
+
+TRIGGER = """/*!50003 SET @saved_sql_mode       = @@sql_mode */ ;
+DELIMITER ;;
+/*!50003 CREATE*/ /*!50017 DEFINER=`root`@`localhost`*/ /*!50003 TRIGGER `trg_{t}` BEFORE INSERT ON `{t}` FOR EACH ROW BEGIN
+  SET NEW.nombre = CONCAT(NEW.nombre, ';');
+END */;;
+DELIMITER ;
+/*!50003 SET sql_mode              = @saved_sql_mode */ ;
+"""
+
+ROUTINES = """
+--
+-- Dumping routines for database '{db}'
+--
+DELIMITER ;;
+CREATE DEFINER=`root`@`localhost` PROCEDURE `resumen`()
+BEGIN
+  SELECT 'a;b';
+  SELECT COUNT(*) FROM tabla_00;
+END ;;
+DELIMITER ;
+"""
+
+
+def create_statement(state, name):
+    """CREATE TABLE de SHOW CREATE TABLE, en una línea (como lo devuelve mysql -B)"""
+    ddl = TABLE_DDL.format(t=name, ai=table_rows(state, table_names(state).index(name)) + 1)
+    start = ddl.index('CREATE TABLE')
+    return ddl[start:ddl.index(';', start)].replace('\n', '\\n')
+
+
+def dump_table(state, i, write, structure=True, data=True, triggers=True, mbps=0, where=None):
+    """
+    Escribir el volcado de una tabla con write(bytes).
+
+    where=(desde, hasta) limita las filas a ese rango de id (extremos None =
+    abiertos); el límite de velocidad cuenta solo las filas del rango, como un
+    servidor que recorre el índice de la PK.
+    """
+    name = table_names(state)[i]
+    if structure:
+        write(TABLE_DDL.format(t=name, ai=table_rows(state, i) + 1).encode())
+    if not data:
+        return
+    write(TABLE_DATA.format(t=name).encode())
+    target = table_size(state, i)
+    per_insert = state['rows_per_insert']
+    written = sent = row = 0
+    started = time.time()
+    low, high = where or (None, None)
+    while written < target:
+        rows = [f"({row + k + 1},'fila {row + k + 1} de {name};texto',{(row + k) % 1000}.50)"
+                for k in range(per_insert)]
+        full = line = f"INSERT INTO `{name}` VALUES {','.join(rows)};\n".encode()
+        if where:
+            rows = [value for k, value in enumerate(rows, row + 1)
+                    if (low is None or k >= low) and (high is None or k < high)]
+            line = f"INSERT INTO `{name}` VALUES {','.join(rows)};\n".encode() if rows else b''
+        if line:
+            write(line)
+        row += per_insert
+        written += len(full)
+        sent += len(line)
+        if mbps:
+            ahead = sent / (mbps * 1024**2) - (time.time() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+    write(f"/*!40000 ALTER TABLE `{name}` ENABLE KEYS */;\nUNLOCK TABLES;\n".encode())
+    if triggers and i == 0:
+        write(TRIGGER.format(t=name).encode())
+
+
+# —————————————— Binlog binario ——————————————
+
+def _event(type_, body, timestamp, flags=0):
+    size = 19 + len(body) + 4
+    data = struct.pack('<IBIIIH', timestamp, type_, 1, size, 0, flags) + body
+    return data + struct.pack('<I', zlib.crc32(data))
+
+
+def format_description(timestamp=BASE_TIME):
+    post_header = bytearray(41)
+    post_header[1] = 13                     # QUERY_EVENT
+    post_header[3] = 8                      # ROTATE_EVENT
+    post_header[18] = 8                     # TABLE_MAP_EVENT
+    for type_ in (23, 24, 25):
+        post_header[type_ - 1] = 8
+    for type_ in (30, 31, 32, 39):
+        post_header[type_ - 1] = 10
+    post_header[32] = post_header[33] = 42  # GTID / ANONYMOUS_GTID
+    body = (struct.pack('<H', 4) + b'8.0.36-bench'.ljust(50, b'\0') + struct.pack('<I', timestamp)
+            + bytes([19]) + bytes(post_header) + bytes([1]))
+    event = bytearray(_event(15, body, timestamp, flags=1))
+    struct.pack_into('<I', event, 13, 4 + len(event))
+    struct.pack_into('<I', event, len(event) - 4, zlib.crc32(bytes(event[:-4])))
+    return bytes(event)
+
+
+def _query(schema, sql, timestamp):
+    post = struct.pack('<IIBHH', 8, 0, len(schema), 0, 0)
+    return _event(2, post + schema + b'\0' + sql, timestamp)
+
+
+def schema_of(state, index):
+    """Esquema de la transacción index: la nuestra cada other_schemas + 1"""
+    if index % (state['other_schemas'] + 1) == 0:
+        return state['db'].encode()
+    return b'otra_bd_%d' % (index % (state['other_schemas'] + 1))
+
+
+def event_time(file_number, position, rotate):
+    return BASE_TIME + ((file_number - 1) * rotate + position) // BYTES_PER_SEC
+
+
+def transaction(state, file_number, position):
+    """Eventos de la transacción que ocupa [position, position + UNIT) del binlog"""
+    index = ((file_number - 1) * state['rotate'] + position - 4) // UNIT
+    timestamp = event_time(file_number, position, state['rotate'])
+    schema = schema_of(state, index)
+    table = b'tabla_%02d' % (index % state['tables'])
+    table_id = 100 + index % state['tables']
+    gtid = _event(34, bytes(42), timestamp)
+    if index % DDL_EVERY == DDL_EVERY // 2:
+        sql = b'ALTER TABLE `%s` COMMENT = \'%d\'' % (table, index)
+        used = len(gtid) + len(_query(schema, sql, timestamp))
+        events = [gtid, _query(schema, sql + b' ' * (UNIT - used), timestamp)]
+    else:
+        begin = _query(schema, b'BEGIN', timestamp)
+        table_map = _event(19, struct.pack('<Q', table_id)[:6] + b'\x01\x00' + bytes([len(schema)]) + schema
+                           + b'\0' + bytes([len(table)]) + table + b'\0' + b'\x03\x03\x0f\xf6\x04\xc8\x00\x0a\x02\x06',
+                           timestamp)
+        xid = _event(16, struct.pack('<Q', index), timestamp)
+        payload = UNIT - len(gtid) - len(begin) - len(table_map) - len(xid) - 19 - 4 - 10
+        row = (b'fila %d ' % index * (payload // 6 + 1))[:payload]
+        rows = _event(30, struct.pack('<Q', table_id)[:6] + struct.pack('<HH', 1, 2) + row, timestamp)
+        events = [gtid, begin, table_map, rows, xid]
+
+    fixed, end = [], position
+    for event in events:
+        size = struct.unpack_from('<I', event, 9)[0]
+        end += size
+        event = bytearray(event)
+        struct.pack_into('<I', event, 13, end)
+        struct.pack_into('<I', event, size - 4, zlib.crc32(bytes(event[:-4])))
+        fixed.append(bytes(event))
+    return fixed
+
+
+def file_name(number):
+    return f"binlog.{number:06d}"
+
+
+def file_number(name):
+    return int(name.rsplit('.', 1)[1])
+
+
+def total_written(state):
+    """Bytes de binlog escritos hasta ahora (múltiplo de UNIT por archivo)"""
+    grown = state['binlog_bytes']
+    if state['rate'] and state['epoch']:
+        grown += int((time.time() - state['epoch']) * state['rate'])
+    return grown
+
+
+def binary_logs(state):
+    """[(archivo, tamaño)] como SHOW BINARY LOGS"""
+    per_file = (state['rotate'] - 4) // UNIT
+    units = total_written(state) // UNIT
+    full, rest = divmod(units, per_file)
+    logs = [(file_name(n + 1), 4 + per_file * UNIT) for n in range(full)]
+    logs.append((file_name(full + 1), 4 + rest * UNIT))
+    return logs
+
+
+def raw_binlog(state, name, start, end, write):
+    """Escribir el binlog name como lo descarga mysqlbinlog --raw desde start hasta end"""
+    write(b'\xfebin' + format_description())
+    number = file_number(name)
+    position = max(start, 4)
+    while position + UNIT <= end:
+        write(b''.join(transaction(state, number, position)))
+        position += UNIT
+
+
+def rotate_event(name, position=4, log_pos=0, timestamp=BASE_TIME):
+    """ROTATE hacia name; con log_pos 0 es el artificial con el que empieza un volcado"""
+    event = bytearray(_event(4, struct.pack('<Q', position) + name.encode(), timestamp,
+                             flags=0 if log_pos else 0x20))   # LOG_EVENT_ARTIFICIAL_F
+    struct.pack_into('<I', event, 13, log_pos)
+    struct.pack_into('<I', event, len(event) - 4, zlib.crc32(bytes(event[:-4])))
+    return bytes(event)
+
+
+def dump_packets(state, name, start):
+    """
+    Eventos que envía el servidor a COM_BINLOG_DUMP desde name@start.
+
+    Como el servidor real, al acabar un archivo ya cerrado (con su ROTATE)
+    sigue con los binlogs siguientes hasta el final del último.
+    """
+    logs = binary_logs(state)
+    names = [log for log, _ in logs]
+    for i in range(names.index(name), len(logs)):
+        log, end = logs[i]
+        yield rotate_event(log, start)
+        yield format_description()
+        position = max(start, 4)
+        while position + UNIT <= end:
+            yield from transaction(state, file_number(log), position)
+            position += UNIT
+        if i + 1 < len(logs):
+            following = names[i + 1]
+            yield rotate_event(following, log_pos=end + 19 + 8 + len(following) + 4,
+                               timestamp=event_time(file_number(log), end, state['rotate']))
+        start = 4
+
+
+# —————————————— Binlog en texto ——————————————
+
+EVENT_NAMES = {2: 'Query', 16: 'Xid', 19: 'Table_map', 30: 'Write_rows', 34: 'Anonymous_GTID'}
+
+TEXT_HEADER = (b"# The proper term is pseudo_replica_mode, but we use this compatibility alias\n"
+               b"# to make the statement usable on server versions 8.0.24 and older.\n"
+               b"/*!50530 SET @@SESSION.PSEUDO_SLAVE_MODE=1*/;\n"
+               b"/*!50003 SET @OLD_COMPLETION_TYPE=@@COMPLETION_TYPE,COMPLETION_TYPE=0*/;\n"
+               b"DELIMITER /*!*/;\n")
+
+TEXT_FOOTER = (b"SET @@SESSION.GTID_NEXT= 'AUTOMATIC' /* added by mysqlbinlog */ /*!*/;\n"
+               b"DELIMITER ;\n# End of log file\n"
+               b"/*!50003 SET COMPLETION_TYPE=@OLD_COMPLETION_TYPE*/;\n"
+               b"/*!50530 SET @@SESSION.PSEUDO_SLAVE_MODE=0*/;\n")
+
+
+def _clock(timestamp):
+    return time.strftime('%y%m%d %H:%M:%S', time.gmtime(timestamp)).replace(' 0', '  ', 1)
+
+
+def decode_events(data, offset, tables, skip_gtids=False, database=None):
+    """
+    Texto de mysqlbinlog para los eventos de data, que empiezan en la posición offset.
+
+    tables acumula los Table_map entre llamadas. Con database se omiten los
+    eventos de otros esquemas, como hace mysqlbinlog --database.
+    """
+    out = []
+    pos = 0
+    current_db = None
+    while pos + 19 <= len(data):
+        timestamp, type_, server_id, size, log_pos, _ = struct.unpack_from('<IBIIIH', data, pos)
+        event = data[pos:pos + size]
+        at = offset + pos
+        pos += size
+        if type_ == 15:
+            out.append(f"# at {at}\n#{_clock(timestamp)} server id {server_id}  end_log_pos {log_pos} "
+                       f"CRC32 0x{zlib.crc32(event[:-4]):08x} \tStart: binlog v 4, server v 8.0.36-bench "
+                       f"created {_clock(timestamp)} at startup\n")
+            continue
+        if type_ == 2:
+            db_len = event[19 + 8]
+            status_len = struct.unpack_from('<H', event, 19 + 11)[0]
+            start = 19 + 13 + status_len
+            current_db = event[start:start + db_len].decode()
+        elif type_ == 19:
+            table_id = int.from_bytes(event[19:25], 'little')
+            p = 27
+            schema = event[p + 1:p + 1 + event[p]].decode()
+            p += event[p] + 2
+            tables[table_id] = (schema, event[p + 1:p + 1 + event[p]].decode())
+            current_db = schema
+        if database and current_db and current_db != database and type_ != 34:
+            continue
+        if type_ == 34 and skip_gtids:
+            continue
+        header = (f"# at {at}\n#{_clock(timestamp)} server id {server_id}  end_log_pos {log_pos} "
+                  f"CRC32 0x{zlib.crc32(event[:-4]):08x} \t{EVENT_NAMES.get(type_, type_)}")
+        if type_ == 2:
+            sql = event[start + db_len + 1:-4].decode().rstrip()
+            out.append(f"{header}\tthread_id=8\texec_time=0\terror_code=0\n"
+                       f"use `{current_db}`/*!*/;\nSET TIMESTAMP={timestamp}/*!*/;\n{sql}\n/*!*/;\n")
+        elif type_ == 30:
+            schema, table = tables[int.from_bytes(event[19:25], 'little')]
+            out.append(f"{header}: table id {int.from_bytes(event[19:25], 'little')} flags: STMT_END_F\n"
+                       f"BINLOG '\n{base64.b64encode(event[:57]).decode()}\n'/*!*/;\n"
+                       f"### INSERT INTO `{schema}`.`{table}`\n")
+        elif type_ == 16:
+            out.append(f"{header} = {int.from_bytes(event[19:27], 'little')}\nCOMMIT/*!*/;\n")
+        elif type_ == 34:
+            out.append(f"{header}\tlast_committed=0\tsequence_number=0\n"
+                       f"SET @@SESSION.GTID_NEXT= 'ANONYMOUS'/*!*/;\n")
+        else:
+            out.append(header + "\n")
+    return "".join(out).encode()
+
+
+def rotate_text(position, next_name):
+    return (f"# at {position}\n#700101  0:00:00 server id 1  end_log_pos 0 CRC32 0x00000000 \t"
+            f"Rotate to {next_name}  pos: 4\n").encode()
@@ -0,0 +1,457 @@
+import os
+import re
+import sys
+import mmap
+import time
+import zlib
+import struct
+import subprocess
+import dbclient
+import throttle
+
+# —————— CONFIGURACIÓN DEL PARSER DE BINLOG ——————
+BINLOG_MAGIC          = b'\xfebin'
+HEADER_LEN            = 19
+BINLOG_DUMP_NON_BLOCK = 0x01                # ← el servidor corta al llegar al final en vez de esperar
+COM_BINLOG_DUMP       = 0x12
+
+QUERY_EVENT, STOP_EVENT, ROTATE_EVENT = 2, 3, 4
+INTVAR_EVENT, RAND_EVENT, USER_VAR_EVENT = 5, 13, 14
+FORMAT_DESCRIPTION_EVENT = 15
+XID_EVENT             = 16
+TABLE_MAP_EVENT       = 19
+INCIDENT_EVENT        = 26
+ROWS_QUERY_EVENT      = 29
+GTID_EVENTS           = (33, 34)            # ← GTID y ANONYMOUS_GTID
+XA_PREPARE_EVENT      = 38
+TRANSACTION_PAYLOAD   = 40
+ROWS_EVENTS           = frozenset((20, 21, 22, 23, 24, 25, 30, 31, 32, 39))
+CONTEXT_EVENTS        = frozenset((INTVAR_EVENT, RAND_EVENT, USER_VAR_EVENT, ROWS_QUERY_EVENT))
+
+STMT_END_F            = 0x0001              # ← flag del último evento de filas de una sentencia
+BINLOG_IN_USE_F       = 0x0001              # ← flag de la FDE de un binlog que sigue abierto
+CHECKSUM_CRC32        = 1
+CHECKSUM_VERSION      = (5, 6, 1)           # ← desde aquí la FDE declara el algoritmo de checksum
+
+TX_BEGIN              = (b'BEGIN', b'XA START')
+TX_END                = (b'COMMIT', b'ROLLBACK')
+# ——————————————————————————
+
+_header = struct.Struct('<IBIIIH')          # timestamp, tipo, server_id, tamaño, log_pos, flags
+
+
+class BinlogFilter:
+    """
+    Filtro en streaming de eventos de binlog por esquema y tabla.
+
+    Recibe eventos binarios completos (de un archivo local o de un volcado
+    remoto) y escribe en `writer` un binlog válido que solo contiene las
+    transacciones de `schema` (y de `tables` si se indica), listo para que un
+    mysqlbinlog local lo convierta a SQL. Cada transacción se agrupa desde su
+    GTID/BEGIN hasta su XID/COMMIT: solo se escribe si conserva algún cambio, y
+    de ella solo se conservan los TABLE_MAP y eventos de filas de las tablas
+    filtradas. Los eventos descartados no se copian nunca; para los de filas
+    basta con leer el id de tabla de su cabecera.
+
+    Las sentencias (binlog en formato STATEMENT y DDL) se filtran por su base de
+    datos por defecto, igual que mysqlbinlog --database. Las transacciones
+    comprimidas (TRANSACTION_PAYLOAD) se conservan enteras porque no se pueden
+    filtrar sin descomprimirlas.
+    """
+
+    def __init__(self, writer, schema, tables=None):
+        self.writer = writer
+        self.schema = schema.encode('utf-8')
+        self.tables = {t.encode('utf-8') for t in tables} if tables else None
+
+        # Formato del binlog, leído de su FORMAT_DESCRIPTION_EVENT
+        self.fde = None
+        self.checksum = False
+        self.table_id_size = 6
+        self.query_post_header = 13
+
+        # Unidad (transacción o sentencia suelta) en curso
+        self.in_unit = False
+        self.tx_open = False
+        self.relevant = False
+        self.pending = []       # GTID/BEGIN aún sin escribir
+        self.context = []       # INTVAR/RAND/USER_VAR/ROWS_QUERY de la siguiente sentencia
+        self.maps = []          # TABLE_MAP filtrados sin filas escritas todavía
+        self.held = None        # último evento de filas conservado (puede necesitar STMT_END_F)
+        self.table_ids = {}
+
+        self.position = None    # log_pos del final de la última unidad completa
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.kept = 0
+        self.dropped = 0
+
+    # ——— Entrada ———
+
+    def feed(self, buf, offset=0):
+        """Procesar el evento que empieza en buf[offset]; devuelve su tamaño"""
+        _, type_, _, size, log_pos, _ = _header.unpack_from(buf, offset)
+        self.bytes_in += size
+        self._event(buf, offset, type_, size, log_pos)
+        return size
+
+    def feed_range(self, data, offset, start=4, stop=None):
+        """
+        Procesar los eventos consecutivos de data desde offset.
+
+        Solo entran los eventos cuyo inicio (log_pos - tamaño) está entre start
+        y stop; un evento incompleto al final (binlog aún abierto) se ignora.
+        Es el bucle caliente de los archivos locales, por eso no pasa por feed().
+        """
+        unpack = _header.unpack_from
+        event = self._event
+        end = len(data)
+        while offset + HEADER_LEN <= end:
+            _, type_, _, size, log_pos, _ = unpack(data, offset)
+            if size < HEADER_LEN or offset + size > end:
+                break
+            if log_pos and type_ != FORMAT_DESCRIPTION_EVENT:
+                if log_pos - size < start:
+                    offset += size
+                    continue
+                if stop is not None and log_pos - size >= stop:
+                    break
+            self.bytes_in += size
+            event(data, offset, type_, size, log_pos)
+            offset += size
+
+    def _event(self, buf, offset, type_, size, log_pos):
+        if type_ in ROWS_EVENTS:
+            self._rows(buf, offset, size)
+        elif type_ == TABLE_MAP_EVENT:
+            self._table_map(buf, offset, size)
+        elif type_ == QUERY_EVENT:
+            self._query(buf, offset, size)
+        elif type_ in GTID_EVENTS:
+            self._begin_unit()
+            self.pending.append(bytes(buf[offset:offset + size]))
+        elif type_ == XID_EVENT or type_ == XA_PREPARE_EVENT:
+            self._end_unit(buf[offset:offset + size] if self.relevant else None)
+        elif type_ in CONTEXT_EVENTS:
+            self.context.append(bytes(buf[offset:offset + size]))
+        elif type_ == FORMAT_DESCRIPTION_EVENT:
+            self._format(bytes(buf[offset:offset + size]))
+            return
+        elif type_ == TRANSACTION_PAYLOAD:
+            if not self.in_unit:
+                self._begin_unit()
+            self._emit(bytes(buf[offset:offset + size]))
+            if not self.tx_open:
+                self._end_unit()
+        elif type_ == INCIDENT_EVENT:
+            print(f"⚠️ INCIDENT_EVENT en el binlog (log_pos {log_pos}): el servidor indica eventos perdidos")
+        # ROTATE, STOP, HEARTBEAT, PREVIOUS_GTIDS... no hacen falta en la salida
+
+        if not self.in_unit and log_pos:
+            self.position = log_pos
+
+    def close(self):
+        """Terminar: una unidad incompleta al final no se escribe"""
+        if self.in_unit:
+            self._reset_unit()
+        self.table_ids = {}
+
+    # ——— Eventos ———
+
+    def _format(self, event):
+        """Leer el formato (checksum, tamaños de post-cabecera) y escribir la FDE de la salida"""
+        body = event[HEADER_LEN:]
+        version = tuple(int(n) for n in re.findall(rb'\d+', body[2:52].split(b'\0', 1)[0])[:3])
+        has_checksum_field = version >= CHECKSUM_VERSION
+        self.checksum = has_checksum_field and event[-5] == CHECKSUM_CRC32
+
+        end = len(body) - 5 if has_checksum_field else len(body)
+        post_headers = body[57:end]
+        if len(post_headers) >= TABLE_MAP_EVENT:
+            self.table_id_size = 4 if post_headers[TABLE_MAP_EVENT - 1] == 6 else 6
+        if len(post_headers) >= QUERY_EVENT:
+            self.query_post_header = post_headers[QUERY_EVENT - 1]
+
+        if self.fde is None:
+            # La salida es un binlog cerrado: sin BINLOG_IN_USE_F y sin posición artificial
+            fde = bytearray(event)
+            struct.pack_into('<H', fde, 17, struct.unpack_from('<H', fde, 17)[0] & ~BINLOG_IN_USE_F)
+            self._fix_checksum(fde)
+            self.fde = bytes(fde)
+            self._write(BINLOG_MAGIC)
+            self._write(self.fde)
+
+    def _query(self, buf, offset, size):
+        post = offset + HEADER_LEN
+        db_len = buf[post + 8]
+        status_len = struct.unpack_from('<H', buf, post + 11)[0]
+        db_start = post + self.query_post_header + status_len
+        sql_start = db_start + db_len + 1
+        sql_end = offset + size - (4 if self.checksum else 0)
+        head = bytes(buf[sql_start:min(sql_end, sql_start + 8)]).upper()
+
+        if head.startswith(TX_BEGIN):
+            if not self.in_unit:
+                self._begin_unit()
+            self.tx_open = True
+            self.pending.append(bytes(buf[offset:offset + size]))
+        elif self.tx_open and head.startswith(TX_END) and sql_end - sql_start <= len(b'ROLLBACK'):
+            self._end_unit(bytes(buf[offset:offset + size]))
+        else:
+            if not self.in_unit:
+                self._begin_unit()
+            context, self.context = self.context, []
+            if bytes(buf[db_start:db_start + db_len]) == self.schema:
+                self._emit(*context, bytes(buf[offset:offset + size]))
+            if not self.tx_open:
+                # DDL o sentencia fuera de transacción: es una unidad por sí sola
+                self._end_unit()
+
+    def _table_map(self, buf, offset, size):
+        post = offset + HEADER_LEN
+        table_id = int.from_bytes(buf[post:post + self.table_id_size], 'little')
+        pos = post + self.table_id_size + 2
+        schema_len = buf[pos]
+        schema = bytes(buf[pos + 1:pos + 1 + schema_len])
+        pos += schema_len + 2
+        table = bytes(buf[pos + 1:pos + 1 + buf[pos]])
+
+        keep = schema == self.schema and (self.tables is None or table in self.tables)
+        self.table_ids[table_id] = keep
+        if keep:
+            self.maps.append(bytes(buf[offset:offset + size]))
+
+    def _rows(self, buf, offset, size):
+        post = offset + HEADER_LEN
+        table_id = int.from_bytes(buf[post:post + self.table_id_size], 'little')
+        flags = struct.unpack_from('<H', buf, post + self.table_id_size)[0]
+
+        if self.table_ids.get(table_id):
+            maps, self.maps = self.maps, []
+            context, self.context = self.context, []
+            self._emit(*context, *maps)
+            self.held = bytearray(buf[offset:offset + size])
+        elif flags & STMT_END_F and self.held is not None:
+            # La sentencia terminaba en un evento descartado: el fin pasa al último conservado
+            flags_pos = HEADER_LEN + self.table_id_size
+            struct.pack_into('<H', self.held, flags_pos,
+                             struct.unpack_from('<H', self.held, flags_pos)[0] | STMT_END_F)
+            self._fix_checksum(self.held)
+
+        if flags & STMT_END_F:
+            self._flush_held()
+            self.maps = []
+            self.context = []
+
+    # ——— Unidades ———
+
+    def _begin_unit(self):
+        if self.in_unit:
+            # Unidad sin cierre (binlog cortado a mitad): se descarta
+            self._reset_unit()
+        self.in_unit = True
+
+    def _emit(self, *events):
+        """Escribir eventos de la unidad, precedidos la primera vez por su GTID/BEGIN"""
+        if not self.relevant:
+            self.relevant = True
+            for event in self.pending:
+                self._write(event)
+            self.pending = []
+        self._flush_held()
+        for event in events:
+            self._write(event)
+
+    def _flush_held(self):
+        if self.held is not None:
+            self._write(self.held)
+            self.held = None
+
+    def _end_unit(self, event=None):
+        if self.relevant:
+            self._flush_held()
+            if event is not None:
+                self._write(event)
+            self.kept += 1
+        elif self.in_unit:
+            self.dropped += 1
+        self._reset_unit()
+
+    def _reset_unit(self):
+        self.in_unit = False
+        self.tx_open = False
+        self.relevant = False
+        self.pending = []
+        self.context = []
+        self.maps = []
+        self.held = None
+
+    def _fix_checksum(self, event):
+        if self.checksum:
+            struct.pack_into('<I', event, len(event) - 4, zlib.crc32(memoryview(event)[:-4]))
+
+    def _write(self, data):
+        self.writer.write(data)
+        self.bytes_out += len(data)
+
+
+def filter_file(path, writer, schema, tables=None, start=4, stop=None):
+    """
+    Filtrar un archivo de binlog local.
+
+    El archivo se mapea en memoria y los eventos se recorren por su cabecera,
+    así que los que se descartan no llegan a copiarse.
+
+    Returns:
+        BinlogFilter: con la posición alcanzada y las estadísticas
+    """
+    parser = BinlogFilter(writer, schema, tables)
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size <= len(BINLOG_MAGIC):
+            return parser
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:4] != BINLOG_MAGIC:
+                raise ValueError(f"{path} no es un archivo de binlog")
+            parser.feed_range(data, len(BINLOG_MAGIC), start, stop)
+    parser.close()
+    return parser
+
+
+def dump_events(config, file_, position):
+    """
+    Volcado remoto con el protocolo de réplica (COM_BINLOG_DUMP) usando PyMySQL.
+
+    Genera los eventos como memoryviews de cada paquete. El servidor envía
+    primero un ROTATE y la FDE del archivo, luego los eventos desde position,
+    y corta al llegar al final del binlog (no se queda esperando eventos nuevos).
+    Si el archivo ya está cerrado sigue con los binlogs posteriores tras su
+    ROTATE: quien lee decide dónde parar (ver filter_remote).
+    """
+    conn = dbclient.PyMySQLConnection(config)
+    try:
+        conn.query("SET @master_binlog_checksum = @@global.binlog_checksum, "
+                   "@source_binlog_checksum = @@global.binlog_checksum")
+        payload = struct.pack('<IHI', position, BINLOG_DUMP_NON_BLOCK,
+                              int(config.get('BINLOG_SERVER_ID', 0))) + file_.encode('utf-8')
+        raw = conn.conn
+        try:
+            raw._execute_command(COM_BINLOG_DUMP, payload)
+            while True:
+                packet = raw._read_packet()
+                if packet.is_eof_packet():
+                    return
+                yield memoryview(packet.get_all_data())[1:]    # byte 0: marcador OK
+        except dbclient.pymysql.err.MySQLError as e:
+            raise dbclient.QueryError(str(e))
+    finally:
+        conn.close()
+
+
+def _rotates_away(event, file_):
+    """Un ROTATE hacia otro archivo: lo que sigue ya no es de file_"""
+    name = bytes(event[HEADER_LEN + 8:])
+    return file_.encode('utf-8') not in (name, name[:-4])      # con o sin checksum CRC32
+
+
+def filter_remote(config, file_, writer, start=4, stop=None, tables=None, limiter=None):
+    """
+    Filtrar un binlog leyéndolo directamente del servidor, sin archivos intermedios.
+
+    Solo se lee file_: el volcado se corta en el ROTATE hacia el archivo
+    siguiente, que es el tramo siguiente de la cadena. Sin ese corte, los
+    tramos sin stop llevarían también todos los binlogs posteriores.
+    """
+    parser = BinlogFilter(writer, config['DB_NAME'], tables)
+    events = dump_events(config, file_, start)
+    try:
+        for event in events:
+            size, log_pos = struct.unpack_from('<II', event, 9)
+            if event[4] == ROTATE_EVENT and _rotates_away(event, file_):
+                break
+            if stop is not None and log_pos and event[4] != FORMAT_DESCRIPTION_EVENT \
+                    and log_pos - size >= stop:
+                break
+            if limiter:
+                limiter.pace(size)
+            parser.feed(event)
+    finally:
+        events.close()
+    parser.close()
+    return parser
+
+
+def fetch_raw(config, file_, start, directory):
+    """Descargar un binlog tal cual con mysqlbinlog --raw (cuando no hay PyMySQL)"""
+    import main  # Importar aquí para evitar dependencias circulares
+
+    prefix = os.path.join(directory, '')
+    cmd = throttle.niced([
+        main.tool_path('mysqlbinlog'),
+        *main.connection_args(config),
+        "--read-from-remote-server",
+        "--raw",
+        f"--result-file={prefix}",
+        f"--start-position={start}",
+        file_
+    ], config)
+    subprocess.run(cmd, check=True)
+    return prefix + file_
+
+
+def use_native_dump(config):
+    """El volcado por protocolo solo es posible con el backend PyMySQL"""
+    return dbclient.pymysql is not None and config.get('DB_CLIENT', 'auto') != 'cli'
+
+
+def filter_segment(config, segment, out_path, work_dir, limiter=None):
+    """
+    Filtrar un tramo de la cadena de binlogs al binlog reducido out_path.
+
+    Con PyMySQL los eventos se leen del servidor y se filtran según llegan; sin
+    él se descarga el binlog con mysqlbinlog --raw a work_dir y se filtra desde
+    disco. En ambos casos solo se escriben los eventos del esquema configurado.
+    El limitador (throttle.Throttle), si lo hay, marca el ritmo de lectura del
+    servidor; la descarga con --raw no pasa por Python y solo se frena con
+    nice/ionice.
+    """
+    tables = config.get('BINLOG_TABLES') or None
+    started = time.time()
+    with open(out_path, 'wb') as out:
+        if use_native_dump(config):
+            parser = filter_remote(config, segment['file'], out, segment['start'], segment['stop'], tables,
+                                   limiter)
+        else:
+            raw_path = fetch_raw(config, segment['file'], segment['start'], work_dir)
+            try:
+                parser = filter_file(raw_path, out, config['DB_NAME'], tables,
+                                     segment['start'], segment['stop'])
+            finally:
+                os.remove(raw_path)
+
+    elapsed = max(time.time() - started, 1e-6)
+    share = parser.bytes_out / parser.bytes_in * 100 if parser.bytes_in else 0
+    print(f"🔎 {segment['file']}: {parser.bytes_in / 1024**2:.1f} MB leídos, "
+          f"{parser.bytes_out / 1024**2:.1f} MB de {config['DB_NAME']} ({share:.1f}%), "
+          f"{parser.kept} transacciones conservadas y {parser.dropped} descartadas "
+          f"({parser.bytes_in / 1024**2 / elapsed:.0f} MB/s)")
+    return parser
+
+
+def decode_command(path):
+    """mysqlbinlog local que convierte un binlog filtrado a SQL"""
+    import main  # Importar aquí para evitar dependencias circulares
+
+    return [main.tool_path('mysqlbinlog'), "--skip-gtids", path]
+
+
+if __name__ == "__main__":
+    # Uso: python binlog_parser.py <base_de_datos> <binlog> <salida> [tabla ...]
+    if len(sys.argv) < 4:
+        print("Uso: python binlog_parser.py <base_de_datos> <binlog> <salida> [tabla ...]")
+        sys.exit(1)
+
+    db_name, source, target = sys.argv[1:4]
+    with open(target, 'wb') as out:
+        result = filter_file(source, out, db_name, sys.argv[4:] or None)
+    print(f"✅ {result.kept} transacciones de {db_name} en {target} "
+          f"({result.bytes_out:,} de {result.bytes_in:,} bytes)")
@@ -0,0 +1,263 @@
+import os
+import re
+import threading
+import subprocess
+from datetime import datetime
+import compression
+import integrity
+import pitr
+import rolling
+from pitr import AT_PREFIX, ROTATE_RE, TX_END_LINES
+
+# —————— CONFIGURACIÓN DEL STREAMING ——————
+CHECKPOINT_INTERVAL = 5                     # ← segundos entre checkpoints de posición
+RETRY_DELAY         = 10                    # ← segundos antes de reconectar si mysqlbinlog cae
+STREAM_LOG_NAME     = 'binlog_stream.log'   # ← stderr de mysqlbinlog, dentro de BACKUP_DIR
+
+END_POS_RE   = re.compile(rb'end_log_pos (\d+)')
+# ——————————————————————————
+
+
+class BinlogStreamer:
+    """
+    Backup incremental continuo con un único mysqlbinlog --stop-never.
+
+    El proceso queda conectado al servidor como una réplica y los eventos se
+    añaden al archivo de backup según llegan. La posición se guarda en el archivo
+    de estado como mucho cada CHECKPOINT_INTERVAL segundos y siempre en un límite
+    de transacción, junto al tamaño del archivo en ese momento ("Size"): al
+    arrancar se descarta lo escrito después del último checkpoint, que se vuelve a
+    leer del servidor, así que un corte nunca duplica ni pierde transacciones.
+    Lo escrito entre dos checkpoints queda como un tramo del registro de huellas.
+    Con ROLLING_PARTS la parte en curso se cierra después de un checkpoint, y
+    "Size" es el tamaño del día entero (ver rolling.py).
+    """
+
+    def __init__(self, config, backup_file, state_file):
+        self.config = config
+        self.backup_file = backup_file
+        self.state_file = state_file
+        self.checkpoint_interval = config.get('CHECKPOINT_INTERVAL', CHECKPOINT_INTERVAL)
+        self.log_file = os.path.join(config['BACKUP_DIR'], STREAM_LOG_NAME)
+        self.index_file = pitr.index_path(state_file)
+        self.digest_log = integrity.digests_path(state_file)
+
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.proc = None
+        self.thread = None
+        self.checkpoint_thread = None
+        self.writer = None
+
+        # Posición del último checkpoint guardado
+        self.checkpoint = None
+        self.checkpoint_size = 0
+        self.last_checkpoint_time = None
+
+        # Seguimiento del stream actual
+        self.current_file = None
+        self.last_end_pos = None
+        self.in_transaction = False
+        self.safe_position = None       # último límite de transacción ya escrito
+        self.at_safe_point = True       # lo escrito termina justo en safe_position
+        self.dirty = False
+        self.transactions = 0
+
+        # Índice PITR: puntos y bytes sin comprimir escritos desde el último checkpoint
+        self.indexer = None
+        self.logical_size = 0
+        self.pending_bytes = 0
+        self.digest = None              # huella de lo escrito desde el último checkpoint
+
+    # ——— Control ———
+
+    def start(self):
+        """Arrancar el streaming desde la posición del archivo de estado"""
+        if self.is_running():
+            return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.checkpoint_thread = threading.Thread(target=self._checkpoint_loop, daemon=True)
+        self.thread.start()
+        self.checkpoint_thread.start()
+        print(f"📡 Streaming de binlog iniciado (checkpoint cada {self.checkpoint_interval}s)")
+
+    def stop(self, timeout=30):
+        """Detener el streaming dejando el archivo y el estado en un checkpoint coherente"""
+        if not self.thread:
+            return
+        self.stopping.set()
+        proc = self.proc
+        if proc and proc.poll() is None:
+            proc.terminate()
+        self.thread.join(timeout)
+        self.checkpoint_thread.join(timeout)
+        self.thread = None
+        print("⏹️ Streaming de binlog detenido")
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def get_status(self):
+        """Estado actual del streaming"""
+        with self.lock:
+            return {
+                "is_running": self.is_running(),
+                "checkpoint": self.checkpoint,
+                "last_checkpoint": self.last_checkpoint_time.isoformat() if self.last_checkpoint_time else None,
+                "transactions": self.transactions
+            }
+
+    # ——— Bucle principal ———
+
+    def _run(self):
+        import main  # Importar aquí para evitar dependencias circulares
+
+        while not self.stopping.is_set():
+            state = main.load_state(self.state_file)
+            if state is None:
+                print("❌ No hay estado de binlog; se necesita un backup completo antes del streaming")
+                return
+
+            with self.lock:
+                self._reset(state)
+
+            cmd = main.binlog_command(self.config, state['File'], state['Position'], "--stop-never")
+            with open(self.log_file, 'ab') as log:
+                self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=log)
+            try:
+                for line in iter(self.proc.stdout.readline, b''):
+                    with self.lock:
+                        self._handle_line(line)
+            finally:
+                self.proc.stdout.close()
+                returncode = self.proc.wait()
+                with self.lock:
+                    self._finish()
+
+            if not self.stopping.is_set():
+                print(f"⚠️ mysqlbinlog terminó (código {returncode}), reconectando en {RETRY_DELAY}s "
+                      f"(ver {STREAM_LOG_NAME})")
+                self.stopping.wait(RETRY_DELAY)
+
+    def _checkpoint_loop(self):
+        """Guardar la posición periódicamente aunque no lleguen eventos nuevos"""
+        while not self.stopping.wait(1):
+            with self.lock:
+                if self.at_safe_point and self._checkpoint_due():
+                    self._checkpoint()
+
+    def _reset(self, state):
+        import main  # Importar aquí para evitar dependencias circulares
+
+        # Lo escrito después del último checkpoint no está confirmado: se vuelve a pedir
+        rolling.recover(self.backup_file)
+        main.trim_unconfirmed(self.backup_file, state, self.index_file, self.digest_log)
+
+        self.checkpoint = (state['File'], state['Position'])
+        self.checkpoint_size = rolling.disk_size(self.backup_file)
+        self.current_file = state['File']
+        self.last_end_pos = None
+        self.in_transaction = False
+        self.safe_position = self.checkpoint
+        self.at_safe_point = True
+        self.dirty = False
+        self.pending_bytes = 0
+        self.digest = integrity.Digest() if main.digest_file(self.config) else None
+        if self.config.get('PITR_INDEX', main.PITR_INDEX):
+            self.indexer = pitr.Indexer(state['File'], state['Position'])
+            self.logical_size = pitr.logical_end(self.index_file, self.backup_file)
+
+    def _handle_line(self, line):
+        """Escribir una línea de mysqlbinlog y actualizar la posición conocida"""
+        if line.startswith(AT_PREFIX):
+            # Todo lo escrito hasta aquí son eventos completos
+            if not self.in_transaction:
+                self.safe_position = (self.current_file, int(line[len(AT_PREFIX):]))
+                self.at_safe_point = True
+                if self._checkpoint_due():
+                    self._checkpoint()
+        elif line.startswith(b'#'):
+            match = END_POS_RE.search(line)
+            if match and int(match.group(1)) > 0:
+                self.last_end_pos = int(match.group(1))
+            match = ROTATE_RE.search(line)
+            if match:
+                self.current_file = match.group(1).decode('utf-8')
+
+        if self.indexer:
+            self.indexer.line(line, self.pending_bytes)
+        self._write(line)
+        self.at_safe_point = False
+
+        stripped = line.rstrip(b'\r\n')
+        if stripped == b'BEGIN':
+            self.in_transaction = True
+        elif stripped in TX_END_LINES:
+            self.in_transaction = False
+            self.transactions += 1
+            if self.last_end_pos:
+                self.safe_position = (self.current_file, self.last_end_pos)
+                self.at_safe_point = True
+
+    def _write(self, data):
+        if self.writer is None:
+            self.writer = compression.open_writer(self.backup_file, self.config, append=True)
+        self.writer.write(data)
+        if self.digest:
+            self.digest.update(data)
+        self.pending_bytes += len(data)
+        self.dirty = True
+
+    def _checkpoint_due(self):
+        if not self.dirty:
+            return False
+        if self.last_checkpoint_time is None:
+            return True
+        return (datetime.now() - self.last_checkpoint_time).total_seconds() >= self.checkpoint_interval
+
+    def _checkpoint(self):
+        """Asegurar en disco lo escrito y guardar la posición segura con el tamaño del archivo"""
+        import main  # Importar aquí para evitar dependencias circulares
+
+        if self.writer is not None:
+            if compression.resolve_codec(self.config) is None:
+                self.writer.flush()
+                os.fsync(self.writer.fileno())
+            else:
+                # Cerrar el frame: el archivo comprimido queda legible hasta este punto
+                self.writer.close()
+                self.writer = None
+                with open(self.backup_file, 'ab') as f:
+                    os.fsync(f.fileno())
+
+        file_, pos = self.safe_position
+        size = rolling.disk_size(self.backup_file)
+        if self.digest and self.digest.size:
+            integrity.append(self.digest_log, [self.digest.record()], [size])
+            self.digest = integrity.Digest()
+        main.save_state(self.state_file, file_, pos, Size=size)
+        if self.indexer:
+            pitr.append(self.index_file, self.indexer.take(), self.logical_size, size,
+                        self.logical_size + self.pending_bytes)
+            self.logical_size += self.pending_bytes
+        self.pending_bytes = 0
+        self.checkpoint = (file_, pos)
+        self.checkpoint_size = size
+        self.last_checkpoint_time = datetime.now()
+        self.dirty = False
+        main.seal_if_full(self.backup_file, self.config, close=self._close_writer)
+
+    def _close_writer(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def _finish(self):
+        """Cierre del proceso: checkpoint final o descarte de la transacción a medias"""
+        if self.dirty and self.at_safe_point:
+            self._checkpoint()
+        self._close_writer()
+        if self.dirty:
+            rolling.truncate(self.backup_file, self.checkpoint_size)
+            self.dirty = False
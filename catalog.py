@@ -0,0 +1,380 @@
+"""
+Catálogo SQLite de todos los backups, para consultarlos sin recorrer carpetas.
+
+main.main apunta cada ejecución (volcado completo o incremental) con su tramo
+de binlog, duración, bytes y horas de los eventos, o con su error si falló;
+el procesador nocturno
+apunta cada día guardado con sus partes, huellas, tablas y las horas que
+cubre, y le asigna las ejecuciones del ciclo. Cada registro es una sola
+transacción: el catálogo nunca queda a medias, y si no se puede escribir se
+avisa sin que falle el backup (backup_info.json sigue siendo la referencia
+de cada día).
+
+Por defecto es catalog.db en BACKUP_DIR (CATALOG_FILE para otra ruta). Las
+horas se guardan como 'YYYY-MM-DD HH:MM:SS', igual que el índice PITR, para
+compararlas como texto.
+"""
+import os
+import sys
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+import compression
+import integrity
+import pitr
+import rolling
+
+# —————— CONFIGURACIÓN DEL CATÁLOGO ——————
+CATALOG_NAME   = 'catalog.db'               # ← en BACKUP_DIR, salvo CATALOG_FILE
+SCHEMA_VERSION = 2                          # ← 2: runs.error
+BUSY_TIMEOUT   = 30                         # ← segundos esperando a otro escritor (backup y proceso nocturno)
+# ——————————————————————————
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id            INTEGER PRIMARY KEY,
+    kind          TEXT NOT NULL,            -- 'full' o 'incremental'
+    database      TEXT,
+    backup_file   TEXT NOT NULL,
+    started       TEXT NOT NULL,
+    finished      TEXT NOT NULL,
+    duration      REAL NOT NULL,
+    disk_bytes    INTEGER,
+    content_bytes INTEGER,
+    throughput    REAL,                     -- MB/s sin comprimir (en disco si no se sabe)
+    binlog_from   TEXT,
+    pos_from      INTEGER,
+    binlog_to     TEXT,
+    pos_to        INTEGER,
+    first_event   TEXT,
+    last_event    TEXT,
+    error         TEXT,                     -- NULL si terminó bien
+    day_id        INTEGER REFERENCES days(id) ON DELETE CASCADE
+);
+CREATE TABLE IF NOT EXISTS days (
+    id            INTEGER PRIMARY KEY,
+    folder        TEXT NOT NULL UNIQUE,
+    backup_date   TEXT NOT NULL,
+    created       TEXT NOT NULL,
+    duration      REAL,
+    storage       TEXT NOT NULL,            -- 'parts' o 'dedup'
+    layout        TEXT NOT NULL,            -- 'size' o 'table'
+    compression   TEXT,
+    disk_bytes    INTEGER,                  -- con dedup, lo añadido al repositorio ese día
+    content_bytes INTEGER,
+    digest        TEXT,
+    covers_from   TEXT,
+    covers_to     TEXT,
+    binlog_to     TEXT,
+    pos_to        INTEGER
+);
+CREATE TABLE IF NOT EXISTS parts (
+    day_id        INTEGER NOT NULL REFERENCES days(id) ON DELETE CASCADE,
+    seq           INTEGER NOT NULL,
+    filename      TEXT NOT NULL,
+    disk_bytes    INTEGER,
+    content_bytes INTEGER,
+    offset        INTEGER,
+    checksum      TEXT,
+    segments      INTEGER,
+    PRIMARY KEY (day_id, seq)
+);
+CREATE TABLE IF NOT EXISTS tables (
+    day_id        INTEGER NOT NULL REFERENCES days(id) ON DELETE CASCADE,
+    name          TEXT NOT NULL,
+    files         TEXT NOT NULL,            -- lista JSON de partes
+    offset        INTEGER,
+    content_bytes INTEGER,
+    rows_estimate INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_pending ON runs (backup_file, day_id);
+CREATE INDEX IF NOT EXISTS days_cover ON days (covers_from, covers_to);
+CREATE INDEX IF NOT EXISTS tables_day ON tables (day_id);
+"""
+
+
+def catalog_path(config):
+    """Ruta del catálogo para una configuración"""
+    return config.get('CATALOG_FILE') or os.path.join(config['BACKUP_DIR'], CATALOG_NAME)
+
+
+@contextmanager
+def transaction(path):
+    """Conexión con el esquema creado: lo hecho dentro se confirma entero o nada"""
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+    try:
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            conn.executescript(_SCHEMA)
+            if version == 1:
+                conn.execute("ALTER TABLE runs ADD COLUMN error TEXT")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _now():
+    return pitr.normalize_time(datetime.now())
+
+
+def _content_size(config, backup_file):
+    """Bytes sin comprimir del backup del día sin descomprimirlo, o None si no se sabe"""
+    import main  # Importar aquí para evitar dependencias circulares
+
+    log = main.digest_file(config)
+    if log:
+        return sum(record['length'] for record in integrity.load(log))
+    if os.path.exists(backup_file) and compression.detect_codec(backup_file) is None:
+        return rolling.sealed_content(backup_file) + os.path.getsize(backup_file)
+    return None
+
+
+class Run:
+    """
+    Una ejecución de main, usada como contexto alrededor del backup:
+
+        with catalog.Run(config, 'incremental', (archivo, posición)) as run:
+            ...
+            run.end = (archivo, posición)
+
+    Al salir se apunta con run.end, o con el error si el bloque lanzó una
+    excepción (que sigue su curso). Lo que ya tenía el backup al empezar
+    (bytes y puntos PITR) se toma como referencia para saber qué añadió esta
+    ejecución. Un problema con el catálogo nunca para el backup: se avisa y
+    la ejecución no se apunta.
+    """
+
+    def __init__(self, config, kind, start=None):
+        import main  # Importar aquí para evitar dependencias circulares
+
+        self.config = config
+        self.kind = kind
+        self.start = start
+        self.end = None
+        self.started = _now()
+        self.clock = datetime.now()
+        try:
+            self.backup_file, state_file = main.backup_paths(config)
+            self.index_file = pitr.index_path(state_file)
+            full = kind == 'full'
+            self.disk_before = 0 if full else rolling.disk_size(self.backup_file)
+            self.content_before = 0 if full else _content_size(config, self.backup_file)
+            self.points_before = 0 if full else len(pitr.load(self.index_file))
+        except Exception as e:
+            print(f"⚠️ Esta ejecución no se apuntará en el catálogo: {e}")
+            self.backup_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish(self.end)
+        else:
+            self.finish(self.end, error=str(exc) or exc_type.__name__)
+        return False
+
+    def finish(self, end, error=None):
+        """Apuntar la ejecución terminada en end = (archivo, posición) del binlog, o fallida con error"""
+        if self.backup_file is None:
+            return
+        try:
+            duration = (datetime.now() - self.clock).total_seconds()
+            disk = rolling.disk_size(self.backup_file) - self.disk_before
+            content = _content_size(self.config, self.backup_file)
+            if content is not None and self.content_before is not None:
+                content -= self.content_before
+            else:
+                content = None
+            points = pitr.load(self.index_file)[self.points_before:]
+            moved = content if content is not None else disk
+            start = self.start or (None, None)
+            end = end or (None, None)
+            with transaction(catalog_path(self.config)) as conn:
+                conn.execute(
+                    "INSERT INTO runs (kind, database, backup_file, started, finished, duration, disk_bytes, "
+                    "content_bytes, throughput, binlog_from, pos_from, binlog_to, pos_to, first_event, last_event, "
+                    "error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.kind, self.config.get('DB_NAME'), os.path.abspath(self.backup_file),
+                     self.started, _now(), duration, disk, content,
+                     moved / 1024**2 / duration if duration > 0 else None,
+                     start[0], start[1], end[0], end[1],
+                     points[0]['time'] if points else None, points[-1]['time'] if points else None, error)
+                )
+        except Exception as e:
+            print(f"⚠️ No se pudo actualizar el catálogo: {e}")
+
+
+def _day_rows(info):
+    """Filas de partes y tablas de un backup_info.json"""
+    parts = []
+    for seq, entry in enumerate(info.get('files', [])):
+        segments = entry.get('segments')
+        parts.append((seq, entry['filename'], entry.get('size_bytes'), entry.get('content_bytes'),
+                      entry.get('offset'), entry.get(integrity.ALGORITHM), len(segments) if segments else None))
+    tables = [(table['name'], json.dumps(table['files']), table.get('offset'), table.get('content_bytes'),
+               table.get('rows_estimate'))
+              for table in info.get('tables', [])]
+    return parts, tables
+
+
+def _day_sizes(info):
+    """(bytes en disco, bytes sin comprimir) de un día"""
+    if info.get('storage') == 'dedup':
+        return info['dedup'].get('new_bytes'), info['dedup'].get('logical_size')
+    files = info.get('files', [])
+    disk = sum(entry.get('size_bytes') or 0 for entry in files)
+    if files and all(entry.get('content_bytes') is not None for entry in files):
+        return disk, sum(entry['content_bytes'] for entry in files)
+    return disk, (info.get('digest') or {}).get('size')
+
+
+def _store_day(conn, folder, info, duration=None, backup_file=None):
+    """Insertar o actualizar el día y asignarle las ejecuciones pendientes de backup_file"""
+    folder = os.path.abspath(folder)
+    disk, content = _day_sizes(info)
+    digest = info.get('digest')
+    values = {
+        "folder": folder,
+        "backup_date": info['backup_date'],
+        "created": pitr.normalize_time(info['creation_time']),
+        "duration": duration,
+        "storage": info.get('storage', 'parts'),
+        "layout": info.get('layout', 'size'),
+        "compression": info.get('compression'),
+        "disk_bytes": disk,
+        "content_bytes": content,
+        "digest": json.dumps(digest) if digest else None
+    }
+    # Un día ya apuntado se actualiza en su sitio: sus ejecuciones siguen asignadas
+    conn.execute(
+        f"INSERT INTO days ({', '.join(values)}) VALUES ({', '.join('?' * len(values))}) "
+        f"ON CONFLICT (folder) DO UPDATE SET {', '.join(f'{k} = excluded.{k}' for k in values)}",
+        tuple(values.values())
+    )
+    day_id = conn.execute("SELECT id FROM days WHERE folder = ?", (folder,)).fetchone()[0]
+    conn.execute("DELETE FROM parts WHERE day_id = ?", (day_id,))
+    conn.execute("DELETE FROM tables WHERE day_id = ?", (day_id,))
+    parts, tables = _day_rows(info)
+    conn.executemany("INSERT INTO parts VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [(day_id, *row) for row in parts])
+    conn.executemany("INSERT INTO tables VALUES (?, ?, ?, ?, ?, ?)", [(day_id, *row) for row in tables])
+    if backup_file:
+        conn.execute("UPDATE runs SET day_id = ? WHERE day_id IS NULL AND backup_file = ?",
+                     (day_id, os.path.abspath(backup_file)))
+
+    # Horas restaurables: desde el último volcado completo (lo anterior ya no está en el día)
+    # hasta el último evento (o comprobación) del binlog; las ejecuciones fallidas no cuentan
+    runs = conn.execute(
+        "SELECT MAX(CASE WHEN kind = 'full' THEN started END), MAX(started), MAX(last_event) "
+        "FROM runs WHERE day_id = ? AND error IS NULL", (day_id,)
+    ).fetchone()
+    last = conn.execute("SELECT binlog_to, pos_to FROM runs WHERE day_id = ? AND error IS NULL "
+                        "ORDER BY id DESC LIMIT 1", (day_id,)).fetchone()
+    pitr_range = info.get('pitr') or {}
+    ends = [t for t in (runs[1], runs[2], pitr_range.get('to')) if t]
+    conn.execute(
+        "UPDATE days SET covers_from = ?, covers_to = ?, binlog_to = ?, pos_to = ? WHERE id = ?",
+        (runs[0] or pitr_range.get('from'), max(ends) if ends else None,
+         last[0] if last else None, last[1] if last else None, day_id)
+    )
+    return day_id
+
+
+def record_day(config, folder, info, duration=None):
+    """Apuntar un día recién guardado (su backup_info.json) y olvidar los días cuya carpeta ya no existe"""
+    import main  # Importar aquí para evitar dependencias circulares
+
+    try:
+        backup_file = main.backup_paths(config)[0]
+        with transaction(catalog_path(config)) as conn:
+            _store_day(conn, folder, info, duration, backup_file)
+            gone = [row['id'] for row in conn.execute("SELECT id, folder FROM days")
+                    if not os.path.isdir(row['folder'])]
+            conn.executemany("DELETE FROM days WHERE id = ?", [(day_id,) for day_id in gone])
+        if gone:
+            print(f"🗂️ {len(gone)} días borrados del disco quitados del catálogo")
+    except (sqlite3.Error, OSError, ValueError, KeyError) as e:
+        print(f"⚠️ No se pudo actualizar el catálogo: {e}")
+
+
+def import_days(path, daily_backup_dir):
+    """Apuntar los días de daily_backup_dir que aún no están en el catálogo; devuelve cuántos"""
+    from restore import INFO_FILE_NAME
+
+    added = 0
+    with transaction(path) as conn:
+        known = {row[0] for row in conn.execute("SELECT folder FROM days")}
+        for name in sorted(os.listdir(daily_backup_dir)):
+            folder = os.path.abspath(os.path.join(daily_backup_dir, name))
+            info_file = os.path.join(folder, INFO_FILE_NAME)
+            if folder in known or not os.path.exists(info_file):
+                continue
+            with open(info_file, 'r', encoding='utf-8') as f:
+                _store_day(conn, folder, json.load(f))
+            added += 1
+    return added
+
+
+def covering(path, when):
+    """Días que se pueden restaurar hasta la hora when, del más reciente al más antiguo"""
+    when = pitr.normalize_time(when)
+    with transaction(path) as conn:
+        return [dict(row) for row in conn.execute(
+            "SELECT * FROM days WHERE covers_from <= ? AND covers_to >= ? ORDER BY covers_from DESC",
+            (when, when)
+        )]
+
+
+def storage_by_month(path):
+    """Por mes ('YYYY-MM'): días, bytes en disco y sin comprimir"""
+    with transaction(path) as conn:
+        return [dict(row) for row in conn.execute(
+            "SELECT substr(backup_date, 1, 7) AS month, COUNT(*) AS days, "
+            "COALESCE(SUM(disk_bytes), 0) AS disk_bytes, COALESCE(SUM(content_bytes), 0) AS content_bytes "
+            "FROM days GROUP BY month ORDER BY month"
+        )]
+
+
+def summary(path):
+    """Cifras generales para la pestaña de estadísticas (runs, last_run y last solo de las que terminaron bien)"""
+    with transaction(path) as conn:
+        runs = conn.execute(
+            "SELECT COUNT(*) - COUNT(error) AS runs, COUNT(error) AS failed, "
+            "MAX(CASE WHEN error IS NULL THEN finished END) AS last_run, "
+            "AVG(CASE WHEN error IS NULL THEN throughput END) AS throughput FROM runs"
+        ).fetchone()
+        days = conn.execute(
+            "SELECT COUNT(*) AS days, COALESCE(SUM(disk_bytes), 0) AS disk_bytes, "
+            "MIN(covers_from) AS covers_from, MAX(covers_to) AS covers_to FROM days"
+        ).fetchone()
+        last = conn.execute(
+            "SELECT kind, finished, duration FROM runs WHERE error IS NULL ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+    return {**dict(runs), **dict(days), "last": dict(last) if last else None}
+
+
+if __name__ == "__main__":
+    # Uso: python catalog.py <catalog.db> cover <fecha_hora> | months | import <carpeta_daily_backups>
+    if len(sys.argv) < 3 or sys.argv[2] not in ('cover', 'months', 'import') or \
+            (sys.argv[2] != 'months' and len(sys.argv) < 4):
+        print("Uso: python catalog.py <catalog.db> cover <fecha_hora> | months | import <carpeta_daily_backups>")
+        sys.exit(1)
+
+    if sys.argv[2] == 'cover':
+        days = covering(sys.argv[1], sys.argv[3])
+        for day in days:
+            print(f"{day['folder']}\t{day['covers_from']} → {day['covers_to']}")
+        if not days:
+            print(f"❌ Ningún backup cubre {sys.argv[3]}")
+            sys.exit(1)
+    elif sys.argv[2] == 'months':
+        for month in storage_by_month(sys.argv[1]):
+            print(f"{month['month']}\t{month['days']} días\t{month['disk_bytes'] / 1024**3:.2f} GB en disco"
+                  f"\t{month['content_bytes'] / 1024**3:.2f} GB sin comprimir")
+    else:
+        print(f"✅ {import_days(sys.argv[1], sys.argv[3])} días añadidos al catálogo")
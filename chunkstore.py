@@ -0,0 +1,267 @@
+import io
+import os
+import json
+import zlib
+import hashlib
+import operator
+from itertools import compress, count, repeat
+from concurrent.futures import ThreadPoolExecutor
+import compression
+import fastio
+import rolling
+
+# —————— CONFIGURACIÓN DEL REPOSITORIO DEDUPLICADO ——————
+STORE_DIR_NAME = 'chunk_store'              # ← subcarpeta de DAILY_BACKUP_DIR con los chunks
+MANIFEST_NAME  = 'backup_manifest.json'     # ← lista de chunks de cada día, en su carpeta
+CHUNK_SIZE     = 64 * 1024                  # ← tamaño medio; menor que una línea de INSERT de mysqldump (~1 MB)
+WRITE_THREADS  = 4                          # ← chunks nuevos comprimidos/escritos a la vez
+
+# Candidatos a corte, por preferencia: separador de filas de un INSERT extendido o fin de línea
+SEPARATORS = (b'),(', b'\n')
+# ——————————————————————————
+
+
+def _find_cut(buf, start, end, modulus):
+    """
+    Primer corte entre start y end, o None.
+
+    Las filas se separan y se les calcula el crc32 en C (split + map), sin un
+    bucle de Python por fila, y por ventanas para no trocear de más cuando el
+    corte aparece pronto.
+    """
+    for separator in SEPARATORS:
+        first = buf.find(separator, start, end)
+        if first < 0:
+            continue
+        base = first + len(separator)
+        step = max(modulus // 2, 4096)
+        while base < end:
+            rows = buf[base:min(end, base + step)].split(separator)[:-1]   # la última, incompleta
+            if not rows:
+                # Fila más larga que la ventana: saltar hasta su separador
+                next_sep = buf.find(separator, base, end)
+                if next_sep < 0:
+                    break
+                base = next_sep + len(separator)
+                continue
+            lengths = list(map(len, rows))
+            hits = map(operator.lt,
+                       map(operator.mod, map(zlib.crc32, rows), repeat(modulus)),
+                       lengths)
+            index = next(compress(count(), hits), None)
+            if index is not None:
+                return base + sum(lengths[:index + 1]) + len(separator) * (index + 1)
+            base += sum(lengths) + len(separator) * len(rows)
+        # Sin corte con este separador: probar con el siguiente (p. ej. zona de DDL)
+    return None
+
+
+def iter_chunks(src, chunk_size=CHUNK_SIZE):
+    """
+    Trocear un stream en chunks definidos por su contenido.
+
+    Los cortes solo caen tras un separador de filas ("),(" de los INSERT
+    extendidos, o fin de línea si no los hay) y se deciden por el crc32 de la
+    fila anterior, con probabilidad proporcional a su longitud: el tamaño medio
+    es chunk_size sea cual sea el tamaño de las filas. Como la decisión depende
+    solo de la fila, insertar o borrar filas cambia los chunks de alrededor pero
+    los cortes siguientes vuelven a coincidir con los del día anterior. Tamaño
+    mínimo chunk_size/4 y máximo chunk_size*4.
+    """
+    min_size, max_size = chunk_size // 4, chunk_size * 4
+    modulus = chunk_size - min_size
+    buf = bytearray()
+    pos = 0         # inicio del chunk en curso dentro de buf
+    eof = False
+
+    while True:
+        if not eof and len(buf) - pos < max_size:
+            # Compactar antes de leer más: buf no crece más allá de un bloque de lectura
+            del buf[:pos]
+            pos = 0
+            while not eof and len(buf) < max_size:
+                data = src.read(fastio.BUFFER_SIZE)
+                if data:
+                    buf += data
+                else:
+                    eof = True
+        available = len(buf) - pos
+        if not available:
+            return
+
+        cut = None
+        if available > min_size:
+            cut = _find_cut(buf, pos + min_size, pos + min(available, max_size), modulus)
+        if cut is None:
+            cut = pos + min(available, max_size)
+
+        yield bytes(buf[pos:cut])
+        pos = cut
+
+
+def chunk_id(chunk):
+    return hashlib.blake2b(chunk, digest_size=32).hexdigest()
+
+
+def chunk_path(store_dir, digest):
+    return os.path.join(store_dir, digest[:2], digest)
+
+
+def _write_chunk(store_dir, digest, chunk, config):
+    """Guardar un chunk nuevo con escritura atómica; devuelve los bytes ocupados en disco"""
+    path = chunk_path(store_dir, digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with compression.open_writer(tmp, config) as f:
+        f.write(chunk)
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def store_backup(backup_file, store_dir, day_folder, config, stream=None):
+    """
+    Guardar un backup en el repositorio deduplicado.
+
+    El backup (descomprimido al vuelo, con sus partes ya cerradas si se
+    escribió con ROLLING_PARTS) se trocea con iter_chunks; cada chunk se
+    identifica por su hash BLAKE2b y solo se escribe si no estaba ya en el
+    repositorio, comprimido con el códec configurado. En day_folder queda el
+    manifiesto con la lista ordenada de chunks que reconstruye el backup. Con
+    stream (integrity.StreamCheck) el contenido se comprueba en la misma lectura.
+
+    Returns:
+        dict: estadísticas (tamaño lógico, chunks totales/nuevos, bytes nuevos)
+    """
+    chunk_size = int(config.get('DEDUP_CHUNK_SIZE', CHUNK_SIZE))
+    chunks = []
+    seen = set()
+    new_chunks = 0
+    total = 0
+    pending = []
+    stored_bytes = 0
+
+    with ThreadPoolExecutor(max_workers=WRITE_THREADS) as pool, \
+            rolling.open_reader(backup_file) as src:
+        for chunk in iter_chunks(src, chunk_size):
+            if stream:
+                stream.update(chunk)
+            digest = chunk_id(chunk)
+            chunks.append([digest, len(chunk)])
+            total += len(chunk)
+            if digest in seen or os.path.exists(chunk_path(store_dir, digest)):
+                continue
+            seen.add(digest)
+            new_chunks += 1
+            pending.append(pool.submit(_write_chunk, store_dir, digest, chunk, config))
+
+            # Acotar la memoria: como mucho dos chunks en cola por hilo
+            if len(pending) >= WRITE_THREADS * 2:
+                stored_bytes += pending.pop(0).result()
+        for future in pending:
+            stored_bytes += future.result()
+
+    manifest = {
+        "version": 1,
+        "size": total,
+        "chunk_size": chunk_size,
+        "chunks": chunks
+    }
+    tmp = os.path.join(day_folder, MANIFEST_NAME + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(day_folder, MANIFEST_NAME))
+
+    return {
+        "logical_size": total,
+        "chunks": len(chunks),
+        "new_chunks": new_chunks,
+        "new_bytes": stored_bytes
+    }
+
+
+def load_manifest(day_folder):
+    with open(os.path.join(day_folder, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def verify_day(store_dir, day_folder):
+    """Comprobar que el manifiesto es coherente y que todos sus chunks existen"""
+    manifest = load_manifest(day_folder)
+    if sum(size for _, size in manifest['chunks']) != manifest['size']:
+        return False
+    return all(os.path.exists(chunk_path(store_dir, digest)) for digest, _ in manifest['chunks'])
+
+
+class ChunkReader(io.RawIOBase):
+    """Lectura secuencial de un día del repositorio, verificando cada chunk por su hash"""
+
+    def __init__(self, store_dir, manifest, offset=0):
+        self.store_dir = store_dir
+        self.pending = iter(manifest['chunks'])
+        self.current = memoryview(b'')
+        # Saltar los chunks completos anteriores a offset sin leerlos
+        for digest, size in self.pending:
+            if offset < size:
+                self.current = memoryview(self._load(digest, size))[offset:]
+                break
+            offset -= size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.current:
+            entry = next(self.pending, None)
+            if entry is None:
+                return 0
+            self.current = memoryview(self._load(*entry))
+        n = min(len(buffer), len(self.current))
+        buffer[:n] = self.current[:n]
+        self.current = self.current[n:]
+        return n
+
+    def _load(self, digest, size):
+        with compression.open_reader(chunk_path(self.store_dir, digest)) as f:
+            chunk = f.read()
+        if len(chunk) != size or chunk_id(chunk) != digest:
+            raise IOError(f"Chunk corrupto en el repositorio: {digest}")
+        return chunk
+
+
+def open_day(store_dir, day_folder, offset=0):
+    """Abrir el backup de un día como stream binario (sin reconstruirlo en disco), desde offset"""
+    return io.BufferedReader(ChunkReader(store_dir, load_manifest(day_folder), offset),
+                             buffer_size=fastio.BUFFER_SIZE)
+
+
+def restore_day(store_dir, day_folder, target):
+    """Reconstruir en target el backup completo de un día; devuelve los bytes escritos"""
+    with open_day(store_dir, day_folder) as src, open(target, 'wb') as out:
+        return fastio.copy_stream(src, out.write)
+
+
+def collect_garbage(store_dir, daily_backup_dir):
+    """
+    Borrar los chunks que ya no usa ningún día.
+
+    Se recorren los manifiestos de todas las carpetas de DAILY_BACKUP_DIR, así
+    que borrar la carpeta de un día basta para liberar lo que solo él usaba.
+    """
+    referenced = set()
+    for entry in os.scandir(daily_backup_dir):
+        manifest_file = os.path.join(entry.path, MANIFEST_NAME)
+        if entry.is_dir() and os.path.exists(manifest_file):
+            referenced.update(digest for digest, _ in load_manifest(entry.path)['chunks'])
+
+    removed = freed = 0
+    if not os.path.isdir(store_dir):
+        return removed, freed
+    for bucket in os.scandir(store_dir):
+        if not bucket.is_dir():
+            continue
+        for chunk in os.scandir(bucket.path):
+            if chunk.name not in referenced:
+                freed += chunk.stat().st_size
+                os.remove(chunk.path)
+                removed += 1
+    return removed, freed
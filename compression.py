@@ -0,0 +1,176 @@
+import io
+import os
+import gzip
+import subprocess
+import fastio
+
+try:
+    import zstandard  # Opcional: pip install zstandard
+except ImportError:
+    zstandard = None
+
+# —————— CONFIGURACIÓN DE COMPRESIÓN ——————
+CODECS          = ('gzip', 'zstd')
+EXTENSIONS      = {'gzip': '.gz', 'zstd': '.zst'}
+DEFAULT_LEVELS  = {'gzip': 6, 'zstd': 3}
+LEVEL_RANGES    = {'gzip': (1, 9), 'zstd': (1, 22)}   # ← fuera de rango se ajusta al extremo
+PIPE_CHUNK_SIZE = fastio.BUFFER_SIZE
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# ——————————————————————————
+
+_warned = set()
+
+
+def _warn_once(message):
+    if message not in _warned:
+        print(message)
+        _warned.add(message)
+
+
+def resolve_codec(config):
+    """
+    Códec efectivo según la configuración.
+
+    Devuelve None (sin compresión), 'gzip' o 'zstd'. Si se pide zstd y el módulo
+    zstandard no está instalado se usa gzip, que siempre está disponible.
+    """
+    codec = (config.get('COMPRESSION') or '').lower() or None
+    if codec not in (None, *CODECS):
+        raise ValueError(f"Compresión no soportada: {codec}")
+    if codec == 'zstd' and zstandard is None:
+        _warn_once("⚠️ Módulo zstandard no instalado, usando gzip")
+        codec = 'gzip'
+    return codec
+
+
+def resolve_level(config):
+    """
+    Nivel de compresión válido para el códec efectivo (None sin compresión).
+
+    COMPRESSION_LEVEL se pide pensando en el códec configurado: si zstd cayó a
+    gzip se usa el nivel por defecto de gzip, y un nivel fuera de LEVEL_RANGES
+    se ajusta al extremo más cercano.
+    """
+    codec = resolve_codec(config)
+    level = config.get('COMPRESSION_LEVEL')
+    if codec is None:
+        return None
+    if not level:
+        return DEFAULT_LEVELS[codec]
+    if codec != (config.get('COMPRESSION') or '').lower():
+        _warn_once(f"⚠️ Nivel {level} de {config['COMPRESSION']} ignorado, gzip usa su nivel {DEFAULT_LEVELS[codec]}")
+        return DEFAULT_LEVELS[codec]
+    low, high = LEVEL_RANGES[codec]
+    adjusted = min(max(int(level), low), high)
+    if adjusted != level:
+        _warn_once(f"⚠️ Nivel {level} fuera de rango para {codec} ({low}-{high}), usando {adjusted}")
+    return adjusted
+
+
+def extension(config):
+    """Sufijo que añade la compresión configurada ('' si no hay)"""
+    codec = resolve_codec(config)
+    return EXTENSIONS[codec] if codec else ''
+
+
+def backup_file_name(base_name, config):
+    """Nombre del archivo de backup con el sufijo del códec configurado"""
+    return base_name + extension(config)
+
+
+def detect_codec(path):
+    """Detectar el códec de un archivo por sus bytes mágicos"""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic == ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+
+def open_writer(path, config, append=False):
+    """
+    Abrir un destino binario que comprime al vuelo.
+
+    En modo append se añade un frame/miembro nuevo al final: tanto gzip como zstd
+    admiten archivos formados por varios frames concatenados, así que los
+    incrementales se pueden seguir añadiendo sin recomprimir lo anterior.
+    """
+    mode = 'ab' if append else 'wb'
+    codec = resolve_codec(config)
+    level = resolve_level(config)
+
+    if codec is None:
+        return open(path, mode)
+    if codec == 'gzip':
+        return gzip.open(path, mode, compresslevel=level)
+
+    compressor = zstandard.ZstdCompressor(
+        level=level,
+        threads=config.get('COMPRESSION_THREADS', -1)  # -1 = un hilo por CPU
+    )
+    return compressor.stream_writer(open(path, mode), closefd=True)
+
+
+def open_reader(path):
+    """Abrir un backup para lectura binaria descomprimiendo de forma transparente"""
+    codec = detect_codec(path)
+    if codec is None:
+        return open(path, 'rb')
+    if codec == 'gzip':
+        return gzip.open(path, 'rb')
+    if zstandard is None:
+        raise RuntimeError(f"Se necesita el módulo zstandard para leer {path}")
+    decompressor = zstandard.ZstdDecompressor()
+    return io.BufferedReader(
+        decompressor.stream_reader(open(path, 'rb'), read_across_frames=True, closefd=True),
+        buffer_size=PIPE_CHUNK_SIZE
+    )
+
+
+def uncompressed_size(path):
+    """Tamaño del contenido sin comprimir de un archivo de backup"""
+    if detect_codec(path) is None:
+        return os.path.getsize(path)
+    with open_reader(path) as f:
+        return fastio.count_stream(f)
+
+
+def pump(stream, writer, limiter=None, digest=None):
+    """Copiar un stream binario al writer con un buffer fijo; devuelve los bytes copiados"""
+    write = limiter.paced(writer.write) if limiter else writer.write
+    return fastio.copy_stream(stream, digest.hashed(write) if digest else write)
+
+
+def run_to_file(cmd, path, config, append=False, size_hint=0, limiter=None, digest=None):
+    """
+    Ejecutar un comando volcando su stdout en path, comprimido según la configuración.
+
+    Sin compresión el proceso hereda el descriptor del archivo y escribe en él
+    directamente: los bytes no pasan por Python ni por una tubería intermedia, y
+    se reserva size_hint bytes por adelantado. Con compresión la salida se
+    comprime mientras llega, sin pasar por un archivo intermedio. Con un
+    limitador (throttle.Throttle) la salida siempre pasa por Python para
+    leerla al ritmo que marque, y lo mismo con un integrity.Digest, que calcula
+    la huella de la salida sin comprimir según se escribe.
+    """
+    if resolve_codec(config) is None and limiter is None and digest is None:
+        with open(path, 'ab' if append else 'wb') as f:
+            fastio.preallocate(f.fileno(), size_hint)
+            subprocess.run(cmd, stdout=f, check=True)
+        return
+
+    with open_writer(path, config, append=append) as writer:
+        if resolve_codec(config) is None:
+            fastio.preallocate(writer.fileno(), size_hint)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        try:
+            pump(proc.stdout, writer, limiter, digest)
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
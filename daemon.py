@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+"""
+Servicio sin interfaz gráfica: backups periódicos (o streaming), procesador
+nocturno y una pequeña API HTTP local para controlarlos.
+
+Uso: python daemon.py [backup_config.json] [puerto]
+
+La configuración es la misma que guarda la UI (backup_config.json). Con una
+lista TARGETS el servicio respalda varias bases de datos o servidores a la vez:
+cada elemento sobrescribe las claves que necesite (HOST, DB_NAME, intervalo,
+opciones nocturnas...) y tiene su propio BACKUP_DIR, archivo de estado y
+procesador nocturno:
+
+    "TARGETS": [
+        {"NAME": "ventas", "DB_NAME": "ventas"},
+        {"NAME": "crm", "HOST": "10.0.0.2", "DB_NAME": "crm", "interval_minutes": 15}
+    ]
+
+MAX_PARALLEL_BACKUPS limita los backups simultáneos en total y
+MAX_BACKUPS_PER_HOST los que van contra un mismo servidor MySQL.
+
+La API escucha en DAEMON_HOST:DAEMON_PORT (127.0.0.1:8765 por defecto):
+
+    GET  /status    estado de cada destino: bucle, streaming y procesador nocturno
+    GET  /metrics   métricas en formato de texto de Prometheus
+    POST /backup    lanzar un backup ahora
+    POST /start     arrancar el bucle automático
+    POST /stop      detenerlo
+    POST /nightly   forzar el proceso nocturno
+
+Las peticiones POST actúan sobre todos los destinos o solo sobre ?target=<nombre>
+y deben llevar "Authorization: Bearer <token>" y "Content-Type: application/json":
+
+    curl -X POST -H "Authorization: Bearer $(cat daemon_token)" \
+         -H "Content-Type: application/json" http://127.0.0.1:8765/backup
+
+El token es DAEMON_TOKEN de la configuración o, si no está, el que se genera
+al primer arranque en el archivo daemon_token junto a backup_config.json. Las
+peticiones con cabecera Origin (las que hace un navegador desde una página) se
+rechazan siempre.
+"""
+import os
+import sys
+import hmac
+import json
+import time
+import signal
+import secrets
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+# —————— CONFIGURACIÓN DEL SERVICIO ——————
+CONFIG_FILE      = 'backup_config.json'     # ← el mismo archivo que guarda la UI
+TOKEN_FILE       = 'daemon_token'           # ← junto a CONFIG_FILE; se crea al primer arranque sin DAEMON_TOKEN
+DAEMON_HOST      = '127.0.0.1'              # ← solo local; los POST piden además el token
+DAEMON_PORT      = 8765
+DEFAULT_INTERVAL = 3600                     # ← segundos entre backups si la configuración no lo indica
+MAX_PARALLEL_BACKUPS = 2                    # ← backups simultáneos en total (disco)
+MAX_BACKUPS_PER_HOST = 1                    # ← backups simultáneos contra un mismo servidor MySQL
+# ——————————————————————————
+
+
+def _target_settings(saved, name):
+    """Configuración de un destino a partir de sus claves (formato de la UI)"""
+    config = {key: value for key, value in saved.items() if key.isupper() and key != 'TARGETS'}
+    interval = int(saved.get('interval_hours', 0) or 0) * 3600 + int(saved.get('interval_minutes', 0) or 0) * 60
+    # Con ROLLING_PARTS las partes se cierran al escribir: mismo tamaño que usa el proceso nocturno
+    config.setdefault('MAX_FILE_SIZE_GB', float(saved.get('max_file_size_gb', 1)))
+
+    nightly = None
+    if saved.get('enable_nightly_processor', True):
+        nightly = {
+            'DAILY_BACKUP_DIR': saved.get('daily_backup_dir') or os.path.join(config['BACKUP_DIR'], 'daily_backups'),
+            'MAX_FILE_SIZE_GB': float(saved.get('max_file_size_gb', 1)),
+            'SPLIT_TIME': f"{int(saved.get('split_time_hour', 0)):02d}:{int(saved.get('split_time_minute', 0)):02d}",
+            'DEDUP': saved.get('dedup', False)
+        }
+    return {'name': name, 'config': config, 'interval': interval or DEFAULT_INTERVAL, 'nightly': nightly}
+
+
+def load_config(path=CONFIG_FILE):
+    """
+    Leer backup_config.json como lo guarda la UI.
+
+    Returns:
+        tuple: (claves globales del servicio, lista de destinos). Cada destino es
+        un dict con name, config (para main/process), interval (segundos entre
+        backups) y nightly (configuración nocturna o None si está deshabilitada)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        saved = json.load(f)
+    settings = {key: value for key, value in saved.items() if key.isupper()}
+
+    if not saved.get('TARGETS'):
+        return settings, [_target_settings(saved, saved.get('NAME') or saved['DB_NAME'])]
+
+    targets = []
+    for entry in saved['TARGETS']:
+        merged = dict(saved, **entry)
+        name = entry.get('NAME') or f"{merged.get('HOST', 'localhost')}_{merged['DB_NAME']}"
+        # Sin carpetas propias, cada destino cuelga de las comunes con su nombre
+        merged.setdefault('NAME', name)
+        if 'BACKUP_DIR' not in entry:
+            merged['BACKUP_DIR'] = os.path.join(saved['BACKUP_DIR'], name)
+        if 'daily_backup_dir' not in entry:
+            merged['daily_backup_dir'] = os.path.join(saved['daily_backup_dir'], name) if saved.get('daily_backup_dir') else None
+        targets.append(_target_settings(merged, name))
+
+    for key in ('name', 'BACKUP_DIR'):
+        values = [t[key] if key == 'name' else t['config'][key] for t in targets]
+        repeated = {v for v in values if values.count(v) > 1}
+        if repeated:
+            raise ValueError(f"Destinos con el mismo {key}: {', '.join(sorted(map(str, repeated)))}")
+    return settings, targets
+
+
+def load_token(settings, config_path=CONFIG_FILE):
+    """
+    Token de la API: DAEMON_TOKEN de la configuración o el guardado en TOKEN_FILE.
+
+    Si no hay ninguno se genera y se guarda, legible solo por el usuario. Va en
+    un archivo aparte porque la UI reescribe backup_config.json con sus claves.
+    """
+    if settings.get('DAEMON_TOKEN'):
+        return settings['DAEMON_TOKEN']
+    path = os.path.join(os.path.dirname(os.path.abspath(config_path)), TOKEN_FILE)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            token = f.read().strip()
+        if token:
+            return token
+
+    token = secrets.token_urlsafe(32)
+    with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding='utf-8') as f:
+        f.write(token + "\n")
+    print(f"🔑 Token de la API generado en {path}")
+    return token
+
+
+class BackupSlots:
+    """Límites de backups simultáneos: en total y por servidor MySQL"""
+
+    def __init__(self, max_parallel=MAX_PARALLEL_BACKUPS, max_per_host=MAX_BACKUPS_PER_HOST):
+        self.max_parallel = max_parallel
+        self.total = threading.BoundedSemaphore(max_parallel)
+        self.max_per_host = max_per_host
+        self.hosts = {}
+        self.lock = threading.Lock()
+        self.active = 0
+
+    @contextmanager
+    def slot(self, config):
+        """Esperar turno para el servidor del destino y después para el disco"""
+        host = f"{config.get('HOST', 'localhost')}:{config.get('PORT', 3306)}"
+        with self.lock:
+            per_host = self.hosts.setdefault(host, threading.BoundedSemaphore(self.max_per_host))
+        # Primero el servidor: así no se ocupa un turno global esperando a un servidor ya atareado
+        with per_host, self.total:
+            with self.lock:
+                self.active += 1
+            try:
+                yield
+            finally:
+                with self.lock:
+                    self.active -= 1
+
+
+class BackupDaemon:
+    """
+    Bucle de backups de un destino, sin Tk.
+
+    Cumple la interfaz de controlador que espera NightlyProcessor
+    (is_running, stop/start_automatic_backup, is_backup_in_progress), así que
+    el proceso nocturno puede detener y reanudar el bucle igual que con la UI.
+    """
+
+    def __init__(self, config, interval, nightly_config=None, name=None, slots=None):
+        self.config = config
+        self.interval = interval
+        self.nightly_config = nightly_config
+        self.name = name or config['DB_NAME']
+        self.slots = slots or BackupSlots()
+        self.is_running = False
+        self.started_at = time.time()
+
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()     # adelanta el siguiente backup del bucle
+        self.backup_lock = threading.Lock()
+        self.worker = None
+        self.binlog_streamer = None
+        self.nightly_processor = None
+
+        self.stats = {
+            'ok': 0,
+            'error': 0,
+            'last_start': None,
+            'last_end': None,
+            'last_duration': None,
+            'last_error': None
+        }
+
+    # ——— Interfaz de controlador del procesador nocturno ———
+
+    def start_automatic_backup(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.wake_event.clear()
+        self.stop_event = threading.Event()     # cada bucle tiene el suyo: uno anterior que aún duerma no revive
+        self.worker = threading.Thread(target=self._loop, args=(self.stop_event,), daemon=True)
+        self.worker.start()
+        print(f"🚀 [{self.name}] Backup automático {'en streaming' if self.config.get('STREAMING') else f'cada {self.interval}s'}")
+
+    def stop_automatic_backup(self):
+        self.is_running = False
+        self.stop_event.set()
+        self.wake_event.set()
+        # Igual que en la UI: el streaming se detiene aquí para dejar un checkpoint coherente
+        if self.binlog_streamer:
+            self.binlog_streamer.stop()
+        print(f"⏹️ [{self.name}] Deteniendo backup automático...")
+
+    def is_backup_in_progress(self):
+        return self.backup_lock.locked()
+
+    def backup_slot(self):
+        """Turno de los límites de concurrencia (también lo pide el proceso nocturno)"""
+        return self.slots.slot(self.config)
+
+    # ——— Backups ———
+
+    def perform_backup(self, stop_event=None):
+        """Ejecutar un backup (completo o incremental) si no hay otro en curso"""
+        import main  # Importar aquí para evitar dependencias circulares
+
+        if not self.backup_lock.acquire(blocking=False):
+            return False
+        try:
+            with self.backup_slot():
+                if stop_event is not None and stop_event.is_set():
+                    return False    # detenido mientras esperaba turno
+                self.stats['last_start'] = time.time()
+                try:
+                    main.main(dict(self.config))
+                    self.stats['ok'] += 1
+                    self.stats['last_error'] = None
+                    print(f"✅ [{self.name}] Backup completado exitosamente")
+                except Exception as e:
+                    self.stats['error'] += 1
+                    self.stats['last_error'] = str(e)
+                    print(f"❌ [{self.name}] Error durante el backup: {e}")
+                finally:
+                    self.stats['last_end'] = time.time()
+                    self.stats['last_duration'] = self.stats['last_end'] - self.stats['last_start']
+        finally:
+            self.backup_lock.release()
+        return True
+
+    def trigger_backup(self):
+        """Backup inmediato desde la API (en segundo plano)"""
+        if self.is_backup_in_progress():
+            return False, "Ya hay un backup en curso"
+        if self.binlog_streamer and self.binlog_streamer.is_running():
+            return False, "El streaming de binlog está activo; el backup es continuo"
+        if self.is_running:
+            self.wake_event.set()
+        else:
+            threading.Thread(target=self.perform_backup, daemon=True).start()
+        return True, "Backup lanzado"
+
+    def _loop(self, stop_event):
+        self.perform_backup(stop_event)
+
+        if not stop_event.is_set() and self.config.get('STREAMING'):
+            self._stream(stop_event)
+            return
+
+        while not stop_event.is_set():
+            self.wake_event.wait(self.interval)
+            self.wake_event.clear()
+            if not stop_event.is_set():
+                print(f"⏰ [{self.name}] Ejecutando backup programado...")
+                self.perform_backup(stop_event)
+        print(f"⏹️ [{self.name}] Backup automático detenido")
+
+    def _stream(self, stop_event):
+        import main
+        from binlog_stream import BinlogStreamer
+
+        backup_file, state_file = main.backup_paths(self.config)
+        self.binlog_streamer = BinlogStreamer(self.config, backup_file, state_file)
+        self.binlog_streamer.start()
+        print(f"📡 [{self.name}] Streaming continuo de binlog activo")
+        stop_event.wait()
+        self.binlog_streamer.stop()
+        self.binlog_streamer = None
+        print(f"⏹️ [{self.name}] Streaming de binlog detenido")
+
+    # ——— Procesador nocturno ———
+
+    def start_nightly_processor(self):
+        if not self.nightly_config:
+            return
+        from process import create_nightly_processor
+
+        os.makedirs(self.nightly_config['DAILY_BACKUP_DIR'], exist_ok=True)
+        processor_config = dict(self.config, **self.nightly_config)
+        self.nightly_processor = create_nightly_processor(processor_config)
+        self.nightly_processor.set_main_controller(self)
+        self.nightly_processor.start_nightly_processor()
+
+    def force_nightly(self):
+        if not self.nightly_processor:
+            return False, "No hay procesador nocturno activo"
+        self.nightly_processor.force_nightly_process()
+        return True, "Proceso nocturno lanzado"
+
+    # ——— Estado y métricas ———
+
+    def _backup_file_size(self):
+        import main
+        import rolling
+
+        backup_file, _ = main.backup_paths(self.config)
+        return rolling.disk_size(backup_file)
+
+    def get_status(self):
+        import main
+
+        _, state_file = main.backup_paths(self.config)
+        stamp = lambda t: datetime.fromtimestamp(t).isoformat(timespec='seconds') if t else None
+        return {
+            "running": self.is_running,
+            "host": self.config.get('HOST'),
+            "database": self.config.get('DB_NAME'),
+            "backup_dir": self.config['BACKUP_DIR'],
+            "mode": "streaming" if self.config.get('STREAMING') else "interval",
+            "interval_seconds": self.interval,
+            "backup_in_progress": self.is_backup_in_progress(),
+            "backups_ok": self.stats['ok'],
+            "backups_failed": self.stats['error'],
+            "last_backup_start": stamp(self.stats['last_start']),
+            "last_backup_end": stamp(self.stats['last_end']),
+            "last_backup_seconds": self.stats['last_duration'],
+            "last_error": self.stats['last_error'],
+            "backup_file_bytes": self._backup_file_size(),
+            "binlog_state": main.load_state(state_file),
+            "streaming": self.binlog_streamer.get_status() if self.binlog_streamer else None,
+            "nightly": self.nightly_processor.get_status() if self.nightly_processor else None
+        }
+
+    def get_metrics(self):
+        """Muestras (nombre, tipo, valor) de Prometheus de este destino"""
+        samples = [
+            ('helen_backups_total{result="ok"}', 'counter', self.stats['ok']),
+            ('helen_backups_total{result="error"}', 'counter', self.stats['error']),
+            ('helen_backup_in_progress', 'gauge', int(self.is_backup_in_progress())),
+            ('helen_automatic_running', 'gauge', int(self.is_running)),
+            ('helen_backup_file_bytes', 'gauge', self._backup_file_size())
+        ]
+        if self.stats['last_end']:
+            samples += [
+                ('helen_last_backup_timestamp_seconds', 'gauge', f"{self.stats['last_end']:.0f}"),
+                ('helen_last_backup_duration_seconds', 'gauge', f"{self.stats['last_duration']:.3f}")
+            ]
+        if self.binlog_streamer:
+            samples.append(('helen_streaming_transactions_total', 'counter',
+                            self.binlog_streamer.get_status()["transactions"]))
+        return samples
+
+    def shutdown(self):
+        if self.nightly_processor:
+            self.nightly_processor.stop_nightly_processor()
+        self.stop_automatic_backup()
+
+
+class BackupService:
+    """Todos los destinos de la configuración con los límites de concurrencia comunes"""
+
+    def __init__(self, settings, targets):
+        self.settings = settings
+        self.started_at = time.time()
+        self.slots = BackupSlots(int(settings.get('MAX_PARALLEL_BACKUPS', MAX_PARALLEL_BACKUPS)),
+                                 int(settings.get('MAX_BACKUPS_PER_HOST', MAX_BACKUPS_PER_HOST)))
+        self.daemons = {t['name']: BackupDaemon(t['config'], t['interval'], t['nightly'], t['name'], self.slots)
+                        for t in targets}
+
+    def select(self, name=None):
+        """Destinos sobre los que actuar: todos o el indicado (KeyError si no existe)"""
+        return list(self.daemons.values()) if name is None else [self.daemons[name]]
+
+    def start(self):
+        for daemon in self.daemons.values():
+            daemon.start_nightly_processor()
+            daemon.start_automatic_backup()
+
+    def shutdown(self):
+        for daemon in self.daemons.values():
+            daemon.shutdown()
+
+    def get_status(self):
+        return {
+            "targets": {name: daemon.get_status() for name, daemon in self.daemons.items()},
+            "active_backups": self.slots.active,
+            "max_parallel_backups": self.slots.max_parallel,
+            "max_backups_per_host": self.slots.max_per_host,
+            "uptime_seconds": round(time.time() - self.started_at)
+        }
+
+    def get_metrics(self):
+        """Métricas de todos los destinos en formato de texto de Prometheus"""
+        types = {}
+        lines = {}
+        for name, daemon in self.daemons.items():
+            for metric, kind, value in daemon.get_metrics():
+                base, _, labels = metric.partition('{')
+                labels = f'target="{name}"' + (',' + labels.rstrip('}') if labels else '')
+                types[base] = kind
+                lines.setdefault(base, []).append(f"{base}{{{labels}}} {value}")
+
+        output = []
+        for base, samples in lines.items():
+            output.append(f"# TYPE {base} {types[base]}")
+            output += samples
+        output += [
+            '# TYPE helen_active_backups gauge',
+            f'helen_active_backups {self.slots.active}',
+            '# TYPE helen_uptime_seconds gauge',
+            f'helen_uptime_seconds {time.time() - self.started_at:.0f}'
+        ]
+        try:
+            import resource
+            rss_unit = 1 if sys.platform == 'darwin' else 1024
+            output += [
+                '# TYPE helen_peak_rss_bytes gauge',
+                f'helen_peak_rss_bytes {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * rss_unit}'
+            ]
+        except ImportError:
+            pass    # Windows
+        return "\n".join(output) + "\n"
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    """Peticiones de la API local; server.backup_service es el BackupService"""
+
+    ACTIONS = {
+        '/backup': lambda d: d.trigger_backup(),
+        '/nightly': lambda d: d.force_nightly(),
+        '/start': lambda d: (d.start_automatic_backup(), (True, "Backup automático en marcha"))[1],
+        '/stop': lambda d: (d.stop_automatic_backup(), (True, "Backup automático detenido"))[1]
+    }
+
+    def _send(self, code, body, content_type='application/json'):
+        data = body.encode('utf-8') if isinstance(body, str) else json.dumps(body, default=str).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        service = self.server.backup_service
+        path = urlsplit(self.path).path
+        if path == '/status':
+            self._send(200, service.get_status())
+        elif path == '/metrics':
+            self._send(200, service.get_metrics(), 'text/plain; version=0.0.4')
+        else:
+            self._send(404, {"error": "Ruta desconocida"})
+
+    def do_POST(self):
+        service = self.server.backup_service
+        # Un navegador manda Origin y no puede poner application/json sin preflight (que aquí no se atiende)
+        if self.headers.get('Origin') is not None:
+            self._send(403, {"error": "Peticiones desde navegador no permitidas"})
+            return
+        if self.headers.get_content_type() != 'application/json':
+            self._send(415, {"error": "Se espera Content-Type: application/json"})
+            return
+        token = service.settings.get('DAEMON_TOKEN')
+        if not token or not hmac.compare_digest(self.headers.get('Authorization', ''), f"Bearer {token}"):
+            self._send(401, {"error": "Token inválido"})
+            return
+
+        url = urlsplit(self.path)
+        action = self.ACTIONS.get(url.path)
+        if action is None:
+            self._send(404, {"error": "Ruta desconocida"})
+            return
+        target = parse_qs(url.query).get('target', [None])[0]
+        try:
+            daemons = service.select(target)
+        except KeyError:
+            self._send(404, {"error": f"Destino desconocido: {target}"})
+            return
+
+        results = {}
+        for daemon in daemons:
+            ok, message = action(daemon)
+            results[daemon.name] = {"ok": ok, "message": message}
+        accepted = any(r["ok"] for r in results.values())
+        self._send(202 if accepted else 409, {"ok": accepted, "targets": results})
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+
+def serve(service, host=DAEMON_HOST, port=DAEMON_PORT):
+    """Servidor HTTP de la API (ya escuchando) que atiende en un hilo propio"""
+    server = ThreadingHTTPServer((host, port), _ApiHandler)
+    server.daemon_threads = True
+    server.backup_service = service
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🌐 API local en http://{host}:{server.server_address[1]}")
+    return server
+
+
+def run_daemon(config_path=CONFIG_FILE, port=None):
+    settings, targets = load_config(config_path)
+    settings['DAEMON_TOKEN'] = load_token(settings, config_path)
+    service = BackupService(settings, targets)
+    server = serve(service, settings.get('DAEMON_HOST', DAEMON_HOST), port or int(settings.get('DAEMON_PORT', DAEMON_PORT)))
+
+    stopped = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopped.set())
+
+    service.start()
+    print(f"🛡️ Servicio de backup en marcha con {len(targets)} destino(s) (Ctrl+C para salir)")
+    while not stopped.wait(1):
+        pass
+
+    print("🛑 Deteniendo servicio...")
+    server.shutdown()
+    service.shutdown()
+
+
+if __name__ == "__main__":
+    run_daemon(sys.argv[1] if len(sys.argv) > 1 else CONFIG_FILE,
+               int(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,334 @@
+import os
+import re
+import queue
+import atexit
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import pymysql  # Opcional: pip install pymysql
+except ImportError:
+    pymysql = None
+
+# —————— CONFIGURACIÓN DEL CLIENTE ——————
+POOL_SIZE       = 4                         # ← conexiones abiertas como máximo por servidor
+CONNECT_TIMEOUT = 10
+SENTINEL        = '__helen_fin__'
+LOST_CODES      = (2006, 2013, 2055)        # ← "server has gone away" / "lost connection"
+# ——————————————————————————
+
+_XML_ENTITIES = {'&lt;': '<', '&gt;': '>', '&amp;': '&', '&quot;': '"', '&#0;': '\0'}
+_XML_ENTITY = re.compile('|'.join(_XML_ENTITIES))
+
+_pools = {}
+_pools_lock = threading.Lock()
+_credential_files = {}
+_credential_files_lock = threading.Lock()
+
+
+class QueryError(RuntimeError):
+    """Error al ejecutar una consulta"""
+
+
+class ConnectionLost(QueryError):
+    """La conexión se cerró; la consulta puede reintentarse con otra"""
+
+
+def literal(value):
+    """Literal SQL escapado para el backend de línea de comandos"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def credentials_file(config):
+    """
+    Archivo de opciones temporal con usuario y contraseña.
+
+    Se pasa con --defaults-extra-file a mysql, mysqldump y mysqlbinlog para que la
+    contraseña no aparezca en la línea de comandos. Se crea una vez por
+    credenciales y se borra al salir.
+    """
+    password = config.get('PASSWORD') or ''
+    key = (config['USER'], password)
+    with _credential_files_lock:   # varios destinos hacen backup a la vez
+        path = _credential_files.get(key)
+        if path is None or not os.path.exists(path):
+            fd, path = tempfile.mkstemp(prefix='helen_', suffix='.cnf')  # permisos 0600
+            escaped = password.replace('\\', '\\\\').replace('"', '\\"')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(f'[client]\nuser="{config["USER"]}"\npassword="{escaped}"\n')
+            _credential_files[key] = path
+    return path
+
+
+def _remove_credential_files():
+    for path in _credential_files.values():
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+atexit.register(_remove_credential_files)
+
+
+class CliConnection:
+    """
+    Conexión persistente a través de un único proceso mysql.
+
+    Se usa cuando PyMySQL no está instalado: las consultas se envían por stdin y
+    cada respuesta se delimita con un SELECT centinela, así que un mismo proceso
+    (y un único handshake) sirve para todas las consultas de la conexión.
+
+    La salida es XML (-X) y no la de -B: en -B un NULL y la cadena 'NULL' salen
+    igual y los tabuladores y saltos de línea de los valores llegan escapados.
+    En XML un NULL lleva xsi:nil y '<' siempre va escapado, así que cada línea
+    que empieza por <row>, <field> o </row> es de verdad una etiqueta.
+
+    Con --force un error de SQL no termina el cliente: el error sale por stderr
+    y tras el centinela de stdout va otro que falla a propósito (SELECT de una
+    columna que no existe), cuyo error marca en stderr el final de la consulta.
+    Si se pierde la conexión se mata el proceso en lugar de dejar que el
+    cliente abra otra sesión por su cuenta (perdería bloqueos y variables).
+    """
+
+    def __init__(self, config):
+        import main  # Importar aquí para evitar dependencias circulares
+
+        cmd = [main.tool_path('mysql'), *main.connection_args(config),
+               "-X", "-n", "--force", "--skip-reconnect"]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.errors = queue.Queue()     # líneas de stderr; None cuando el proceso termina
+        self.stderr = []                # las mismas sin los centinelas, para cuando termine
+        self.lost = None
+        self.reader = threading.Thread(target=self._read_errors, daemon=True)
+        self.reader.start()
+
+    def _read_errors(self):
+        for line in self.proc.stderr:
+            text = line.decode('utf-8', 'replace').strip()
+            if any(text.startswith(f"ERROR {code} ") for code in LOST_CODES):
+                self.lost = text
+                self.proc.kill()
+            if text and SENTINEL not in text:
+                self.stderr.append(text)
+            self.errors.put(text)
+        self.errors.put(None)
+
+    def query(self, sql, args=None):
+        """Ejecutar una sentencia y devolver sus filas como tuplas de texto"""
+        if self.lost:
+            raise ConnectionLost(self.lost)
+        if args:
+            sql = sql % tuple(literal(a) for a in args)
+        try:
+            self.proc.stdin.write(f"{sql};\nSELECT '{SENTINEL}';\nSELECT {SENTINEL};\n".encode('utf-8'))
+            self.proc.stdin.flush()
+        except OSError:
+            raise ConnectionLost(self._failure())
+
+        rows = self._read_rows()
+        errors = []
+        while True:
+            text = self.errors.get()
+            if text is None:
+                raise self._died()
+            if SENTINEL in text:
+                break
+            if text.startswith('ERROR'):
+                errors.append(text)
+        if errors:
+            raise QueryError("\n".join(errors))
+        return rows
+
+    def _read_rows(self):
+        """Filas de los resultados XML hasta el del centinela, incluido su </resultset>"""
+        rows, row, field = [], None, None
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                raise self._died()
+            text = line.decode('utf-8')
+            if field is not None:
+                field += text               # valor con saltos de línea
+            elif text.startswith('\t<field name="'):
+                if text.rstrip('\r\n').endswith('xsi:nil="true" />'):
+                    row.append(None)
+                    continue
+                field = text[text.index('">') + 2:]
+            elif text == '  <row>\n':
+                row = []
+                continue
+            elif text == '  </row>\n':
+                if row == [SENTINEL]:
+                    while not text.rstrip('\r\n').endswith('</resultset>'):
+                        text = self.proc.stdout.readline().decode('utf-8')
+                        if not text:
+                            raise self._died()
+                    return rows
+                rows.append(tuple(row))
+                continue
+            else:
+                continue                    # <?xml?>, <resultset statement="..."> y su cierre
+            end = field.rfind('</field>')
+            if end >= 0:
+                row.append(_XML_ENTITY.sub(lambda m: _XML_ENTITIES[m.group(0)], field[:end]))
+                field = None
+
+    def _failure(self):
+        """Lo que el proceso terminado dejó en stderr"""
+        self.proc.wait()
+        self.reader.join()
+        return "\n".join(self.stderr)
+
+    def _died(self):
+        error = self._failure()
+        if self.lost or any(f"ERROR {code}" in error for code in LOST_CODES):
+            return ConnectionLost(self.lost or error)
+        return QueryError(error or "El cliente mysql terminó inesperadamente")
+
+    def alive(self):
+        return self.lost is None and self.proc.poll() is None
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=10)
+        except Exception:
+            self.proc.kill()
+
+
+class PyMySQLConnection:
+    """Conexión nativa por el protocolo de MySQL usando PyMySQL"""
+
+    def __init__(self, config):
+        try:
+            self.conn = pymysql.connect(
+                host=config['HOST'],
+                port=int(config['PORT']),
+                user=config['USER'],
+                password=config.get('PASSWORD') or '',
+                connect_timeout=CONNECT_TIMEOUT,
+                charset='utf8mb4',
+                autocommit=True
+            )
+        except pymysql.err.MySQLError as e:
+            raise QueryError(str(e))
+
+    def query(self, sql, args=None):
+        """Ejecutar una sentencia y devolver sus filas como tuplas"""
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute(sql, args)
+                return [tuple(row) for row in cursor.fetchall()] if cursor.description else []
+        except pymysql.err.OperationalError as e:
+            if e.args and e.args[0] in LOST_CODES:
+                raise ConnectionLost(str(e))
+            raise QueryError(str(e))
+        except pymysql.err.MySQLError as e:
+            raise QueryError(str(e))
+
+    def alive(self):
+        try:
+            self.conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def close(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+def connect(config):
+    """Abrir una conexión nueva con el backend configurado (DB_CLIENT: auto, pymysql o cli)"""
+    backend = config.get('DB_CLIENT', 'auto')
+    if backend == 'pymysql' and pymysql is None:
+        raise RuntimeError("DB_CLIENT='pymysql' pero el módulo pymysql no está instalado")
+    if backend == 'pymysql' or (backend == 'auto' and pymysql is not None):
+        return PyMySQLConnection(config)
+    return CliConnection(config)
+
+
+class ConnectionPool:
+    """Pool acotado de conexiones reutilizadas entre ejecuciones programadas"""
+
+    def __init__(self, config, size=POOL_SIZE):
+        self.config = dict(config)
+        self.idle = []
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """Tomar una conexión del pool; si falla se descarta en lugar de devolverse"""
+        self.slots.acquire()
+        conn = None
+        try:
+            conn = self._take()
+            yield conn
+        except BaseException:
+            if conn is not None:
+                conn.close()
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                with self.lock:
+                    self.idle.append(conn)
+            self.slots.release()
+
+    def _take(self):
+        with self.lock:
+            while self.idle:
+                conn = self.idle.pop()
+                if conn.alive():
+                    return conn
+                conn.close()
+        return connect(self.config)
+
+    def query(self, sql, args=None):
+        """Ejecutar una consulta con una conexión del pool, reintentando si estaba caída"""
+        try:
+            with self.connection() as conn:
+                return conn.query(sql, args)
+        except ConnectionLost:
+            with self.connection() as conn:
+                return conn.query(sql, args)
+
+    def close(self):
+        with self.lock:
+            for conn in self.idle:
+                conn.close()
+            self.idle = []
+
+
+def get_pool(config):
+    """Pool compartido para un servidor y usuario; se crea la primera vez que se pide"""
+    key = (config['HOST'], int(config['PORT']), config['USER'], config.get('PASSWORD') or '',
+           config.get('DB_CLIENT', 'auto'))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(config, config.get('DB_POOL_SIZE', POOL_SIZE))
+        return pool
+
+
+def query(config, sql, args=None):
+    """Atajo: ejecutar una consulta con el pool del servidor configurado"""
+    return get_pool(config).query(sql, args)
+
+
+def close_all():
+    """Cerrar todas las conexiones en reposo de todos los pools"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
@@ -0,0 +1,303 @@
+"""
+Sacar tablas sueltas de un backup ya guardado sin recorrerlo entero.
+
+La primera vez se construye un índice de secciones del volcado (cabecera,
+cada tabla, pie) con desplazamientos sin comprimir, y se guarda junto al
+backup: table_index.json en la carpeta del día, o <archivo>.tables.json al
+lado de un backup.sql suelto. Las siguientes extracciones lo reutilizan
+mientras los archivos no cambien y van directamente a los bytes de cada
+tabla: sin comprimir se salta con seek, comprimido se descomprime solo la
+parte donde empieza la tabla.
+
+Vale para carpetas de daily_backups (partes por tamaño o por tabla, o
+repositorio deduplicado), carpetas con backup_part_*.sql sin
+backup_info.json y archivos backup.sql. El índice se construye buscando los
+comentarios de sección de mysqldump en bloques grandes y se para al
+empezar el binlog del día, que no tiene tablas.
+"""
+import os
+import re
+import sys
+import json
+import glob
+import chunkstore
+import compression
+import fastio
+import pitr
+from parallel_dump import TABLE_MARKER, FOOTER_MARKER
+from restore import SERIAL_MARKERS, TAIL_MARKERS, INFO_FILE_NAME
+
+# —————— CONFIGURACIÓN DE LA EXTRACCIÓN ——————
+INDEX_NAME    = 'table_index.json'          # ← en la carpeta del día
+INDEX_SUFFIX  = '.tables.json'              # ← junto a un backup.sql suelto
+INDEX_VERSION = 2                           # ← 2: los días por tablas guardan también el pie
+HEADER_MARKERS = (b'-- MySQL dump', b'-- MariaDB dump')
+END_MARKER     = b'-- Dump completed'       # ← lo que sigue (comentarios de mysqlbinlog) ya no es del pie
+# ——————————————————————————
+
+# Principios de línea donde acaba una sección del volcado y empieza otra
+_KINDS = [(TABLE_MARKER, 'table'), (FOOTER_MARKER, 'footer'), (END_MARKER, 'end')]
+_KINDS += [(marker, 'header') for marker in HEADER_MARKERS]
+_KINDS += [(marker, 'serial') for marker in SERIAL_MARKERS]
+_KINDS += [(marker, 'tail') for marker in TAIL_MARKERS]
+_SECTION = re.compile(rb'\n(' + rb'|'.join(re.escape(marker) for marker, _ in _KINDS) + rb')')
+_LOOKAHEAD = max(len(marker) for marker, _ in _KINDS) + 256     # marcador y nombre de la tabla
+
+
+class _Day:
+    """Un backup guardado: sus archivos en orden (o el repositorio deduplicado) y dónde va su índice"""
+
+    def __init__(self, target):
+        self.target = target
+        self.info = None
+        if os.path.isdir(target):
+            self.folder = target
+            self.cache = os.path.join(target, INDEX_NAME)
+            info_file = os.path.join(target, INFO_FILE_NAME)
+            if os.path.exists(info_file):
+                with open(info_file, 'r', encoding='utf-8') as f:
+                    self.info = json.load(f)
+            if self.info and self.info.get('storage') == 'dedup':
+                self.paths = [os.path.join(target, chunkstore.MANIFEST_NAME)]
+            elif self.info:
+                self.paths = [os.path.join(target, f['filename']) for f in self.info['files']]
+            else:
+                self.paths = sorted(glob.glob(os.path.join(glob.escape(target), 'backup_part_*.sql*')))
+        else:
+            self.folder = os.path.dirname(os.path.abspath(target))
+            self.cache = target + INDEX_SUFFIX
+            self.paths = [target]
+        if not self.paths:
+            raise FileNotFoundError(f"No hay partes de backup en {target}")
+
+    @property
+    def dedup(self):
+        return bool(self.info) and self.info.get('storage') == 'dedup'
+
+    def signature(self):
+        """Nombre, tamaño y fecha de modificación de cada archivo: si cambian, el índice no vale"""
+        return [[os.path.basename(p), os.path.getsize(p), os.stat(p).st_mtime_ns] for p in self.paths]
+
+    def streams(self):
+        """Stream de cada archivo en orden (el repositorio deduplicado es uno solo)"""
+        if self.dedup:
+            with chunkstore.open_day(self.info['chunk_store'], self.folder) as src:
+                yield src
+            return
+        for path in self.paths:
+            with compression.open_reader(path) as src:
+                yield src
+
+    def open_at(self, starts, offset):
+        """Líneas del día desde el desplazamiento offset (principio de línea)"""
+        if self.dedup:
+            return pitr.open_at(self.folder, self.info, offset)
+        files = [{"filename": os.path.basename(p), "offset": start} for p, start in zip(self.paths, starts)]
+        return pitr.open_at(os.path.dirname(self.paths[0]), {"files": files}, offset)
+
+
+def _scan(src, base, found):
+    """
+    Apuntar en found los principios de sección de src como (desplazamiento, tipo, línea).
+
+    base es el desplazamiento de src en el día. Devuelve (bytes leídos, True si
+    se llegó al binlog): lo que sigue ya no es parte del volcado.
+    """
+    buffer = fastio.aligned_buffer()
+    view = memoryview(buffer)
+    pending = b'\n'             # cada archivo empieza en principio de línea
+    origin = base - 1           # desplazamiento en el día de pending[0]
+    read = 0
+    try:
+        while True:
+            n = src.readinto(view)
+            window = pending + view[:n].tobytes() if n else pending
+            limit = len(window) - _LOOKAHEAD if n else len(window)
+            pos = 0
+            while True:
+                match = _SECTION.search(window, pos)
+                if not match or match.start() >= limit:
+                    break
+                line_end = window.find(b'\n', match.start(1))
+                line = window[match.start(1):line_end if line_end >= 0 else len(window)]
+                kind = next(k for marker, k in _KINDS if line.startswith(marker))
+                found.append((origin + match.start(1), kind, line.decode('utf-8', 'replace')))
+                if kind == 'tail':
+                    return read + n, True
+                pos = match.start(1)
+            if not n:
+                return read, False
+            read += n
+            limit = max(limit, 0)
+            pending = window[limit:]
+            origin += limit
+    finally:
+        view.release()
+
+
+def build_index(day):
+    """
+    Recorrer el backup una vez y devolver su índice de secciones.
+
+    Returns:
+        dict: starts (desplazamiento sin comprimir de cada archivo), header y
+        footer como [inicio, fin], y tables con los tramos [inicio, fin] de cada tabla
+    """
+    found, starts, offset = [], [], 0
+    for src in day.streams():
+        starts.append(offset)
+        read, tail = _scan(src, offset, found)
+        offset += read
+        if tail:
+            break
+    end = found[-1][0] if found and found[-1][1] == 'tail' else offset
+
+    index = {"version": INDEX_VERSION, "signature": day.signature(), "starts": starts,
+             "header": None, "footer": None, "tables": {}}
+    bounds = [0] + [position for position, _, _ in found] + [end]
+    kinds = ['header'] + [kind for _, kind, _ in found]
+    lines = [''] + [line for _, _, line in found]
+    for start, stop, kind, line in zip(bounds, bounds[1:], kinds, lines):
+        if stop <= start:
+            continue
+        if kind == 'table':
+            name = line[len(TABLE_MARKER):].rstrip('\r').rstrip('`')
+            index['tables'].setdefault(name, []).append([start, stop])
+        elif kind in ('header', 'footer') and index[kind] is None:
+            index[kind] = [start, stop]
+    return index
+
+
+def _layout_footer(day, after):
+    """
+    Tramo del pie en un día dividido por tablas: empieza la primera parte
+    posterior a las tablas y acaba en "-- Dump completed" (o donde empieza el binlog).
+    Solo se leen las primeras líneas de esa parte.
+    """
+    stops = tuple(marker for marker, kind in _KINDS if kind in ('end', 'tail', 'header'))
+    for path, entry in zip(day.paths, day.info['files']):
+        if entry['offset'] < after:
+            continue
+        with compression.open_reader(path) as src:
+            line = src.readline()
+            if not line.startswith(FOOTER_MARKER):
+                continue
+            length = 0
+            while line and not line.startswith(stops):
+                length += len(line)
+                line = src.readline()
+        return [entry['offset'], entry['offset'] + length]
+    return None
+
+
+def _layout_index(day):
+    """Índice sacado de backup_info.json si el día se dividió con SPLIT_LAYOUT 'table'"""
+    if not day.info or day.info.get('layout') != 'table' or day.dedup:
+        return None
+    starts = [f['offset'] for f in day.info['files']]
+    tables = {}
+    for table in day.info['tables']:
+        tables.setdefault(table['name'], []).append([table['offset'], table['offset'] + table['content_bytes']])
+    first = min((table['offset'] for table in day.info['tables']), default=0)
+    last = max((end for spans in tables.values() for _, end in spans), default=0)
+    return {"version": INDEX_VERSION, "signature": day.signature(), "starts": starts,
+            "header": [0, first] if first else None, "footer": _layout_footer(day, last), "tables": tables}
+
+
+def load_index(day):
+    """Índice del backup: el guardado si sigue valiendo, el de backup_info.json o uno nuevo"""
+    signature = day.signature()
+    if os.path.exists(day.cache):
+        try:
+            with open(day.cache, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION and index.get('signature') == signature:
+                return index
+        except (OSError, ValueError):
+            pass
+
+    index = _layout_index(day)
+    if index is None:
+        print(f"🔎 Indexando tablas de {day.target}...", file=sys.stderr)
+        index = build_index(day)
+    try:
+        tmp = day.cache + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp, day.cache)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el índice de tablas: {e}", file=sys.stderr)
+    return index
+
+
+def _copy(day, index, span, write):
+    """Escribir el tramo [inicio, fin] del día; los tramos empiezan y acaban en principio de línea"""
+    start, end = span
+    position = start
+    with day.open_at(index['starts'], start) as lines:
+        for line in lines:
+            if position >= end:
+                break
+            write(line)
+            position += len(line)
+
+
+def extract_tables(target, tables, write):
+    """
+    Escribir la cabecera del volcado, la estructura y datos de cada tabla y el pie.
+
+    target es la carpeta de un día o un backup.sql; write recibe el SQL por
+    bloques, en orden. Error si alguna tabla no está en el backup.
+
+    Returns:
+        int: bytes escritos
+    """
+    day = _Day(target)
+    index = load_index(day)
+    missing = [name for name in tables if name not in index['tables']]
+    if missing:
+        raise KeyError(f"Tablas que no están en el backup: {', '.join(missing)}")
+
+    written = 0
+
+    def counted(data):
+        nonlocal written
+        write(data)
+        written += len(data)
+
+    spans = [index['header']] if index['header'] else []
+    spans += [span for name in tables for span in index['tables'][name]]
+    spans += [index['footer']] if index['footer'] else []
+    for span in spans:
+        _copy(day, index, span, counted)
+    return written
+
+
+def list_tables(target):
+    """Tablas del backup con sus bytes sin comprimir"""
+    index = load_index(_Day(target))
+    return {name: sum(end - start for start, end in spans) for name, spans in index['tables'].items()}
+
+
+if __name__ == "__main__":
+    # Uso: python extract.py <carpeta_del_día | backup.sql> <tabla,tabla... | --list> [salida.sql]
+    if len(sys.argv) < 3:
+        print("Uso: python extract.py <carpeta_del_día | backup.sql> <tabla,tabla... | --list> [salida.sql]")
+        sys.exit(1)
+
+    if sys.argv[2] == '--list':
+        for table_name, size in sorted(list_tables(sys.argv[1]).items()):
+            print(f"{table_name}\t{size:,}")
+        sys.exit(0)
+
+    names = [name for name in sys.argv[2].split(',') if name]
+    out = open(sys.argv[3], 'wb') if len(sys.argv) > 3 else sys.stdout.buffer
+    try:
+        total = extract_tables(sys.argv[1], names, out.write)
+    except KeyError as e:
+        print(f"❌ {e.args[0]}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    print(f"✅ {len(names)} tablas extraídas ({total / 1024**2:.1f} MB)", file=sys.stderr)
@@ -0,0 +1,164 @@
+import os
+import sys
+import mmap
+
+# —————— CONFIGURACIÓN DE E/S ——————
+BUFFER_SIZE        = 4 * 1024 * 1024        # ← múltiplo del tamaño de página
+FALLOC_FL_KEEP_SIZE = 0x01
+# ——————————————————————————
+
+_libc = None
+
+
+def aligned_buffer(size=BUFFER_SIZE):
+    """
+    Buffer reutilizable alineado a página.
+
+    Se reserva con mmap anónimo, así que la dirección está alineada y el bloque
+    no vive en el heap de Python; se usa con readinto()/memoryview para que los
+    datos nunca se conviertan en objetos bytes/str por cada bloque leído.
+    """
+    size = max(mmap.PAGESIZE, size - size % mmap.PAGESIZE)
+    return mmap.mmap(-1, size)
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        import ctypes
+        import ctypes.util
+
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        _libc.fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_longlong, ctypes.c_longlong]
+    return _libc
+
+
+def preallocate(fd, length, offset=None):
+    """
+    Reservar espacio en disco para los próximos `length` bytes del archivo.
+
+    En Linux usa fallocate(FALLOC_FL_KEEP_SIZE): los bloques quedan reservados
+    (menos fragmentación, y un disco lleno falla al principio y no a mitad del
+    volcado) pero el tamaño visible del archivo no cambia. En otros sistemas no
+    hace nada. Devuelve True si se pudo reservar.
+    """
+    if length <= 0 or not sys.platform.startswith('linux'):
+        return False
+    if offset is None:
+        offset = os.fstat(fd).st_size
+    try:
+        return _get_libc().fallocate(fd, FALLOC_FL_KEEP_SIZE, offset, length) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def _readinto(src, view):
+    """Leer lo disponible en view sin esperar a llenarlo (streams de procesos)"""
+    if hasattr(src, 'readinto1'):
+        return src.readinto1(view)
+    return src.readinto(view)
+
+
+def copy_stream(src, write, buffer=None):
+    """
+    Copiar un stream binario a una función write usando un buffer fijo.
+
+    Devuelve los bytes copiados; la memoria usada es la del buffer, no depende
+    del tamaño del stream.
+    """
+    buffer = buffer if buffer is not None else aligned_buffer()
+    view = memoryview(buffer)
+    total = 0
+    try:
+        while True:
+            n = _readinto(src, view)
+            if not n:
+                return total
+            write(view[:n])
+            total += n
+    finally:
+        view.release()
+
+
+def count_stream(src, buffer=None):
+    """Contar los bytes de un stream sin acumularlos"""
+    return copy_stream(src, lambda chunk: None, buffer)
+
+
+def copy_file(src_path, dst):
+    """
+    Añadir el contenido de src_path al archivo abierto dst.
+
+    Usa os.copy_file_range (copia dentro del kernel, reflink en btrfs/xfs cuando
+    el sistema de archivos lo permite), luego os.sendfile, y por último un bucle
+    con buffer alineado. Devuelve los bytes copiados.
+    """
+    dst.flush()
+    dst_fd = dst.fileno()
+    with open(src_path, 'rb') as src:
+        src_fd = src.fileno()
+        remaining = os.fstat(src_fd).st_size
+        total = 0
+
+        for kernel_copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+            if kernel_copy is None:
+                continue
+            try:
+                while remaining > 0:
+                    if kernel_copy is os.sendfile:
+                        n = os.sendfile(dst_fd, src_fd, None, min(remaining, 1 << 30))
+                    else:
+                        n = kernel_copy(src_fd, dst_fd, min(remaining, 1 << 30))
+                    if n == 0:
+                        break
+                    total += n
+                    remaining -= n
+                return total
+            except OSError:
+                if total:
+                    raise
+                continue
+
+        return total + copy_stream(src, dst.write)
+
+
+def copy_range(src_fd, dst_fd, offset, length):
+    """
+    Copiar length bytes de src_fd, desde offset, a la posición actual de dst_fd.
+
+    No usa ni mueve la posición de src_fd, así que varios hilos pueden copiar a
+    la vez tramos distintos del mismo archivo. Igual que copy_file prueba
+    os.copy_file_range (en btrfs/xfs el sistema de archivos puede compartir los
+    bloques alineados en vez de copiarlos), luego os.sendfile y por último
+    os.pread. Devuelve los bytes copiados.
+    """
+    copied = 0
+    for kernel_copy in (getattr(os, 'copy_file_range', None), getattr(os, 'sendfile', None)):
+        if kernel_copy is None:
+            continue
+        try:
+            while copied < length:
+                count = min(length - copied, 1 << 30)
+                if kernel_copy is os.sendfile:
+                    n = os.sendfile(dst_fd, src_fd, offset + copied, count)
+                else:
+                    n = kernel_copy(src_fd, dst_fd, count, offset + copied)
+                if n == 0:
+                    break
+                copied += n
+            return copied
+        except OSError:
+            if copied:
+                raise
+            continue
+
+    while copied < length:
+        data = os.pread(src_fd, min(length - copied, BUFFER_SIZE), offset + copied)
+        if not data:
+            break
+        with memoryview(data) as view:
+            written = 0
+            while written < len(data):
+                written += os.write(dst_fd, view[written:])
+        copied += len(data)
+    return copied
@@ -0,0 +1,267 @@
+"""
+Huellas BLAKE2b de los backups, calculadas mientras se escriben.
+
+Todo lo que se añade al backup del ciclo (volcado completo, incrementales y
+streaming) pasa por un Digest y queda apuntado como un tramo en el registro de
+huellas, al lado del archivo de estado: longitud sin comprimir, BLAKE2b del
+contenido y tamaño del archivo en disco al terminar el tramo (para recortarlo
+igual que el índice PITR). El proceso nocturno comprueba esos tramos en la
+misma lectura con la que divide el backup, calcula la huella de cada parte y la
+del stream completo, y las guarda en backup_info.json. La verificación vuelve
+a leer solo las partes, en paralelo, y las compara con ese manifiesto. Con
+ROLLING_PARTS las partes ya se escribieron cortadas por tramos: cada una lleva
+en el manifiesto sus tramos y se comprueba tramo a tramo.
+
+Las huellas son siempre del contenido sin comprimir: las partes se recomprimen
+por separado y su contenido, no sus bytes en disco, es lo que tiene que cuadrar
+con el backup original.
+"""
+import os
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import compression
+import fastio
+
+# —————— CONFIGURACIÓN DE INTEGRIDAD ——————
+DIGEST_SUFFIX    = '.digests.jsonl'         # ← junto al archivo de estado (backup.state.digests.jsonl)
+ALGORITHM        = 'blake2b'
+DIGEST_SIZE      = 32
+VERIFY_THREADS   = 4                        # ← partes comprobadas a la vez
+# ——————————————————————————
+
+
+class Digest:
+    """BLAKE2b y longitud de un stream que se va escribiendo"""
+
+    def __init__(self):
+        self.hash = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        self.size = 0
+
+    def update(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+
+    def hashed(self, write):
+        """Envolver una función write para que todo lo que escriba pase por la huella"""
+        def hashed_write(data):
+            self.update(data)
+            return write(data)
+        return hashed_write
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+    def record(self):
+        return {"length": self.size, ALGORITHM: self.hexdigest()}
+
+
+def hash_file(path, buffer=None):
+    """Huella del contenido (descomprimido) de un archivo: (hex, longitud)"""
+    digest = Digest()
+    with compression.open_reader(path) as f:
+        fastio.copy_stream(f, digest.update, buffer)
+    return digest.hexdigest(), digest.size
+
+
+def hash_view(view, start, end):
+    """Digest de view[start:end] (un backup mapeado con mmap) sin copiar los datos"""
+    digest = Digest()
+    with view[start:end] as data:
+        digest.update(data)
+    return digest
+
+
+# ——— Registro de tramos del backup del ciclo ———
+
+def digests_path(state_file):
+    """Registro de huellas del ciclo actual, al lado del archivo de estado"""
+    return os.path.splitext(state_file)[0] + DIGEST_SUFFIX
+
+
+def load(digest_file):
+    if not os.path.exists(digest_file):
+        return []
+    with open(digest_file, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append(digest_file, records, disk_ends):
+    """
+    Añadir los tramos recién escritos al backup.
+
+    records son los Digest.record() de cada tramo, en orden, y disk_ends el
+    tamaño del backup en disco al final de cada uno.
+    """
+    lines = [dict(record, disk_end=disk_end) for record, disk_end in zip(records, disk_ends)]
+    with open(digest_file, 'a', encoding='utf-8') as f:
+        f.write("".join(json.dumps(line) + "\n" for line in lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def trim(digest_file, disk_size):
+    """Descartar los tramos que acaban más allá de disk_size (el backup se recortó)"""
+    records = load(digest_file)
+    keep = [r for r in records if r['disk_end'] <= disk_size]
+    if len(keep) == len(records):
+        return
+    tmp = digest_file + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write("".join(json.dumps(r) + "\n" for r in keep))
+    os.replace(tmp, digest_file)
+
+
+def reset(digest_file):
+    """Empezar un registro nuevo (backup completo nuevo)"""
+    if os.path.exists(digest_file):
+        os.remove(digest_file)
+
+
+class StreamCheck:
+    """
+    Huella del stream completo y comprobación de sus tramos en una sola pasada.
+
+    Se alimenta con el contenido del backup en orden (update) mientras se
+    divide o se trocea; cada tramo del registro se compara al completarse. Sin
+    registro (huellas desactivadas, o ciclo empezado antes de tenerlas) solo se
+    calcula la huella del stream. Con whole=False solo se comprueban los tramos
+    (la huella del stream se queda sin calcular; su tamaño sí se cuenta).
+    """
+
+    def __init__(self, records, whole=True):
+        self.records = records
+        self.whole = whole
+        self.stream = Digest()
+        self.index = 0
+        self.current = Digest()
+        self.start = 0              # desplazamiento del tramo en curso
+        self.errors = []
+        self.pending = None         # tareas de submit_mapped() sin recoger
+
+    def update(self, data):
+        if self.whole:
+            self.stream.update(data)
+        else:
+            self.stream.size += len(data)
+        view = memoryview(data)
+        while view and self.index < len(self.records):
+            record = self.records[self.index]
+            take = min(len(view), record['length'] - self.current.size)
+            self.current.update(view[:take])
+            view = view[take:]
+            if self.current.size == record['length']:
+                end = self.start + record['length']
+                if self.current.hexdigest() != record[ALGORITHM]:
+                    self.errors.append(f"tramo {self.index + 1} (bytes {self.start:,}–{end:,}) "
+                                       "no coincide con su huella")
+                self.index += 1
+                self.current = Digest()
+                self.start = end
+
+    def submit_mapped(self, view, pool):
+        """
+        Lo mismo que update() con el backup entero a la vista (mmap) y recién
+        empezado: la huella del stream y la de cada tramo se calculan a la vez
+        en los hilos de pool. Hay que llamar a collect() antes de soltar view.
+        """
+        segments = []
+        start = 0
+        # El stream primero: es la tarea más larga y no se puede repartir
+        stream = pool.submit(hash_view, view, 0, len(view))
+        for record in self.records:
+            end = start + record['length']
+            if end > len(view):
+                break
+            segments.append((start, end, pool.submit(hash_view, view, start, end)))
+            start = end
+        self.pending = (stream, segments)
+
+    def collect(self):
+        """Esperar las tareas de submit_mapped() y comprobar los tramos en orden"""
+        if self.pending is None:
+            return
+        stream, segments = self.pending
+        self.pending = None
+        self.stream = stream.result()
+        for start, end, future in segments:
+            if future.result().hexdigest() != self.records[self.index][ALGORITHM]:
+                self.errors.append(f"tramo {self.index + 1} (bytes {start:,}–{end:,}) "
+                                   "no coincide con su huella")
+            self.index += 1
+            self.start = end
+
+    def finish(self):
+        """Comprobar que se recorrieron todos los tramos y ninguno sobra; devuelve la lista de errores"""
+        if self.records:
+            covered = sum(r['length'] for r in self.records)
+            if covered != self.stream.size:
+                self.errors.append(f"el backup tiene {self.stream.size:,} bytes y sus tramos "
+                                   f"registrados suman {covered:,}")
+        return self.errors
+
+    def summary(self):
+        """Bloque "digest" de backup_info.json"""
+        return {
+            "algorithm": ALGORITHM,
+            "stream": self.stream.hexdigest(),
+            "size": self.stream.size,
+            "segments_verified": self.index
+        }
+
+
+def verify_files(paths, expected, threads=VERIFY_THREADS):
+    """
+    Volver a calcular en paralelo la huella de cada archivo y compararla.
+
+    expected es una lista de (hex, longitud) en el mismo orden que paths, o
+    de los tramos ({"length", "blake2b"}) en que se escribió cada archivo.
+    hashlib y los descompresores sueltan el GIL con bloques grandes, así que los
+    hilos avanzan a la vez. Devuelve la lista de errores (vacía si todo cuadra).
+    """
+    def check(item):
+        path, digest = item
+        if not os.path.exists(path):
+            return f"{os.path.basename(path)}: no existe"
+        if isinstance(digest, list):
+            return check_segments(path, digest)
+        digest, length = digest
+        actual, size = hash_file(path)
+        if size != length:
+            return f"{os.path.basename(path)}: {size:,} bytes, se esperaban {length:,}"
+        if actual != digest:
+            return f"{os.path.basename(path)}: la huella no coincide"
+        return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(threads, len(paths) or 1))) as pool:
+        return [error for error in pool.map(check, zip(paths, expected)) if error]
+
+
+def check_segments(path, segments):
+    """Comprobar un archivo tramo a tramo; devuelve el primer error o None"""
+    check = StreamCheck(segments, whole=False)
+    with compression.open_reader(path) as f:
+        fastio.copy_stream(f, check.update)
+    errors = check.finish()
+    return f"{os.path.basename(path)}: {errors[0]}" if errors else None
+
+
+def verify_day(day_folder, threads=VERIFY_THREADS):
+    """
+    Comprobar las partes de un día contra las huellas de su backup_info.json.
+
+    Returns:
+        list | None: errores encontrados, o None si el día no tiene huellas
+    """
+    with open(os.path.join(day_folder, "backup_info.json"), 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    files = [entry for entry in info.get('files', []) if ALGORITHM in entry or 'segments' in entry]
+    if not files or len(files) != len(info['files']):
+        return None
+    errors = verify_files([os.path.join(day_folder, entry['filename']) for entry in files],
+                          [entry.get('segments') or (entry[ALGORITHM], entry['content_bytes']) for entry in files],
+                          threads)
+    total = sum(entry['content_bytes'] for entry in files)
+    if 'digest' in info and total != info['digest']['size']:
+        errors.append(f"las partes suman {total:,} bytes y el backup tenía {info['digest']['size']:,}")
+    return errors
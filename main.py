@@ -1,8 +1,21 @@
 #!/usr/bin/env python3
 import os
+import re
 import json
+import shutil
 import subprocess
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import binlog_parser
+import catalog
+import compression
+import dbclient
+import fastio
+import integrity
+import pitr
+import rolling
+import throttle
 from notification import TelegramNotifier  # ← IMPORT, si no existe
 
 # —————— CONFIGURACIÓN ——————
@@ -14,34 +27,146 @@ DB_NAME            = 'helensystem_data'     # ← la BD que quieres copiar
 BACKUP_DIR         = r'C:\ruta\de\backup'
 BACKUP_FILE_NAME   = 'backup.sql'
 STATE_FILE_NAME    = 'backup.state.json'
+DUMP_THREADS       = 1                      # ← >1 activa el volcado paralelo por tabla
+COMPRESSION        = None                   # ← None, 'gzip' o 'zstd'
+COMPRESSION_LEVEL  = None                   # ← None = nivel por defecto del códec
+STREAMING          = False                  # ← True = mysqlbinlog --stop-never continuo
+BINLOG_THREADS     = 4                      # ← binlogs descargados a la vez tras una rotación
+BINLOG_FILTER      = True                   # ← filtrar eventos por esquema en Python antes de pasarlos a SQL
+BINLOG_TABLES      = None                   # ← lista de tablas para limitar el incremental (None = todas)
+PITR_INDEX         = True                   # ← indexar hora/posición de binlog → byte del backup
+BACKUP_DIGESTS     = True                   # ← BLAKE2b en línea de todo lo escrito (verificación nocturna)
+SKIP_UNCHANGED     = False                  # ← reutilizar del volcado anterior las tablas sin cambios
+FINGERPRINT_CHECKSUM = False                # ← comparar también CHECKSUM TABLE (lee la tabla en el servidor)
+ROLLING_PARTS      = False                  # ← escribir el día ya en partes de MAX_FILE_SIZE_GB (ver rolling.py)
+SPLIT_LAYOUT       = 'size'                 # ← proceso nocturno: 'size' o 'table' (partes por tabla, ver process.py)
 
-# Instancia global del notifier
-notifier = TelegramNotifier()
+# —————— HERRAMIENTAS DE MYSQL ——————
+MYSQL_BIN_ENV      = 'HELEN_MYSQL_BIN_DIR'  # ← variable de entorno que fuerza la carpeta de las herramientas
+MYSQL_BIN_PATHS    = [                      # ← carpetas donde buscar (antes que el PATH)
+    r'C:\Program Files\MySQL\MySQL Server 8.0\bin',
+    r'C:\xampp\mysql\bin',
+    '/usr/local/mysql/bin',
+]
+MYSQL_TOOLS        = ('mysql', 'mysqldump', 'mysqlbinlog')
+TOOLS_CACHE_NAME   = 'mysql_tools.json'     # ← herramientas ya verificadas, en la carpeta de caché del usuario
+EXE_SUFFIX         = '.exe' if os.name == 'nt' else ''
+VERSION_RE         = re.compile(r'(?:Distrib|Ver)\s+(\d+\.\d+\.\d+)')
+# ——————————————————————————
+
+class ToolNotFound(RuntimeError):
+    """No se encontraron las herramientas de MySQL"""
+
+_tools = None
+_tools_lock = threading.Lock()
+
+def _tools_cache_file():
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'HelenBackup', TOOLS_CACHE_NAME)
+
+def _candidate_dirs():
+    """Carpetas candidatas en orden: variable de entorno, MYSQL_BIN_PATHS y PATH"""
+    dirs = []
+    if os.environ.get(MYSQL_BIN_ENV):
+        dirs.append(os.environ[MYSQL_BIN_ENV])
+    dirs.extend(MYSQL_BIN_PATHS)
+    found = shutil.which('mysql')
+    if found:
+        dirs.append(os.path.dirname(os.path.realpath(found)))
+    return list(dict.fromkeys(dirs))
+
+def _signature(path):
+    st = os.stat(path)
+    return [st.st_size, int(st.st_mtime)]
+
+def _tool_version(path):
+    """Versión que informa <herramienta> --version, o None si no arranca"""
+    try:
+        res = subprocess.run([path, '--version'], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, text=True, timeout=15)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = VERSION_RE.search(res.stdout)
+    return match.group(1) if res.returncode == 0 and match else (res.stdout.strip() or None)
+
+def _load_tools_cache(candidates):
+    """Herramientas de la caché si siguen siendo la primera opción y no han cambiado"""
+    try:
+        with open(_tools_cache_file(), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['candidates'] != candidates:
+            return None
+        for tool in cached['tools'].values():
+            if _signature(tool['path']) != tool['signature']:
+                return None
+        return cached
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _discover_tools(candidates):
+    """Primera carpeta con un mysql que arranca; se verifican las versiones de las tres herramientas"""
+    for directory in candidates:
+        mysql_path = os.path.join(directory, 'mysql' + EXE_SUFFIX)
+        if not os.path.isfile(mysql_path):
+            continue
+        tools = {}
+        for name in MYSQL_TOOLS:
+            path = os.path.join(directory, name + EXE_SUFFIX)
+            version = _tool_version(path) if os.path.isfile(path) else None
+            if version:
+                tools[name] = {'path': path, 'version': version, 'signature': _signature(path)}
+        if 'mysql' in tools:
+            return {'candidates': candidates, 'dir': directory, 'tools': tools}
+    return None
+
+def mysql_tools():
+    """
+    Herramientas de MySQL ({nombre: {path, version}}), resueltas en el primer uso.
+
+    Se busca en HELEN_MYSQL_BIN_DIR, en MYSQL_BIN_PATHS y en el PATH. Las
+    versiones se comprueban una sola vez y el resultado se guarda en la caché
+    del usuario; las siguientes ejecuciones solo comparan tamaño y fecha de los
+    ejecutables, sin lanzar procesos.
+    """
+    global _tools
+    if _tools is not None:
+        return _tools
+    with _tools_lock:
+        if _tools is not None:
+            return _tools
+        candidates = _candidate_dirs()
+        found = _load_tools_cache(candidates)
+        if found is None:
+            found = _discover_tools(candidates)
+            if found is None:
+                raise ToolNotFound("No se encontró MySQL en las rutas esperadas: " + ", ".join(candidates)
+                                   + f" (define {MYSQL_BIN_ENV} con la carpeta de mysql{EXE_SUFFIX})")
+            versions = {t['version'] for t in found['tools'].values() if re.fullmatch(r'[\d.]+', t['version'])}
+            if len(versions) > 1:
+                print(f"⚠️ Versiones distintas de las herramientas de MySQL: "
+                      + ", ".join(f"{n} {t['version']}" for n, t in found['tools'].items()))
+            try:
+                cache_file = _tools_cache_file()
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                with open(cache_file + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(found, f, indent=2)
+                os.replace(cache_file + '.tmp', cache_file)
+            except OSError:
+                pass    # sin caché se vuelve a verificar en el próximo arranque
+        print(f"Usando MySQL desde: {found['dir']} ({found['tools']['mysql']['version']})")
+        _tools = found
+        return _tools
+
+def tool_path(name):
+    """Ruta de mysql, mysqldump o mysqlbinlog"""
+    tools = mysql_tools()
+    if name not in tools['tools']:
+        raise ToolNotFound(f"No se encontró {name}{EXE_SUFFIX} junto a mysql en {tools['dir']}")
+    return tools['tools'][name]['path']
 
-# Detectar automáticamente la ruta de herramientas MySQL
 def get_mysql_bin_dir():
-    # Rutas posibles de MySQL
-    possible_paths = [
-        r'C:\Program Files\MySQL\MySQL Server 8.0\bin',
-        r'C:\xampp\mysql\bin'
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path) and os.path.exists(os.path.join(path, 'mysql.exe')):
-            print(f"Usando MySQL desde: {path}")
-            return path
-    
-    # Si no encuentra ninguna ruta, mostrar error
-    print("ERROR: No se encontró MySQL en las rutas esperadas:", file=sys.stderr)
-    for path in possible_paths:
-        print(f"  - {path}", file=sys.stderr)
-    sys.exit(1)
-
-MYSQL_BIN_DIR      = get_mysql_bin_dir()
-MYSQL_CMD          = os.path.join(MYSQL_BIN_DIR, 'mysql.exe')
-MYSQLDUMP_CMD      = os.path.join(MYSQL_BIN_DIR, 'mysqldump.exe')
-MYSQLBINLOG_CMD    = os.path.join(MYSQL_BIN_DIR, 'mysqlbinlog.exe')
-# ——————————————————————————
+    return mysql_tools()['dir']
 
 def run(cmd):
     res = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
@@ -50,57 +175,231 @@ def run(cmd):
         sys.exit(1)
     return res.stdout
 
+def connection_args(config):
+    """
+    Argumentos de conexión comunes para las herramientas de MySQL.
+
+    Deben ir justo después del ejecutable: la contraseña viaja en un archivo de
+    opciones (--defaults-extra-file), que MySQL exige como primer argumento.
+    """
+    args = ["-h", config['HOST'], "-P", str(config['PORT']), "-u", config['USER']]
+    if config.get('PASSWORD'):
+        args.insert(0, f"--defaults-extra-file={dbclient.credentials_file(config)}")
+    return args
+
 def get_master_status(config):
     """Obtener el estado actual del master"""
-    mysql_cmd = os.path.join(MYSQL_BIN_DIR, 'mysql.exe')
-    cmd = [
-        mysql_cmd,
-        "-h", config['HOST'], "-P", str(config['PORT']),
-        "-u", config['USER'], f"-p{config['PASSWORD']}",
-        "-e", "SHOW MASTER STATUS\\G"
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-    
-    for line in result.stdout.split('\n'):
-        if 'File:' in line:
-            file_ = line.split(': ')[1].strip()
-        if 'Position:' in line:
-            pos = int(line.split(': ')[1].strip())
-    return file_, pos
+    rows = dbclient.query(config, "SHOW MASTER STATUS")
+    if not rows:
+        raise RuntimeError("SHOW MASTER STATUS no devolvió filas: ¿está activado el binlog?")
+    return rows[0][0], int(rows[0][1])
+
+def estimate_dump_size(config):
+    """Tamaño aproximado del volcado (datos en information_schema) para reservar espacio; 0 si no se sabe"""
+    try:
+        rows = dbclient.query(
+            config,
+            "SELECT COALESCE(SUM(DATA_LENGTH), 0) FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s",
+            (config['DB_NAME'],)
+        )
+        return int(rows[0][0])
+    except (dbclient.QueryError, ValueError):
+        return 0
 
 def full_backup(backup_file, config):
-    """Realizar backup completo de la base de datos"""
-    print("-> Generando backup completo de", config['DB_NAME'])
-    cmd = [
-        MYSQLDUMP_CMD,
-        "-h", config['HOST'], "-P", str(config['PORT']),
-        "-u", config['USER'], f"-p{config['PASSWORD']}",
-        "--single-transaction",
-        "--routines",
-        "--triggers",
-        "--set-gtid-purged=OFF",   # <— evita SET @@GLOBAL.GTID_PURGED
-        config['DB_NAME']
-    ]
-    with open(backup_file, "w", encoding="utf-8") as f:
-        subprocess.run(cmd, stdout=f, check=True)
+    """
+    Realizar backup completo de la base de datos
+
+    Returns:
+        tuple | None: (archivo, posición) del binlog capturados junto al snapshot
+        cuando el modo de volcado los conoce; None si hay que consultarlos después.
+    """
+    # Backup completo nuevo: el índice PITR y las huellas del ciclo anterior ya no corresponden
+    state_file = backup_paths(config)[1]
+    pitr.reset(pitr.index_path(state_file))
+    integrity.reset(integrity.digests_path(state_file))
+    rolling.reset(backup_file)
+    
+    threads = max(1, int(config.get('DUMP_THREADS', 1)))
+    with throttle.session(config, own_threads=threads + 1) as limiter:
+        if threads > 1 or config.get('SKIP_UNCHANGED', False):
+            from parallel_dump import parallel_full_backup
+            return parallel_full_backup(backup_file, config, limiter)
+
+        print("-> Generando backup completo de", config['DB_NAME'])
+        cmd = throttle.niced([
+            tool_path('mysqldump'),
+            *connection_args(config),
+            "--single-transaction",
+            "--routines",
+            "--triggers",
+            "--set-gtid-purged=OFF",   # <— evita SET @@GLOBAL.GTID_PURGED
+            config['DB_NAME']
+        ], config)
+        log = digest_file(config)
+        if rolling.enabled(config):
+            # Cada parte cerrada es un tramo del registro de huellas
+            records, ends = rolling.run_to_parts(cmd, backup_file, config, limiter, hashing=bool(log))
+            if log:
+                integrity.append(log, records, ends)
+        else:
+            digest = integrity.Digest() if log else None
+            compression.run_to_file(cmd, backup_file, config, size_hint=estimate_dump_size(config),
+                                    limiter=limiter, digest=digest)
+            if log:
+                integrity.append(log, [digest.record()], [os.path.getsize(backup_file)])
     print(f"Backup completo guardado en {backup_file}")
+    return None
 
-def incremental_backup(backup_file, state, config):
-    """Realizar backup incremental usando binlogs"""
-    print(f"-> Exportando binlogs de {config['DB_NAME']} desde {state['File']}@{state['Position']}…")
-    cmd = [
-        MYSQLBINLOG_CMD,
+def binlog_command(config, file_, position, *extra):
+    """Comando mysqlbinlog remoto desde file_@position filtrado por la base de datos"""
+    return throttle.niced([
+        tool_path('mysqlbinlog'),
+        *connection_args(config),
         "--skip-gtids",             # <— omite eventos GTID
-        "-h", config['HOST'], "-P", str(config['PORT']),
-        "-u", config['USER'], f"-p{config['PASSWORD']}",
         "--read-from-remote-server",
-        f"--start-position={state['Position']}",
+        f"--start-position={position}",
         f"--database={config['DB_NAME']}",
-        state["File"]
-    ]
-    with open(backup_file, "a", encoding="utf-8") as f:
-        subprocess.run(cmd, stdout=f, check=True)
+        *extra,
+        file_
+    ], config)
+
+def list_binary_logs(config):
+    """Listar los binlogs del servidor (SHOW BINARY LOGS) como [(archivo, tamaño)]"""
+    return [(row[0], int(row[1])) for row in dbclient.query(config, "SHOW BINARY LOGS")]
+
+def binlog_chain(state, target, logs):
+    """Tramos de binlog a exportar desde el estado guardado hasta la posición objetivo"""
+    names = [name for name, _ in logs]
+    if state['File'] not in names:
+        raise RuntimeError(
+            f"El binlog {state['File']} ya no existe en el servidor (purgado): "
+            "se necesita un backup completo"
+        )
+    
+    first = names.index(state['File'])
+    last = names.index(target[0]) if target[0] in names else len(names) - 1
+    chain = []
+    for i in range(first, last + 1):
+        name, size = logs[i]
+        chain.append({
+            'file': name,
+            'start': state['Position'] if i == first else 4,
+            'stop': target[1] if name == target[0] else None,
+            'size': size
+        })
+    return chain
+
+def _fetch_binlog_segment(config, segment, path, limiter=None, digest=None):
+    """
+    Exportar un tramo de binlog a su propio archivo
+
+    Returns:
+        tuple | None: (puntos PITR, tamaño sin comprimir) del tramo si PITR_INDEX está activo
+    """
+    _export_binlog_segment(config, segment, path, limiter, digest)
+    if config.get('PITR_INDEX', PITR_INDEX):
+        return pitr.scan(path, segment['file'], segment['start'])
+    return None
+
+def _export_binlog_segment(config, segment, path, limiter=None, digest=None):
+    if not config.get('BINLOG_FILTER', BINLOG_FILTER):
+        extra = [f"--stop-position={segment['stop']}"] if segment['stop'] is not None else []
+        cmd = binlog_command(config, segment['file'], segment['start'], *extra)
+        compression.run_to_file(cmd, path, config, size_hint=_estimate_text_size(segment),
+                                limiter=limiter, digest=digest)
+        return
+    
+    # Filtrar primero los eventos binarios y convertir a SQL solo lo que es de nuestra BD
+    filtered = f"{path}.bin"
+    try:
+        parser = binlog_parser.filter_segment(config, segment, filtered, os.path.dirname(path), limiter)
+        if segment['stop'] is not None and (parser.position or 0) < segment['stop']:
+            raise RuntimeError(
+                f"Binlog {segment['file']} incompleto: leído hasta {parser.position}, "
+                f"se esperaba {segment['stop']}"
+            )
+        if parser.kept:
+            compression.run_to_file(binlog_parser.decode_command(filtered), path, config,
+                                    size_hint=int(parser.bytes_out * 1.5), digest=digest)
+        else:
+            open(path, 'wb').close()
+    finally:
+        if os.path.exists(filtered):
+            os.remove(filtered)
+
+def _estimate_text_size(segment):
+    # El texto de mysqlbinlog ocupa aprox. 1.5x el binlog (BINLOG en base64 + cabeceras)
+    end = segment['stop'] if segment['stop'] is not None else segment['size']
+    return int(max(0, end - segment['start']) * 1.5)
+
+def incremental_backup(backup_file, state, config):
+    """
+    Realizar backup incremental usando binlogs
+
+    Recorre toda la cadena de binlogs desde state hasta la posición actual del
+    master, aunque el servidor haya rotado de archivo entre ejecuciones. Con
+    varios archivos se exportan en paralelo a tramos temporales que luego se
+    añaden en orden; si algo falla el backup vuelve a su tamaño anterior.
+
+    Returns:
+        tuple: (archivo, posición) hasta donde queda cubierto el backup
+    """
+    target = get_master_status(config)
+    if (state['File'], state['Position']) == tuple(target):
+        print("-> Sin eventos nuevos en el binlog")
+        return target
+    
+    chain = binlog_chain(state, target, list_binary_logs(config))
+    print(f"-> Exportando binlogs de {config['DB_NAME']} desde {state['File']}@{state['Position']} "
+          f"hasta {target[0]}@{target[1]} ({len(chain)} archivo(s))…")
+    
+    original_size = rolling.disk_size(backup_file)    # del día entero, con las partes ya cerradas
+    segment_paths = [f"{backup_file}.seg{i:03d}" for i in range(len(chain))]
+    index_file = pitr.index_path(backup_paths(config)[1])
+    log = digest_file(config)
+    digests = [integrity.Digest() if log else None for _ in chain]
+    try:
+        threads = min(max(1, int(config.get('BINLOG_THREADS', BINLOG_THREADS))), len(chain))
+        with throttle.session(config, own_threads=threads + 1) as limiter, \
+                ThreadPoolExecutor(max_workers=threads) as pool:
+            futures = [pool.submit(_fetch_binlog_segment, config, segment, path, limiter, digest)
+                       for segment, path, digest in zip(chain, segment_paths, digests)]
+            scans = [future.result() for future in futures]
+        if config.get('PITR_INDEX', PITR_INDEX):
+            logical_start = pitr.logical_end(index_file, backup_file)
+        
+        # Añadir los tramos en orden; 'r+b' y no 'ab' para que copy_file_range funcione
+        sizes = [os.path.getsize(p) for p in segment_paths]
+        with open(backup_file, 'r+b' if os.path.exists(backup_file) else 'wb') as out:
+            out.seek(0, os.SEEK_END)
+            fastio.preallocate(out.fileno(), sum(sizes))
+            for path in segment_paths:
+                fastio.copy_file(path, out)
+            out.flush()
+            os.fsync(out.fileno())
+        
+        if config.get('PITR_INDEX', PITR_INDEX):
+            # Puntos con desplazamientos relativos al inicio de lo añadido en esta ejecución
+            points, offset = [], 0
+            for segment_points, size in scans:
+                points += [dict(p, offset=p['offset'] + offset) for p in segment_points]
+                offset += size
+            pitr.append(index_file, points, logical_start, rolling.disk_size(backup_file), logical_start + offset)
+        if log:
+            ends = [original_size + sum(sizes[:i + 1]) for i in range(len(sizes))]
+            kept = [(d.record(), end) for d, end in zip(digests, ends) if d.size]
+            integrity.append(log, [record for record, _ in kept], [end for _, end in kept])
+    except BaseException:
+        rolling.truncate(backup_file, original_size)
+        raise
+    finally:
+        for path in segment_paths:
+            if os.path.exists(path):
+                os.remove(path)
+    
     print(f"Incremental añadido a {backup_file}")
+    return target
 
 def load_state(path):
     if not os.path.exists(path):
@@ -108,29 +407,92 @@ def load_state(path):
     with open(path, encoding="utf-8") as f:
         return json.load(f)
 
-def save_state(path, file_, pos):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump({"File": file_, "Position": pos}, f)
-
-def main():
-    # Construir diccionario de configuración
-    config = {
-        'HOST': HOST,
-        'PORT': PORT,
-        'USER': USER,
-        'PASSWORD': PASSWORD,
-        'DB_NAME': DB_NAME,
-        'BACKUP_DIR': BACKUP_DIR,
-        'BACKUP_FILE_NAME': BACKUP_FILE_NAME,
-        'STATE_FILE_NAME': STATE_FILE_NAME
-    }
+def save_state(path, file_, pos, **extra):
+    # Escritura atómica: el modo streaming guarda el estado cada pocos segundos
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"File": file_, "Position": pos, **extra}, f)
+    os.replace(tmp_path, path)
+
+def trim_unconfirmed(backup_file, state, index_file=None, digest_log=None):
+    """Descartar lo escrito tras el último checkpoint del streaming (se vuelve a leer del binlog)"""
+    size = state.get('Size')
+    if size is not None and rolling.exists(backup_file) and rolling.disk_size(backup_file) > size:
+        rolling.truncate(backup_file, size)
+        print(f"✂️ Descartados datos posteriores al último checkpoint ({size:,} bytes confirmados)")
+    if index_file and rolling.exists(backup_file):
+        pitr.trim(index_file, rolling.disk_size(backup_file))
+    if digest_log and rolling.exists(backup_file):
+        integrity.trim(digest_log, rolling.disk_size(backup_file))
+
+def seal_if_full(backup_file, config, close=None):
+    """
+    Con ROLLING_PARTS, cerrar la parte en curso si ya tiene MAX_FILE_SIZE_GB sin comprimir.
+
+    Solo se llama tras guardar el estado: lo que queda en partes cerradas ya está
+    confirmado y nunca hay que recortarlo. close() se llama antes de moverla
+    (el streaming tiene el archivo abierto). Devuelve True si se cerró.
+    """
+    if not rolling.enabled(config) or not os.path.exists(backup_file):
+        return False
+    index_file = pitr.index_path(backup_paths(config)[1])
+    content = pitr.logical_end(index_file, backup_file) - rolling.sealed_content(backup_file)
+    if content < rolling.max_part_size(config):
+        return False
+    if close:
+        close()
+    part = rolling.seal(backup_file, content)
+    print(f"📦 Parte cerrada: {part['filename']} ({content / 1024**2:.1f} MB)")
+    return True
+
+def backup_paths(config):
+    """Rutas del archivo de backup y del archivo de estado para una configuración"""
+    backup_file = os.path.join(
+        config['BACKUP_DIR'],
+        compression.backup_file_name(config.get('BACKUP_FILE_NAME', BACKUP_FILE_NAME), config)
+    )
+    state_file = os.path.join(config['BACKUP_DIR'], config.get('STATE_FILE_NAME', STATE_FILE_NAME))
+    return backup_file, state_file
+
+def digest_file(config):
+    """Registro de huellas del ciclo, o None si BACKUP_DIGESTS está desactivado"""
+    if not config.get('BACKUP_DIGESTS', BACKUP_DIGESTS):
+        return None
+    return integrity.digests_path(backup_paths(config)[1])
+
+def main(config=None):
+    # Construir diccionario de configuración (la UI pasa el suyo desde get_db_config)
+    if config is None:
+        config = {
+            'HOST': HOST,
+            'PORT': PORT,
+            'USER': USER,
+            'PASSWORD': PASSWORD,
+            'DB_NAME': DB_NAME,
+            'BACKUP_DIR': BACKUP_DIR,
+            'BACKUP_FILE_NAME': BACKUP_FILE_NAME,
+            'STATE_FILE_NAME': STATE_FILE_NAME,
+            'DUMP_THREADS': DUMP_THREADS,
+            'COMPRESSION': COMPRESSION,
+            'COMPRESSION_LEVEL': COMPRESSION_LEVEL,
+            'STREAMING': STREAMING,
+            'BINLOG_THREADS': BINLOG_THREADS,
+            'BINLOG_FILTER': BINLOG_FILTER,
+            'BINLOG_TABLES': BINLOG_TABLES,
+            'SKIP_UNCHANGED': SKIP_UNCHANGED,
+            'FINGERPRINT_CHECKSUM': FINGERPRINT_CHECKSUM,
+            'PITR_INDEX': PITR_INDEX,
+            'BACKUP_DIGESTS': BACKUP_DIGESTS,
+            'ROLLING_PARTS': ROLLING_PARTS,
+            'SPLIT_LAYOUT': SPLIT_LAYOUT
+        }
     
     os.makedirs(config['BACKUP_DIR'], exist_ok=True)
-    backup_file = os.path.join(config['BACKUP_DIR'], BACKUP_FILE_NAME)
-    state_file  = os.path.join(config['BACKUP_DIR'], STATE_FILE_NAME)
+    backup_file, state_file = backup_paths(config)
+    rolling.recover(backup_file)
 
     # Verificar si existe el archivo de backup además del estado
-    backup_exists = os.path.exists(backup_file)
+    backup_exists = rolling.exists(backup_file)
     state = load_state(state_file)
     
     # Si no existe el backup o no hay estado, hacer backup completo
@@ -140,21 +502,26 @@ def main():
         else:
             print("No se encontró estado previo, regenerando backup completo...")
         
-        full_backup(backup_file, config)
-        file_, pos = get_master_status(config)
-        save_state(state_file, file_, pos)
-        print(f"Estado inicial guardado: {file_}@{pos}")
+        with catalog.Run(config, 'full') as run:
+            coords = full_backup(backup_file, config)
+            file_, pos = coords or get_master_status(config)
+            save_state(state_file, file_, pos)
+            print(f"Estado inicial guardado: {file_}@{pos}")
+            run.end = (file_, pos)
     else:
         # Existe tanto el backup como el estado, hacer incremental
         print("Backup previo encontrado, realizando backup incremental...")
-        incremental_backup(backup_file, state, config)
-        file_, pos = get_master_status(config)
-        save_state(state_file, file_, pos)
-        print(f"Estado actualizado a: {file_}@{pos}")
+        trim_unconfirmed(backup_file, state, pitr.index_path(state_file), integrity.digests_path(state_file))
+        with catalog.Run(config, 'incremental', (state['File'], state['Position'])) as run:
+            file_, pos = incremental_backup(backup_file, state, config)
+            save_state(state_file, file_, pos)
+            print(f"Estado actualizado a: {file_}@{pos}")
+            run.end = (file_, pos)
+        seal_if_full(backup_file, config)
 
 if __name__ == "__main__":
     try:
         main()
     except Exception as e:
         # 2) Aviso de error en backup
-        notifier.notify_backup_error(str(e))  # ← NUEVA LÍNEA
\ No newline at end of file
+        TelegramNotifier().notify_backup_error(str(e))  # ← NUEVA LÍNEA
\ No newline at end of file
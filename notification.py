@@ -7,7 +7,6 @@ TELEGRAM_CHAT_IDS = [
 ]
 
 import os
-import requests
 import socket
 import platform
 from datetime import datetime
@@ -23,6 +22,7 @@ class TelegramNotifier:
             raise ValueError("Falta TELEGRAM_BOT_TOKEN o TELEGRAM_CHAT_IDS")
 
     def send(self, text: str):
+        import requests  # Importar aquí: solo hace falta al enviar y tarda en cargar
         url = f"https://api.telegram.org/bot{self.token}/sendMessage"
         for chat_id in self.chat_ids:
             payload = {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"}
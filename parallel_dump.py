@@ -0,0 +1,845 @@
+import os
+import re
+import json
+import hashlib
+import time
+import queue
+import shutil
+import threading
+import subprocess
+from datetime import datetime
+import compression
+import dbclient
+import fastio
+import integrity
+import rolling
+import throttle
+
+# —————— CONFIGURACIÓN DEL VOLCADO PARALELO ——————
+DUMP_DIR_NAME      = 'dump_tables'          # ← subcarpeta de BACKUP_DIR con un .sql por tabla
+MANIFEST_NAME      = 'manifest.json'
+PREVIOUS_SUFFIX    = '.prev'                # ← dump_tables del ciclo anterior, para reutilizar tablas
+SNAPSHOT_TIMEOUT   = 120                    # ← segundos máximos con el bloqueo global tomado
+CHUNK_MIN_MB       = 1024                   # ← tablas a partir de este tamaño se reparten por rangos de PK (0 = nunca)
+RESUME_DUMP        = True                   # ← reanudar un volcado interrumpido desde sus archivos terminados
+CHECKPOINT_NAME    = 'checkpoint.json'      # ← archivos ya terminados del volcado en curso
+PARTIAL_SUFFIX     = '.partial'             # ← dump_tables del volcado interrumpido mientras se reanuda
+
+TABLE_MARKER  = b'-- Table structure for table `'
+DATA_MARKER   = b'-- Dumping data for table `'
+FOOTER_MARKER = b'/*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;'
+INTEGER_TYPES = ('tinyint', 'smallint', 'mediumint', 'int', 'bigint')
+# ——————————————————————————
+
+
+class _DumpWorker:
+    """
+    Hilo que ejecuta un mysqldump sobre su trabajo.
+
+    Un trabajo es un lote de tablas enteras, que se separa en un archivo por
+    tabla, o un rango de clave primaria de una tabla grande, que va a su propio
+    archivo de tramo. Al terminar el hilo se anuncia en la cola done.
+
+    snapshot se marca con la primera sección de tabla que llega: mysqldump
+    --single-transaction solo empieza a escribirlas después de su START
+    TRANSACTION WITH CONSISTENT SNAPSHOT, así que su snapshot ya está abierto.
+    """
+
+    def __init__(self, worker_id, job, dump_dir, config, limiter=None, done=None):
+        self.worker_id = worker_id
+        self.chunk = job if 'where' in job else None
+        self.tables = [job['table']] if self.chunk else job['tables']
+        self.dump_dir = dump_dir
+        self.config = config
+        self.limiter = limiter
+        self.done = done
+        self.proc = None
+        self.error = None
+        self.results = []
+        self.digests = {}               # archivo -> integrity.Digest, con BACKUP_DIGESTS
+        self.snapshot = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def join(self):
+        self.thread.join()
+
+    def is_alive(self):
+        return self.thread.is_alive()
+
+    def abort(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.kill()
+
+    def _run(self):
+        import main  # Importar aquí para evitar dependencias circulares
+
+        self.hashing = main.digest_file(self.config) is not None
+        cmd = throttle.niced([
+            main.tool_path('mysqldump'),
+            *main.connection_args(self.config),
+            "--single-transaction",
+            *(self._chunk_options() if self.chunk else ["--triggers"]),
+            "--skip-routines",           # <— las rutinas se vuelcan una sola vez aparte
+            "--set-gtid-purged=OFF",
+            self.config['DB_NAME'],
+            *[t['name'] for t in self.tables]
+        ], self.config)
+        by_name = {t['name']: t for t in self.tables}
+        try:
+            self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                         bufsize=fastio.BUFFER_SIZE)
+            if self.chunk:
+                self._copy_chunk(self.proc.stdout)
+            else:
+                footer = self._split_output(self.proc.stdout, by_name)
+            _, stderr = self.proc.communicate()
+            if self.proc.returncode != 0:
+                raise RuntimeError(stderr.decode('utf-8', 'replace').strip()
+                                   or f"mysqldump terminó con código {self.proc.returncode}")
+            self.snapshot.set()
+
+            # Cada archivo por tabla queda autocontenido: cabecera + tabla + pie
+            for entry in self.results if not self.chunk else []:
+                path = os.path.join(self.dump_dir, entry['file'])
+                with compression.open_writer(path, self.config, append=True) as f:
+                    f.write(footer)
+                entry['bytes'] += len(footer)
+                if entry['file'] in self.digests:
+                    self.digests[entry['file']].update(footer)
+            for entry in self.results:
+                if entry['file'] in self.digests:
+                    entry[integrity.ALGORITHM] = self.digests[entry['file']].hexdigest()
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.done is not None:
+                self.done.put(self)
+
+    def _chunk_options(self):
+        """
+        Opciones del tramo: la estructura solo en el primero y los triggers solo
+        en el último, después de todos los datos (no deben dispararse al cargar)
+        """
+        options = [f"--where={self.chunk['where']}"]
+        if self.chunk['chunk'] > 1:
+            options.append("--no-create-info")
+        options.append("--triggers" if self.chunk['chunk'] == self.chunk['chunks'] else "--skip-triggers")
+        return options
+
+    def _copy_chunk(self, stream):
+        """
+        Escribir un tramo de tabla en su archivo.
+
+        Los tramos de una tabla, concatenados, forman la sección de una sola
+        tabla: el primero conserva la cabecera del volcado y el último el pie,
+        los intermedios solo llevan sus datos.
+        """
+        table = self.tables[0]
+        first = self.chunk['chunk'] == 1
+        last = self.chunk['chunk'] == self.chunk['chunks']
+        entry = {
+            "table": table['name'],
+            "file": self.chunk['file'],
+            "bytes": 0,
+            "rows_estimate": table['rows'] // self.chunk['chunks'],
+            "worker": self.worker_id,
+            "chunk": self.chunk['chunk'],
+            "chunks": self.chunk['chunks'],
+            "where": self.chunk['where']
+        }
+        self.results.append(entry)
+        writing = first
+        pending = None  # línea "--" que abre el bloque de datos
+        with compression.open_writer(os.path.join(self.dump_dir, entry['file']), self.config) as out:
+            if compression.resolve_codec(self.config) is None:
+                fastio.preallocate(out.fileno(), table['size'] // self.chunk['chunks'])
+            write = self._hashed(entry['file'], out)
+            opened = False
+            for line in stream:
+                if self.limiter:
+                    self.limiter.pace(len(line))
+                if not opened and line.startswith((TABLE_MARKER, DATA_MARKER)):
+                    self.snapshot.set()
+                    opened = True
+                if not writing:
+                    if line.startswith(DATA_MARKER):
+                        writing = True
+                        line = (pending or b'') + line
+                    else:
+                        pending = line if line.rstrip(b'\r\n') == b'--' else None
+                        continue
+                elif not last and line.startswith(FOOTER_MARKER):
+                    writing = False
+                    pending = None
+                    continue
+                write(line)
+                entry['bytes'] += len(line)
+
+    def _hashed(self, filename, out):
+        """write del archivo, pasando por su huella si BACKUP_DIGESTS está activo"""
+        if not self.hashing:
+            return out.write
+        self.digests[filename] = integrity.Digest()
+        return self.digests[filename].hashed(out.write)
+
+    def _split_output(self, stream, by_name):
+        """Repartir la salida de mysqldump en un archivo por tabla; devuelve el pie del volcado"""
+        header = []
+        footer = []
+        out = None
+        write = None
+        entry = None
+        pending = None  # línea "--" que puede abrir el bloque de la siguiente tabla
+
+        try:
+            for line in stream:
+                if self.limiter:
+                    self.limiter.pace(len(line))
+                if footer or line.startswith(FOOTER_MARKER):
+                    footer.append(line)
+                    continue
+
+                if line.startswith(TABLE_MARKER):
+                    self.snapshot.set()
+                    name = line[len(TABLE_MARKER):].rstrip(b'\r\n').rstrip(b'`').decode('utf-8')
+                    if out:
+                        out.close()
+                    table = by_name[name]
+                    entry = {
+                        "table": name,
+                        "file": table['file'],
+                        "bytes": 0,
+                        "rows_estimate": table['rows'],
+                        "worker": self.worker_id
+                    }
+                    self.results.append(entry)
+                    out = compression.open_writer(os.path.join(self.dump_dir, table['file']), self.config)
+                    if compression.resolve_codec(self.config) is None:
+                        fastio.preallocate(out.fileno(), table['size'])
+                    write = self._hashed(table['file'], out)
+                    block = b''.join(header) + (pending or b'') + line
+                    write(block)
+                    entry['bytes'] += len(block)
+                    pending = None
+                    continue
+
+                if pending is not None:
+                    if out:
+                        write(pending)
+                        entry['bytes'] += len(pending)
+                    else:
+                        header.append(pending)
+                    pending = None
+
+                if line.rstrip(b'\r\n') == b'--':
+                    pending = line
+                elif out:
+                    write(line)
+                    entry['bytes'] += len(line)
+                else:
+                    header.append(line)
+        finally:
+            if out:
+                out.close()
+
+        return b''.join(footer)
+
+
+def _list_tables(session, db_name, suffix=''):
+    """Listar tablas y vistas del esquema con su tamaño estimado"""
+    rows = session.query(
+        "SELECT TABLE_NAME, TABLE_TYPE, COALESCE(DATA_LENGTH, 0), COALESCE(TABLE_ROWS, 0) "
+        "FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME",
+        (db_name,)
+    )
+    tables, views = [], []
+    for row in rows:
+        name, table_type = row[0], row[1]
+        if table_type == 'VIEW':
+            views.append(name)
+            continue
+        index = len(tables) + 1
+        safe_name = re.sub(r'[^\w.-]', '_', name)
+        stem = f"{index:04d}_{safe_name}"
+        tables.append({
+            'name': name,
+            'size': int(row[2]),
+            'rows': int(row[3]),
+            'stem': stem,
+            'file': f"{stem}.sql{suffix}"
+        })
+    return tables, views
+
+
+def _chunk_file(table, chunk, suffix=''):
+    """Archivo de un tramo de tabla: se ordena justo donde iría la tabla entera"""
+    return f"{table['stem']}.part{chunk:03d}.sql{suffix}"
+
+
+def _integer_keys(session, db_name):
+    """Columna de la clave primaria de las tablas cuya PK es un único entero"""
+    rows = session.query(
+        "SELECT k.TABLE_NAME, MIN(k.COLUMN_NAME), MIN(c.DATA_TYPE), COUNT(*) "
+        "FROM information_schema.KEY_COLUMN_USAGE k JOIN information_schema.COLUMNS c "
+        "ON c.TABLE_SCHEMA = k.TABLE_SCHEMA AND c.TABLE_NAME = k.TABLE_NAME AND c.COLUMN_NAME = k.COLUMN_NAME "
+        "WHERE k.TABLE_SCHEMA = %s AND k.CONSTRAINT_NAME = 'PRIMARY' GROUP BY k.TABLE_NAME",
+        (db_name,)
+    )
+    return {row[0]: row[1] for row in rows
+            if int(row[3]) == 1 and _text(row[2]).lower() in INTEGER_TYPES}
+
+
+def _key_ranges(session, db_name, name, column, pieces):
+    """
+    Cláusulas --where de pieces rangos consecutivos de la PK.
+
+    Los límites reparten MIN..MAX a partes iguales (se supone una clave sin
+    grandes huecos). El primer y el último rango quedan abiertos, así que las
+    filas insertadas después de calcularlos también entran en el volcado.
+    """
+    quoted = f"`{column.replace('`', '``')}`"
+    low, high = session.query(
+        f"SELECT MIN({quoted}), MAX({quoted}) FROM `{db_name}`.`{name.replace('`', '``')}`")[0]
+    if low is None:
+        return None
+    low, high = int(low), int(high)
+    step = (high - low + 1) / pieces
+    bounds = sorted({low + int(step * i) for i in range(1, pieces)} - {low})
+    if not bounds:
+        return None
+    wheres = [f"{quoted} < {bounds[0]}"]
+    wheres += [f"{quoted} >= {a} AND {quoted} < {b}" for a, b in zip(bounds, bounds[1:])]
+    wheres.append(f"{quoted} >= {bounds[-1]}")
+    return wheres
+
+
+def _plan_chunks(session, db_name, tables, threads, chunk_min, previous_plan):
+    """
+    Rangos de PK de las tablas grandes: {tabla: [where, ...]}.
+
+    Cada tramo es un mysqldump más que tiene que abrir su snapshot bajo el
+    bloqueo, así que entre todas las tablas no se pasa de DUMP_THREADS procesos
+    (dejando uno para el resto de tablas). Cada tabla recibe tramos en
+    proporción a su peso en el volcado. Un volcado reanudado conserva los
+    rangos del interrumpido para que sus tramos terminados sigan valiendo.
+    """
+    big = [t for t in tables if chunk_min > 0 and t['size'] >= chunk_min]
+    if threads < 2 or not big:
+        return {}
+    keys = _integer_keys(session, db_name)
+    total = sum(t['size'] for t in tables) or 1
+    free = threads - (1 if len(tables) > 1 else 0)
+    plan = {}
+    for table in sorted(big, key=lambda t: t['size'], reverse=True):
+        column = keys.get(table['name'])
+        if column is None or free < 2:
+            continue
+        wheres = previous_plan.get(table['name'])
+        if not wheres or len(wheres) > free:
+            pieces = min(free, max(2, round(table['size'] * threads / total)))
+            wheres = _key_ranges(session, db_name, table['name'], column, pieces)
+        if wheres:
+            plan[table['name']] = wheres
+            free -= len(wheres)
+    return plan
+
+
+def _plan_buckets(tables, threads):
+    """Repartir las tablas entre los hilos equilibrando bytes (mayor primero)"""
+    buckets = [[] for _ in range(min(threads, len(tables)))]
+    loads = [0] * len(buckets)
+    for table in sorted(tables, key=lambda t: t['size'], reverse=True):
+        i = loads.index(min(loads))
+        buckets[i].append(table)
+        loads[i] += table['size']
+    return buckets
+
+
+def _wait_for_snapshots(workers, timeout):
+    """
+    Esperar a que cada hilo haya abierto su snapshot antes de soltar el bloqueo.
+
+    Se espera a la señal de cada uno y no a un recuento de transacciones en el
+    servidor: una conexión de la aplicación que abra una transacción en la
+    base de datos durante la espera no cuenta como snapshot de un hilo.
+    """
+    deadline = time.time() + timeout
+    while True:
+        failed = [w for w in workers if w.error]
+        if failed:
+            raise RuntimeError(f"Error en hilo de volcado {failed[0].worker_id}: {failed[0].error}")
+
+        if all(w.snapshot.is_set() for w in workers):
+            return
+        if time.time() > deadline:
+            raise RuntimeError("Timeout esperando el snapshot consistente de los hilos de volcado")
+        time.sleep(0.2)
+
+
+def _text(value):
+    """Valor de consulta como texto comparable (PyMySQL devuelve datetime, el CLI texto)"""
+    return None if value is None else str(value)
+
+
+def _table_stats(session, db_name):
+    """UPDATE_TIME y CREATE_TIME de cada tabla, más la hora del servidor en ese momento"""
+    rows = session.query(
+        "SELECT TABLE_NAME, UPDATE_TIME, CREATE_TIME FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'",
+        (db_name,)
+    )
+    now = _text(session.query("SELECT NOW()")[0][0])
+    return {row[0]: (_text(row[1]), _text(row[2])) for row in rows}, now
+
+
+def _ddl_hashes(session, db_name, names):
+    """Hash de SHOW CREATE TABLE (incluye AUTO_INCREMENT) y de los triggers de cada tabla"""
+    triggers = {}
+    for row in session.query(
+        "SELECT EVENT_OBJECT_TABLE, TRIGGER_NAME, ACTION_TIMING, EVENT_MANIPULATION, ACTION_STATEMENT "
+        "FROM information_schema.TRIGGERS WHERE EVENT_OBJECT_SCHEMA = %s ORDER BY TRIGGER_NAME",
+        (db_name,)
+    ):
+        triggers.setdefault(row[0], []).append("|".join(_text(v) or '' for v in row[1:]))
+
+    hashes = {}
+    for name in names:
+        quoted = name.replace('`', '``')
+        ddl = session.query(f"SHOW CREATE TABLE `{db_name}`.`{quoted}`")[0][1]
+        text = "\n".join([_text(ddl)] + triggers.get(name, []))
+        hashes[name] = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return hashes
+
+
+def _checksums(session, db_name, names):
+    """CHECKSUM TABLE de todas las tablas en una sola sentencia (lectura completa en el servidor)"""
+    if not names:
+        return {}
+    tables = ", ".join(f"`{db_name}`.`{n.replace('`', '``')}`" for n in names)
+    return {row[0].split('.', 1)[1]: _text(row[1]) for row in session.query(f"CHECKSUM TABLE {tables}")}
+
+
+def _load_previous(prev_dir, config, name=MANIFEST_NAME):
+    """Manifiesto (o checkpoint) anterior si sus archivos son reutilizables con la configuración actual"""
+    path = os.path.join(prev_dir, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('db_name') != config['DB_NAME'] \
+            or manifest.get('compression') != compression.resolve_codec(config) \
+            or 'snapshot_time' not in manifest:
+        return None
+    return manifest
+
+
+def _write_json(path, data):
+    """Escribir un JSON de forma atómica (temporal + rename), para no dejarlo a medias"""
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _unchanged(previous, snapshot_time, stats, ddl, checksum):
+    """
+    Decidir si la tabla está igual que en el volcado anterior.
+
+    Con checksum manda el CHECKSUM TABLE. Sin él, UPDATE_TIME igual al del
+    volcado anterior, y anterior al instante de aquel snapshot: UPDATE_TIME
+    tiene resolución de segundos, y una escritura en el mismo segundo en que se
+    soltó el bloqueo no se distinguiría.
+    """
+    fingerprint = previous.get('fingerprint') if previous else None
+    if not fingerprint or fingerprint.get('ddl') != ddl:
+        return False
+    if checksum is not None:
+        return fingerprint.get('checksum') == checksum
+    update_time = fingerprint.get('update_time')
+    return (update_time is not None and update_time < snapshot_time
+            and [update_time, fingerprint.get('create_time')] == list(stats))
+
+
+def _dump_objects(config, dump_dir, views):
+    """
+    Volcar vistas y rutinas una única vez; devuelve (archivos, huellas).
+
+    Se llama con el bloqueo global tomado: sin DDL posible, las definiciones
+    son las del instante del snapshot de las tablas. Van detrás de ellas al
+    ensamblar el backup.
+    """
+    import main  # Importar aquí para evitar dependencias circulares
+
+    base = [main.tool_path('mysqldump'), *main.connection_args(config), "--single-transaction",
+            "--set-gtid-purged=OFF", "--skip-triggers"]
+    suffix = compression.extension(config)
+    jobs = []
+    if views:
+        jobs.append(("views.sql" + suffix, base + ["--no-data", config['DB_NAME'], *views]))
+    jobs.append(("routines.sql" + suffix, base + ["--no-create-info", "--no-data", "--routines", config['DB_NAME']]))
+
+    files, digests = [], []
+    for filename, cmd in jobs:
+        digest = integrity.Digest() if main.digest_file(config) else None
+        compression.run_to_file(throttle.niced(cmd, config), os.path.join(dump_dir, filename), config,
+                                digest=digest)
+        files.append(filename)
+        digests.append(digest)
+    return files, digests
+
+
+def _record_digests(digest_log, dump_dir, entries, object_files, object_digests):
+    """Apuntar cada archivo ensamblado como un tramo del registro de huellas del backup"""
+    records = [{"length": e['bytes'], integrity.ALGORITHM: e[integrity.ALGORITHM]} for e in entries]
+    records += [digest.record() for digest in object_digests]
+    ends, end = [], 0
+    for filename in [e['file'] for e in entries] + object_files:
+        end += os.path.getsize(os.path.join(dump_dir, filename))
+        ends.append(end)
+    integrity.append(digest_log, records, ends)
+
+
+def _assemble(backup_file, dump_dir, entries, object_files, config):
+    """
+    Concatenar los archivos por tabla en el backup.sql que espera el resto del proceso.
+
+    La copia se hace dentro del kernel (copy_file_range/sendfile) y el destino se
+    reserva de una vez con el tamaño exacto de la suma de las partes. Con
+    ROLLING_PARTS se cierra una parte cada vez que lo copiado llega al tamaño
+    máximo: cada archivo acaba en fin de sentencia, así que se corta entre
+    archivos. Vistas y rutinas van siempre en la parte en curso.
+    """
+    groups = rolling.group_files([e['bytes'] for e in entries], config)
+    start = 0
+    for i, (count, content) in enumerate(groups):
+        filenames = [e['file'] for e in entries[start:start + count]]
+        start += count
+        last = i == len(groups) - 1
+        paths = [os.path.join(dump_dir, filename) for filename in filenames + (object_files if last else [])]
+        with open(backup_file, 'wb') as out:
+            fastio.preallocate(out.fileno(), sum(os.path.getsize(p) for p in paths), 0)
+            for path in paths:
+                fastio.copy_file(path, out)
+        if not last:
+            rolling.seal(backup_file, content)
+
+
+def _rotate_previous(dump_dir, prev_dir):
+    """Conservar el volcado anterior como dump_tables.prev (sustituye al que hubiera)"""
+    if os.path.isdir(dump_dir):
+        if os.path.isdir(prev_dir):
+            shutil.rmtree(prev_dir)
+        os.replace(dump_dir, prev_dir)
+
+
+def _prepare_dump_dir(dump_dir, skip_unchanged, resume):
+    """
+    Dejar dump_tables vacía conservando lo que se pueda reutilizar.
+
+    Un volcado interrumpido (con checkpoint) pasa a dump_tables.partial; uno
+    completo pasa a dump_tables.prev si se reutilizan tablas sin cambios. Un
+    volcado a medias nunca sustituye al .prev.
+    """
+    partial_dir = dump_dir + PARTIAL_SUFFIX
+    prev_dir = dump_dir + PREVIOUS_SUFFIX
+    if resume and os.path.exists(os.path.join(dump_dir, CHECKPOINT_NAME)):
+        _rotate_previous(dump_dir, partial_dir)
+    elif skip_unchanged and os.path.exists(os.path.join(dump_dir, MANIFEST_NAME)):
+        _rotate_previous(dump_dir, prev_dir)
+    elif os.path.isdir(dump_dir):
+        shutil.rmtree(dump_dir)
+    if not resume and os.path.isdir(partial_dir):
+        shutil.rmtree(partial_dir)
+    os.makedirs(dump_dir)
+
+
+def _plan_reuse(session, db_name, tables, sources, use_checksum):
+    """
+    Fase previa al bloqueo de la detección de cambios.
+
+    Calcula la huella de todas las tablas (DDL, UPDATE_TIME y, si se pide,
+    CHECKSUM TABLE) y elige como candidatas las que coinciden con un volcado
+    anterior y conservan todos sus archivos. sources es una lista de
+    (manifiesto o checkpoint, carpeta) por orden de preferencia; cada candidata
+    es {'dir', 'entries'}, con varias entradas si la tabla se volcó por tramos.
+    Nada de esto es todavía definitivo: se confirma bajo el bloqueo en
+    _confirm_reuse.
+    """
+    stats, now = _table_stats(session, db_name)
+    names = [t['name'] for t in tables]
+    ddl = _ddl_hashes(session, db_name, names)
+    checksums = _checksums(session, db_name, names) if use_checksum else {}
+
+    fingerprints, candidates = {}, {}
+    for name in names:
+        fingerprints[name] = {
+            "update_time": stats.get(name, (None, None))[0],
+            "create_time": stats.get(name, (None, None))[1],
+            "ddl": ddl[name],
+            "checksum": checksums.get(name)
+        }
+        for manifest, directory in sources:
+            entries = [e for e in manifest['tables'] if e['table'] == name]
+            if entries and all(os.path.exists(os.path.join(directory, e['file'])) for e in entries) \
+                    and _unchanged(entries[0], manifest['snapshot_time'], stats.get(name, (None, None)),
+                                   ddl[name], checksums.get(name) if use_checksum else None):
+                candidates[name] = {'dir': directory, 'entries': entries}
+                break
+    return fingerprints, candidates, now
+
+
+def _confirm_reuse(session, db_name, fingerprints, candidates, checked_at):
+    """
+    Fase bajo el bloqueo: descartar las candidatas que cambiaron desde la fase previa.
+
+    Con FTWRL tomado no hay escrituras, así que UPDATE_TIME y el DDL leídos aquí
+    son los del snapshot. Una tabla cuya UPDATE_TIME se movió (o coincide con el
+    segundo de la fase previa y no se puede saber) pierde su checksum, que ya no
+    corresponde al volcado.
+
+    Returns:
+        tuple: (candidatas confirmadas, hora del servidor en el snapshot)
+    """
+    stats, snapshot_time = _table_stats(session, db_name)
+    ddl = _ddl_hashes(session, db_name, list(candidates))
+    for name, fingerprint in fingerprints.items():
+        update_time, create_time = stats.get(name, (None, None))
+        moved = [update_time, create_time] != [fingerprint['update_time'], fingerprint['create_time']] \
+            or (update_time is not None and update_time >= checked_at)
+        if moved:
+            fingerprint['checksum'] = None
+            candidates.pop(name, None)
+        elif name in candidates and ddl[name] != fingerprint['ddl']:
+            fingerprint['ddl'] = ddl[name]
+            candidates.pop(name, None)
+        fingerprint['update_time'], fingerprint['create_time'] = update_time, create_time
+    return candidates, snapshot_time
+
+
+def _pending_chunks(entries, wheres):
+    """
+    Tramos (número, where) que faltan de una tabla reutilizada; None si lo
+    reutilizado no sirve.
+
+    Una tabla entera, o con todos sus tramos, se reutiliza tal cual aunque ahora
+    se repartiera de otra forma. Con solo parte de los tramos (volcado
+    interrumpido) hacen falta los mismos rangos para completar los demás.
+    """
+    chunks = entries[0].get('chunks')
+    if chunks is None or len(entries) == chunks:
+        return []
+    if not wheres or len(wheres) != chunks or any(wheres[e['chunk'] - 1] != e['where'] for e in entries):
+        return None
+    done = {e['chunk'] for e in entries}
+    return [(i, where) for i, where in enumerate(wheres, 1) if i not in done]
+
+
+def parallel_full_backup(backup_file, config, limiter=None):
+    """
+    Backup completo en paralelo por tabla.
+
+    Toma FLUSH TABLES WITH READ LOCK, captura la posición del binlog y arranca
+    DUMP_THREADS procesos mysqldump con --single-transaction; el bloqueo se
+    libera en cuanto todos han abierto su snapshot, así que todas las tablas
+    corresponden al mismo instante; vistas y rutinas se vuelcan también con el
+    bloqueo tomado. Cada tabla queda en su propio archivo dentro
+    de BACKUP_DIR/dump_tables junto a un manifest.json, y se reensamblan en
+    backup_file para el proceso incremental y nocturno. Con compresión cada
+    archivo es un stream gzip/zstd independiente y el reensamblado es una simple
+    concatenación de frames.
+
+    Las tablas de más de CHUNK_MIN_MB con PK entera se reparten en rangos de
+    clave, cada uno con su propio mysqldump y su archivo de tramo, para volcar
+    una misma tabla en varios procesos.
+
+    Con SKIP_UNCHANGED el volcado anterior se conserva y las tablas cuya huella
+    (DDL y UPDATE_TIME, o CHECKSUM TABLE con FINGERPRINT_CHECKSUM) no cambió
+    reutilizan su archivo en lugar de volver a consultarse. Con RESUME_DUMP cada
+    archivo terminado se apunta en checkpoint.json; si el volcado se interrumpe,
+    el siguiente reutiliza de la misma forma las tablas y tramos ya terminados
+    cuya huella no haya cambiado desde entonces.
+
+    Con un limitador (throttle.Throttle) todos los hilos leen las salidas de
+    mysqldump al ritmo común que marque. Con BACKUP_DIGESTS cada archivo guarda
+    en el manifiesto el BLAKE2b de su contenido, y cada uno queda como un tramo
+    del registro de huellas del backup (ver integrity.py).
+
+    Returns:
+        tuple: (archivo, posición) del binlog en el instante del snapshot
+    """
+    db_name = config['DB_NAME']
+    threads = max(1, int(config.get('DUMP_THREADS', 1)))
+    skip_unchanged = config.get('SKIP_UNCHANGED', False)
+    resume = config.get('RESUME_DUMP', RESUME_DUMP)
+    use_checksum = config.get('FINGERPRINT_CHECKSUM', False)
+    chunk_min = int(float(config.get('CHUNK_MIN_MB', CHUNK_MIN_MB)) * 1024**2)
+    suffix = compression.extension(config)
+    dump_dir = os.path.join(config['BACKUP_DIR'], DUMP_DIR_NAME)
+    prev_dir = dump_dir + PREVIOUS_SUFFIX
+    partial_dir = dump_dir + PARTIAL_SUFFIX
+    started = time.time()
+
+    import main  # Importar aquí para evitar dependencias circulares
+
+    digest_log = main.digest_file(config)
+    print(f"-> Generando backup completo paralelo de {db_name} ({threads} hilos)")
+    _prepare_dump_dir(dump_dir, skip_unchanged, resume)
+    checkpoint = _load_previous(partial_dir, config, CHECKPOINT_NAME) if resume else None
+    previous = _load_previous(prev_dir, config) if skip_unchanged else None
+    sources = [(m, d) for m, d in ((checkpoint, partial_dir), (previous, prev_dir)) if m]
+    if checkpoint:
+        print(f"⏯️ Reanudando el volcado interrumpido del {checkpoint['snapshot_time']} "
+              f"({len(checkpoint['tables'])} archivos terminados)")
+
+    workers = []
+    object_files, object_digests = [], []
+    done = queue.Queue()
+    fingerprints, reused, snapshot_time = {}, {}, None
+    # La sesión que toma el bloqueo global sale del pool compartido y vuelve a él al terminar
+    with dbclient.get_pool(config).connection() as session:
+        try:
+            tables, views = _list_tables(session, db_name, suffix)
+            if not tables:
+                raise RuntimeError(f"No se encontraron tablas en {db_name}")
+
+            if skip_unchanged or resume:
+                # MySQL 8 cachea las estadísticas de information_schema; MySQL 5.7 y MariaDB no tienen
+                # la variable, y se pregunta antes para no provocar un error en la sesión del bloqueo
+                if session.query("SHOW VARIABLES LIKE 'information_schema_stats_expiry'"):
+                    session.query("SET SESSION information_schema_stats_expiry = 0")
+                fingerprints, candidates, checked_at = _plan_reuse(
+                    session, db_name, tables, sources, use_checksum)
+            chunks = _plan_chunks(session, db_name, tables, threads, chunk_min,
+                                  checkpoint.get('plan', {}) if checkpoint else {})
+
+            session.query("FLUSH TABLES WITH READ LOCK")
+            try:
+                binlog_file, binlog_pos = session.query("SHOW MASTER STATUS")[0][:2]
+                binlog_pos = int(binlog_pos)
+                if fingerprints:
+                    reused, snapshot_time = _confirm_reuse(session, db_name, fingerprints,
+                                                           candidates, checked_at)
+
+                jobs, whole = [], []
+                for table in tables:
+                    name = table['name']
+                    pending = None
+                    if name in reused:
+                        pending = _pending_chunks(reused[name]['entries'], chunks.get(name))
+                        if pending is None:
+                            reused.pop(name)
+                    if pending is None and name in chunks:
+                        pending = list(enumerate(chunks[name], 1))
+                    if pending is None:
+                        whole.append(table)
+                        continue
+                    jobs += [{'table': table, 'chunk': i, 'chunks': len(chunks[name]), 'where': where,
+                              'file': _chunk_file(table, i, suffix)} for i, where in pending]
+                jobs += [{'tables': bucket} for bucket in _plan_buckets(whole, max(1, threads - len(jobs)))]
+
+                workers = [_DumpWorker(i + 1, job, dump_dir, config, limiter, done)
+                           for i, job in enumerate(jobs)]
+                for worker in workers:
+                    worker.start()
+
+                # Vistas y rutinas mientras los hilos abren su snapshot, aún sin DDL posible
+                object_files, object_digests = _dump_objects(config, dump_dir, views)
+                _wait_for_snapshots(workers, config.get('SNAPSHOT_TIMEOUT', SNAPSHOT_TIMEOUT))
+            finally:
+                session.query("UNLOCK TABLES")
+            print(f"🔓 Snapshot consistente en {binlog_file}@{binlog_pos}, bloqueo liberado")
+        except Exception:
+            for worker in workers:
+                worker.abort()
+            raise
+
+    # Las tablas y tramos sin cambios pasan del volcado anterior al nuevo con su nombre actual
+    reused_entries = []
+    for table in tables:
+        candidate = reused.get(table['name'])
+        for entry in candidate['entries'] if candidate else []:
+            filename = _chunk_file(table, entry['chunk'], suffix) if 'chunk' in entry else table['file']
+            os.replace(os.path.join(candidate['dir'], entry['file']), os.path.join(dump_dir, filename))
+            entry = dict(entry, file=filename, reused=True)
+            if digest_log and integrity.ALGORITHM not in entry:
+                # Volcado anterior a las huellas: se calcula una vez aquí
+                entry[integrity.ALGORITHM] = integrity.hash_file(os.path.join(dump_dir, filename))[0]
+            reused_entries.append(entry)
+    if reused_entries:
+        reused_mb = sum(e['bytes'] for e in reused_entries) / 1024**2
+        print(f"♻️ {len(reused_entries)} archivos de tablas sin cambios reutilizados ({reused_mb:.1f} MB)")
+
+    finished = list(reused_entries)
+    checkpoint_path = os.path.join(dump_dir, CHECKPOINT_NAME)
+
+    def save_checkpoint():
+        if not resume:
+            return
+        for entry in finished:
+            entry['fingerprint'] = fingerprints[entry['table']]
+        _write_json(checkpoint_path, {
+            "db_name": db_name,
+            "compression": compression.resolve_codec(config),
+            "snapshot_time": snapshot_time,
+            "binlog_file": binlog_file,
+            "binlog_position": binlog_pos,
+            "plan": chunks,
+            "tables": finished
+        })
+
+    save_checkpoint()
+    if os.path.isdir(partial_dir):
+        shutil.rmtree(partial_dir)
+
+    for _ in workers:
+        worker = done.get()
+        worker.join()
+        if worker.error:
+            for other in workers:
+                other.abort()
+            raise RuntimeError(f"Error en hilo de volcado {worker.worker_id}: {worker.error}")
+        finished += worker.results
+        save_checkpoint()
+        total = sum(e['bytes'] for e in worker.results)
+        if worker.chunk:
+            print(f"✅ Hilo {worker.worker_id}: tramo {worker.chunk['chunk']}/{worker.chunk['chunks']} "
+                  f"de {worker.tables[0]['name']}, {total / 1024**2:.1f} MB")
+        else:
+            print(f"✅ Hilo {worker.worker_id}: {len(worker.results)} tablas, {total / 1024**2:.1f} MB")
+
+    entries = sorted(finished, key=lambda e: e['file'])
+    for entry in entries:
+        if entry['table'] in fingerprints:
+            entry['fingerprint'] = fingerprints[entry['table']]
+    duration = time.time() - started
+    manifest = {
+        "db_name": db_name,
+        "creation_time": datetime.now().isoformat(),
+        "binlog_file": binlog_file,
+        "binlog_position": binlog_pos,
+        "threads": len(workers),
+        "compression": compression.resolve_codec(config),
+        "duration_seconds": round(duration, 2),
+        "tables": entries,
+        "objects": object_files
+    }
+    if fingerprints:
+        manifest["snapshot_time"] = snapshot_time
+        manifest["reused_tables"] = len(reused)
+    _write_json(os.path.join(dump_dir, MANIFEST_NAME), manifest)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    _assemble(backup_file, dump_dir, entries, object_files, config)
+    if digest_log:
+        _record_digests(digest_log, dump_dir, entries, object_files, object_digests)
+    if os.path.isdir(prev_dir):
+        shutil.rmtree(prev_dir)
+
+    total_mb = sum(e['bytes'] for e in entries) / 1024**2
+    print(f"Backup completo paralelo guardado en {backup_file} "
+          f"({len(tables)} tablas, {len(entries)} archivos, {total_mb:.1f} MB en {duration:.1f}s)")
+    return binlog_file, binlog_pos
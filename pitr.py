@@ -0,0 +1,329 @@
+import os
+import re
+import sys
+import json
+import bisect
+from datetime import datetime
+import chunkstore
+import compression
+import rolling
+
+# —————— CONFIGURACIÓN DEL ÍNDICE PITR ——————
+INDEX_SUFFIX     = '.pitr.jsonl'            # ← junto al archivo de estado (backup.state.pitr.jsonl)
+DAILY_INDEX_NAME = 'pitr_index.jsonl'       # ← copia del índice en la carpeta de cada día
+POINT_INTERVAL   = 60                       # ← segundos de binlog entre puntos del índice
+POINT_MAX_BYTES  = 64 * 1024**2             # ← y como mucho estos bytes de texto entre puntos
+
+AT_PREFIX    = b'# at '
+HEADER_RE    = re.compile(rb'#(\d\d)(\d\d)(\d\d) +(\d?\d:\d\d:\d\d) server id ')
+ROTATE_RE    = re.compile(rb'Rotate to (\S+)\s+pos: (\d+)')
+END_POS_RE   = re.compile(rb'end_log_pos (\d+)')
+TX_END_LINES = (b'COMMIT/*!*/;', b'ROLLBACK/*!*/;')
+META_EVENTS  = (b'Start: binlog', b'Rotate to ', b'Previous-GTIDs', b'\tStop')
+GTID_RE      = re.compile(rb'\s(Anonymous_)?GTID(\s|$)')
+# ——————————————————————————
+
+
+def index_path(state_file):
+    """Índice PITR del ciclo actual, al lado del archivo de estado"""
+    return os.path.splitext(state_file)[0] + INDEX_SUFFIX
+
+
+def normalize_time(value):
+    """Fecha/hora como la guarda el índice ('YYYY-MM-DD HH:MM:SS') para comparar como texto"""
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return datetime.fromisoformat(str(value).strip()).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class Indexer:
+    """
+    Puntos de corte en la salida de texto de mysqlbinlog.
+
+    Se alimenta línea a línea con su desplazamiento. Un punto de corte es un
+    "# at N" fuera de transacción (sin BEGIN pendiente de su COMMIT), así que
+    restaurar hasta él nunca deja una transacción a medias; su hora es la de la
+    cabecera del evento. El evento que sigue a un GTID (su BEGIN o su DDL)
+    pertenece a la misma transacción y tampoco es punto de corte. Para que el
+    índice no crezca con cada transacción solo se guarda un punto cada
+    POINT_INTERVAL segundos o POINT_MAX_BYTES bytes.
+
+    La posición de cada punto es la del binlog del servidor: el end_log_pos del
+    evento anterior (start para el primero). Así vale también cuando
+    binlog_parser ya filtró el tramo y los "# at" son de su archivo reducido.
+    """
+
+    def __init__(self, binlog_file, start=None, interval=POINT_INTERVAL, max_bytes=POINT_MAX_BYTES):
+        self.current_file = binlog_file
+        self.last_end = start       # end_log_pos del último evento (posición real en el servidor)
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.in_transaction = False
+        self.after_gtid = False
+        self.pending = None         # (desplazamiento, posición) del último "# at" fuera de transacción
+        self.points = []
+        self.last_point = None      # (segundos, desplazamiento) del último punto guardado
+
+    def line(self, line, offset):
+        """
+        Procesar una línea.
+
+        Returns:
+            tuple | None: (desplazamiento, hora) cuando la línea completa un punto
+            de corte, se guarde o no en el índice
+        """
+        if line.startswith(AT_PREFIX):
+            inside = self.in_transaction or self.after_gtid
+            position = self.last_end if self.last_end is not None else int(line[len(AT_PREFIX):])
+            self.pending = None if inside else (offset, position)
+            self.after_gtid = False
+            return None
+
+        if line.startswith(b'#'):
+            match = ROTATE_RE.search(line)
+            if match:
+                self.current_file = match.group(1).decode('utf-8')
+                self.last_end = None
+            match = HEADER_RE.match(line)
+            if match and not any(meta in line for meta in META_EVENTS):
+                end = END_POS_RE.search(line)
+                if end and int(end.group(1)):
+                    self.last_end = int(end.group(1))
+            if match and GTID_RE.search(line):
+                self.after_gtid = True
+            if match and self.pending and any(meta in line for meta in META_EVENTS):
+                self.pending = None     # inicio de archivo o rotación: su hora no es la de ninguna transacción
+            elif match and self.pending:
+                point_offset, position = self.pending
+                self.pending = None
+                year, month, day, clock = match.groups()
+                when = f"20{year.decode()}-{month.decode()}-{day.decode()} {clock.decode():0>8}"
+                self._consider(point_offset, position, when)
+                return point_offset, when
+            return None
+
+        stripped = line.rstrip(b'\r\n')
+        if stripped == b'BEGIN':
+            self.in_transaction = True
+        elif stripped in TX_END_LINES:
+            self.in_transaction = False
+        return None
+
+    def _consider(self, offset, position, when):
+        seconds = datetime.fromisoformat(when).timestamp()
+        if self.last_point is not None \
+                and seconds - self.last_point[0] < self.interval \
+                and offset - self.last_point[1] < self.max_bytes:
+            return
+        self.last_point = (seconds, offset)
+        self.points.append({"time": when, "binlog": self.current_file, "pos": position, "offset": offset})
+
+    def take(self):
+        """Devolver los puntos nuevos y vaciar la lista (el estado de transacción se conserva)"""
+        points, self.points = self.points, []
+        return points
+
+
+def scan(path, binlog_file, start=None):
+    """
+    Puntos de corte de un tramo de mysqlbinlog ya exportado.
+
+    Returns:
+        tuple: (puntos con desplazamientos desde el inicio del tramo, tamaño sin comprimir)
+    """
+    indexer = Indexer(binlog_file, start)
+    offset = 0
+    with compression.open_reader(path) as src:
+        for line in src:
+            indexer.line(line, offset)
+            offset += len(line)
+    return indexer.take(), offset
+
+
+def append(index_file, points, logical_start, disk_end, logical_end):
+    """
+    Añadir al índice los puntos de un tramo recién añadido al backup.
+
+    Los desplazamientos son del contenido sin comprimir, que es lo que se
+    conserva al dividir el día en partes. Tras los puntos va un registro "end"
+    con el tamaño del backup del día en disco y sin comprimir, que permite continuar el
+    índice sin volver a leer el archivo comprimido.
+    """
+    lines = [dict(point, offset=logical_start + point['offset']) for point in points]
+    lines.append({"end": logical_end, "disk_end": disk_end})
+    with open(index_file, 'a', encoding='utf-8') as f:
+        f.write("".join(json.dumps(line) + "\n" for line in lines))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _records(index_file):
+    if not os.path.exists(index_file):
+        return []
+    with open(index_file, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load(index_file):
+    """Puntos del índice en orden"""
+    return [r for r in _records(index_file) if 'end' not in r]
+
+
+def logical_end(index_file, backup_file):
+    """
+    Tamaño sin comprimir del backup del día (con las partes ya cerradas, ver rolling).
+
+    El del índice si coincide con lo que hay en disco; si no, se calcula.
+    """
+    sealed = rolling.sealed_content(backup_file)
+    if not os.path.exists(backup_file):
+        return sealed
+    if compression.detect_codec(backup_file) is None:
+        return sealed + os.path.getsize(backup_file)
+    ends = [r for r in _records(index_file) if 'end' in r]
+    if ends and ends[-1]['disk_end'] == rolling.disk_size(backup_file):
+        return ends[-1]['end']
+    return sealed + compression.uncompressed_size(backup_file)
+
+
+def trim(index_file, disk_size):
+    """Descartar lo indexado más allá de disk_size (el backup se recortó al último checkpoint)"""
+    records = _records(index_file)
+    keep = 0
+    for i, record in enumerate(records):
+        if 'end' in record:
+            if record['disk_end'] > disk_size:
+                break
+            keep = i + 1
+    if keep == len(records):
+        return
+    tmp = index_file + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write("".join(json.dumps(r) + "\n" for r in records[:keep]))
+    os.replace(tmp, index_file)
+
+
+def reset(index_file):
+    """Empezar un índice nuevo (backup completo nuevo)"""
+    if os.path.exists(index_file):
+        os.remove(index_file)
+
+
+def export_daily(index_file, daily_folder):
+    """
+    Copiar los puntos del índice a la carpeta del día.
+
+    Solo se conserva el desplazamiento sin comprimir: las partes se recomprimen
+    por separado y backup_info.json guarda dónde empieza cada una.
+
+    Returns:
+        dict | None: rango de horas cubierto y número de puntos
+    """
+    points = load(index_file)
+    if not points:
+        return None
+    with open(os.path.join(daily_folder, DAILY_INDEX_NAME), 'w', encoding='utf-8') as f:
+        for point in points:
+            f.write(json.dumps({k: point[k] for k in ('time', 'binlog', 'pos', 'offset')}) + "\n")
+    return {"from": points[0]['time'], "to": points[-1]['time'], "points": len(points)}
+
+
+def open_at(daily_folder, info, offset):
+    """Abrir el contenido de un día a partir del desplazamiento sin comprimir offset"""
+    if info.get('storage') == 'dedup':
+        return chunkstore.open_day(info['chunk_store'], daily_folder, offset)
+
+    starts = [f['offset'] for f in info['files']]
+    i = max(bisect.bisect_right(starts, offset) - 1, 0)
+    path = os.path.join(daily_folder, info['files'][i]['filename'])
+    src = compression.open_reader(path)
+    skip = offset - starts[i]
+    if compression.detect_codec(path) is None:
+        src.seek(skip)
+    else:
+        while skip:
+            skip -= len(src.read(min(skip, compression.PIPE_CHUNK_SIZE)))
+    return _Chain(src, [os.path.join(daily_folder, f['filename']) for f in info['files'][i + 1:]])
+
+
+class _Chain:
+    """Lectura por líneas de una parte ya posicionada seguida de las siguientes partes"""
+
+    def __init__(self, first, paths):
+        self.current = first
+        self.paths = list(paths)
+
+    def __iter__(self):
+        while self.current is not None:
+            yield from self.current
+            self.current.close()
+            self.current = compression.open_reader(self.paths.pop(0)) if self.paths else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.current is not None:
+            self.current.close()
+
+
+def can_seek(daily_folder, info):
+    """El día tiene índice PITR y se sabe dónde empieza cada parte"""
+    if not load(os.path.join(daily_folder, DAILY_INDEX_NAME)):
+        return False
+    return info.get('storage') == 'dedup' or all(f.get('offset') is not None for f in info['files'])
+
+
+def find_cut(daily_folder, info, until):
+    """
+    Desplazamiento donde cortar el día para restaurar hasta until.
+
+    Con el índice se salta directamente al último punto anterior a until y solo
+    se recorre desde ahí (como mucho POINT_INTERVAL segundos de binlog) hasta el
+    primer punto de corte posterior. Sin índice devuelve None y el corte se
+    busca recorriendo el binlog completo.
+
+    Returns:
+        int | None: desplazamiento sin comprimir del corte; None si no hay índice
+        (ver can_seek) o si until es posterior a todo el día
+    """
+    if not can_seek(daily_folder, info):
+        return None
+    points = load(os.path.join(daily_folder, DAILY_INDEX_NAME))
+
+    until = normalize_time(until)
+    i = bisect.bisect_right([p['time'] for p in points], until)
+    if i == 0:
+        # Antes de la primera transacción del día: solo el volcado completo
+        return points[0]['offset']
+
+    start = points[i - 1]['offset']
+    indexer = Indexer(points[i - 1]['binlog'])
+    offset = start
+    with open_at(daily_folder, info, start) as src:
+        for line in src:
+            found = indexer.line(line, offset)
+            if found and found[1] > until:
+                return found[0]
+            offset += len(line)
+    return None
+
+
+if __name__ == "__main__":
+    # Uso: python pitr.py <carpeta_del_día> [hasta]
+    if len(sys.argv) < 2:
+        print("Uso: python pitr.py <carpeta_del_día> [hasta]")
+        sys.exit(1)
+
+    folder = sys.argv[1]
+    with open(os.path.join(folder, 'backup_info.json'), 'r', encoding='utf-8') as f:
+        day_info = json.load(f)
+    index = load(os.path.join(folder, DAILY_INDEX_NAME))
+    if not index:
+        print("⚠️ El día no tiene índice PITR")
+        sys.exit(1)
+    print(f"🕒 {len(index)} puntos entre {index[0]['time']} y {index[-1]['time']}")
+    if len(sys.argv) > 2:
+        cut = find_cut(folder, day_info, sys.argv[2])
+        print(f"✂️ Corte para {normalize_time(sys.argv[2])}: "
+              + (f"byte {cut:,}" if cut is not None else "el día completo"))
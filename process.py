@@ -1,13 +1,106 @@
 import os
 import time
+import contextlib
 import threading
 import schedule
 from datetime import datetime, timedelta
 import shutil
 import json
+import mmap
 import subprocess
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import catalog
+import chunkstore
+import compression
+import fastio
+import integrity
+import pitr
+import rolling
+import sqlscan
 from notification import TelegramNotifier  # ← IMPORT
+from parallel_dump import DUMP_DIR_NAME, PREVIOUS_SUFFIX, TABLE_MARKER, FOOTER_MARKER
+from restore import SERIAL_MARKERS
+
+class _PartWriter:
+    """Partes de un backup que se van abriendo y cerrando según llega el contenido"""
+
+    def __init__(self, target_folder, extension, open_part):
+        self.target_folder = target_folder
+        self.extension = extension
+        self.open_part = open_part
+        self.files = []
+        self.offsets = []       # inicio de cada parte en el backup sin comprimir (índice PITR)
+        self.digests = []
+        self.part = None
+        self.size = 0
+        self.offset = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cut()
+
+    def write(self, data):
+        # La parte se abre con el primer byte: nunca queda una parte vacía al final
+        if self.part is None:
+            part_path = os.path.join(self.target_folder,
+                                     f"backup_part_{len(self.files) + 1:03d}.sql{self.extension}")
+            self.part = self.open_part(part_path)
+            self.files.append(part_path)
+            self.offsets.append(self.offset)
+            self.digests.append(integrity.Digest())
+        self.part.write(data)
+        self.digests[-1].update(data)
+        self.size += len(data)
+        self.offset += len(data)
+
+    def cut(self):
+        if self.part is not None:
+            self.part.close()
+            self.part = None
+            self.size = 0
+
+class _TablePartWriter(_PartWriter):
+    """
+    _PartWriter para SPLIT_LAYOUT 'table': apunta las partes de cada tabla.
+
+    rolling.SectionSplitter avisa con section() de cada sección del volcado;
+    las de tabla se guardan con sus partes, su desplazamiento y bytes sin
+    comprimir y las filas aproximadas de sus INSERT.
+    """
+
+    def __init__(self, target_folder, extension, open_part):
+        super().__init__(target_folder, extension, open_part)
+        self.tables = []
+        self.table = None
+        self.rows = 0
+
+    def __exit__(self, *exc):
+        self._close_table()
+        super().__exit__(*exc)
+
+    def section(self, line):
+        self._close_table()
+        if line.startswith(TABLE_MARKER):
+            name = line[len(TABLE_MARKER):].rstrip(b'\r').rstrip(b'`').decode('utf-8')
+            self.table = {"name": name, "files": [], "offset": self.offset, "content_bytes": 0}
+
+    def write(self, data):
+        if self.table is not None and self.part is None:
+            self.table['files'].append(len(self.files))     # la parte que abre este write
+        super().write(data)
+        if self.table is not None:
+            self.table['content_bytes'] += len(data)
+
+    def _close_table(self):
+        if self.table is not None:
+            self.table['files'] = [os.path.basename(self.files[i]) for i in self.table['files']]
+            self.table['rows_estimate'] = self.rows
+            self.tables.append(self.table)
+            self.table = None
+        self.rows = 0
 
 class NightlyProcessor:
     def __init__(self, config):
@@ -21,28 +114,46 @@ class NightlyProcessor:
                 - MAX_FILE_SIZE_GB: Tamaño máximo por archivo dividido (default: 1)
                 - SPLIT_TIME: Hora de corte en formato "HH:MM" (default: "00:00")
                 - BACKUP_FILE_NAME: Nombre del archivo de backup (default: "backup.sql")
+                - COMPRESSION: Códec de los backups: None, 'gzip' o 'zstd' (default: None)
                 - STATE_FILE_NAME: Nombre del archivo de estado (default: "backup.state.json")
+                - DEDUP: Guardar los días en el repositorio deduplicado en vez de en partes (default: False)
+                - SPLIT_MODE: 'mmap' (backups sin comprimir mapeados y copiados en paralelo) o 'stream' (default: 'mmap')
+                - SPLIT_THREADS: Hilos para copiar y verificar partes en modo mmap (default: 4)
+                - ROLLING_PARTS: El backup ya se escribe en partes: solo se mueven (default: False)
+                - SPLIT_LAYOUT: 'size' (partes de MAX_FILE_SIZE_GB) o 'table' (cada tabla en sus
+                  propias partes, con índice de tablas en backup_info.json) (default: 'size')
+                - CATALOG_FILE: Catálogo SQLite de ejecuciones y días (default: BACKUP_DIR/catalog.db)
         """
         self.config = config
         self.is_running = False
         self.scheduler_thread = None
+        self.scheduler = schedule.Scheduler()  # ← propio: varios procesadores (uno por destino) no se pisan
+        
+        import main  # Importar aquí para evitar dependencias circulares
         
         # Configuración por defecto
         self.max_file_size_gb = config.get('MAX_FILE_SIZE_GB', 1)
         self.split_time = config.get('SPLIT_TIME', "00:00")
-        self.backup_file_name = config.get('BACKUP_FILE_NAME', 'backup.sql')
+        self.backup_file_name = compression.backup_file_name(config.get('BACKUP_FILE_NAME', 'backup.sql'), config)
+        self.part_extension = compression.extension(config)
         self.state_file_name = config.get('STATE_FILE_NAME', 'backup.state.json')
+        self.split_mode = config.get('SPLIT_MODE', 'mmap')
+        self.split_threads = config.get('SPLIT_THREADS', 4)
+        self.split_layout = config.get('SPLIT_LAYOUT', main.SPLIT_LAYOUT)
         
         # Directorios
         self.backup_dir = config['BACKUP_DIR']
         self.daily_backup_dir = config.get('DAILY_BACKUP_DIR', 
                                           os.path.join(config['BACKUP_DIR'], 'daily_backups'))
+        self.dedup = config.get('DEDUP', False)
+        self.chunk_store_dir = os.path.join(self.daily_backup_dir, chunkstore.STORE_DIR_NAME)
         
         # Crear directorios necesarios
         os.makedirs(self.daily_backup_dir, exist_ok=True)
         
         # Referencias para controlar el proceso principal
         self.main_process_controller = None
+        self.process_started = None     # ← inicio del proceso del día, para el catálogo
         
         print(f"🌙 Procesador nocturno configurado para las {self.split_time}")
         print(f"📦 Tamaño máximo por archivo: {self.max_file_size_gb} GB")
@@ -58,6 +169,7 @@ class NightlyProcessor:
                 - stop_automatic_backup(): Para detener el proceso automático
                 - start_automatic_backup(): Para reiniciar el proceso automático  
                 - is_backup_in_progress(): Para verificar si hay backup en curso
+                - backup_slot() (opcional): Turno de concurrencia para la división y el nuevo volcado
         """
         self.main_process_controller = controller
         print("🔗 Controlador principal vinculado al procesador nocturno")
@@ -75,8 +187,8 @@ class NightlyProcessor:
         notifier.notify_nightly_start(self.split_time, self.max_file_size_gb)  # ← NUEVA LÍNEA
 
         # Programar y arrancar scheduler
-        schedule.clear()
-        schedule.every().day.at(self.split_time).do(self._nightly_process)
+        self.scheduler.clear()
+        self.scheduler.every().day.at(self.split_time).do(self._nightly_process)
         self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.scheduler_thread.start()
 
@@ -85,7 +197,7 @@ class NightlyProcessor:
     def stop_nightly_processor(self):
         """Detener el procesador nocturno"""
         self.is_running = False
-        schedule.clear()
+        self.scheduler.clear()
         print("🛑 Procesador nocturno detenido")
     
     def force_nightly_process(self):
@@ -96,7 +208,7 @@ class NightlyProcessor:
     def _run_scheduler(self):
         """Ejecutar el programador en un hilo separado"""
         while self.is_running:
-            schedule.run_pending()
+            self.scheduler.run_pending()
             time.sleep(60)  # Verificar cada minuto
     
     def _nightly_process(self):
@@ -110,16 +222,20 @@ class NightlyProcessor:
             # 2. Detener el proceso automático de copias
             was_running = self._stop_main_process()
             
-            # 3. Procesar el archivo .sql de backup completo del día
-            success = self._process_daily_backup()
+            # 3-5. División, limpieza y nuevo volcado completo dentro del turno del
+            # controlador (límites de backups simultáneos por servidor y en total)
+            with self._backup_slot():
+                # 3. Procesar el archivo .sql de backup completo del día
+                success = self._process_daily_backup()
+                
+                if success:
+                    # 4. Vaciar la carpeta temporal
+                    self._clean_temp_directory()
+                    
+                    # 5. Generar nuevo volcado completo y reiniciar proceso
+                    self._initialize_new_cycle(was_running)
             
             if success:
-                # 4. Vaciar la carpeta temporal
-                self._clean_temp_directory()
-                
-                # 5. Generar nuevo volcado completo y reiniciar proceso
-                self._initialize_new_cycle(was_running)
-                
                 print("🎉 === PROCESO NOCTURNO COMPLETADO EXITOSAMENTE ===")
             else:
                 print("⚠️ === PROCESO NOCTURNO COMPLETADO CON ERRORES ===")
@@ -136,6 +252,12 @@ class NightlyProcessor:
             except:
                 pass
     
+    def _backup_slot(self):
+        """Turno de concurrencia del controlador, si lo ofrece (servicio con varios destinos)"""
+        if hasattr(self.main_process_controller, 'backup_slot'):
+            return self.main_process_controller.backup_slot()
+        return contextlib.nullcontext()
+    
     def _wait_for_backup_completion(self):
         """Esperar a que termine cualquier backup en progreso"""
         if not self.main_process_controller:
@@ -197,8 +319,9 @@ class NightlyProcessor:
     def _process_daily_backup(self):
         """Procesar el archivo de backup del día actual"""
         backup_file = os.path.join(self.backup_dir, self.backup_file_name)
+        rolling.recover(backup_file)
         
-        if not os.path.exists(backup_file):
+        if not rolling.exists(backup_file):
             print(f"❌ No se encontró archivo de backup: {backup_file}")
             return False
         
@@ -207,6 +330,7 @@ class NightlyProcessor:
         folder_name = yesterday.strftime("%Y-%m-%d_%H-%M")
         daily_folder = os.path.join(self.daily_backup_dir, folder_name)
         
+        self.process_started = datetime.now()
         print(f"📦 Procesando backup del día: {yesterday.strftime('%Y-%m-%d')}")
         print(f"📁 Carpeta destino: {daily_folder}")
         
@@ -217,16 +341,21 @@ class NightlyProcessor:
             print(f"❌ Error al crear carpeta diaria: {e}")
             return False
         
-        # Dividir el archivo
-        split_files = self._split_backup_file(backup_file, daily_folder)
+        if self.dedup:
+            return self._store_deduplicated(backup_file, daily_folder, yesterday)
+        
+        if self.split_layout != 'table' and (rolling.enabled(self.config) or rolling.load(backup_file)):
+            return self._move_rolling_parts(backup_file, daily_folder, yesterday)
+        
+        # Dividir el archivo (calculando las huellas en la misma lectura)
+        split_files, part_offsets, digests = self._split_backup_file(backup_file, daily_folder)
         
         if split_files:
-            # Verificar que la división fue exitosa
-            if self._verify_split_files(backup_file, split_files):
+            # El manifiesto con las huellas se escribe antes de verificar: es contra él que se comprueba
+            self._create_info_file(daily_folder, split_files, yesterday, part_offsets=part_offsets,
+                                   digests=digests)
+            if self._verify_split_files(daily_folder, digests):
                 print(f"✅ Backup dividido exitosamente en {len(split_files)} archivos")
-                
-                # Crear archivo de información
-                self._create_info_file(daily_folder, split_files, yesterday)
                 return True
             else:
                 print("❌ Error en la verificación de archivos divididos")
@@ -235,92 +364,259 @@ class NightlyProcessor:
             print("❌ Error al dividir el archivo de backup")
             return False
     
+    def _store_deduplicated(self, backup_file, daily_folder, backup_date):
+        """Guardar el backup del día en el repositorio de chunks en lugar de dividirlo"""
+        stream = integrity.StreamCheck(integrity.load(self._digest_file()))
+        try:
+            stats = chunkstore.store_backup(backup_file, self.chunk_store_dir, daily_folder, self.config, stream)
+        except Exception as e:
+            print(f"❌ Error al guardar en el repositorio deduplicado: {e}")
+            return False
+        
+        if not self._check_stream(stream):
+            return False
+        if not chunkstore.verify_day(self.chunk_store_dir, daily_folder):
+            print("❌ Error en la verificación del manifiesto de chunks")
+            return False
+        
+        print(f"✅ Backup guardado en {stats['chunks']} chunks ({stats['new_chunks']} nuevos, "
+              f"{stats['new_bytes'] / 1024**2:.1f} MB añadidos al repositorio)")
+        self._create_info_file(daily_folder, [], backup_date, dedup=stats, digests={'stream': stream})
+        
+        # Liberar los chunks que ya no usa ningún día (carpetas borradas a mano, etc.)
+        try:
+            removed, freed = chunkstore.collect_garbage(self.chunk_store_dir, self.daily_backup_dir)
+            if removed:
+                print(f"🧹 {removed} chunks sin uso eliminados ({freed / 1024**2:.1f} MB)")
+        except Exception as e:
+            print(f"⚠️ Error al limpiar el repositorio de chunks: {e}")
+        return True
+    
+    def _move_rolling_parts(self, backup_file, daily_folder, backup_date):
+        """
+        Llevar a la carpeta del día las partes escritas con ROLLING_PARTS.
+
+        Las partes se cerraron mientras se escribía el backup, así que no hay
+        nada que leer ni reescribir: se mueven (la parte en curso como última) y
+        sus huellas son los tramos del registro, que se cortaron en los mismos
+        puntos. La verificación las comprueba tramo a tramo.
+        """
+        head_content = pitr.logical_end(self._pitr_index_file(), backup_file) - rolling.sealed_content(backup_file)
+        try:
+            parts = rolling.move_parts(backup_file, daily_folder, head_content)
+        except Exception as e:
+            print(f"❌ Error al mover las partes del día: {e}")
+            return False
+        
+        records = integrity.load(self._digest_file())
+        files, i = [], 0
+        for part in parts:
+            segments = []
+            while i < len(records) and records[i]['disk_end'] <= part['disk_end']:
+                segments.append({"length": records[i]['length'], integrity.ALGORITHM: records[i][integrity.ALGORITHM]})
+                i += 1
+            entry = {"content_bytes": part['content_bytes']}
+            if segments and sum(segment['length'] for segment in segments) == part['content_bytes']:
+                entry["segments"] = segments
+            files.append(entry)
+        total = sum(part['content_bytes'] for part in parts)
+        summary = {"algorithm": integrity.ALGORITHM, "size": total, "segments": len(records)} if records else None
+        digests = {'files': files, 'summary': summary}
+        
+        split_files = [part['path'] for part in parts]
+        print(f"📦 {len(split_files)} partes movidas a la carpeta del día ({total / 1024**2:.1f} MB sin comprimir)")
+        self._create_info_file(daily_folder, split_files, backup_date,
+                               part_offsets=[part['offset'] for part in parts], digests=digests)
+        if self._verify_split_files(daily_folder, digests):
+            print(f"✅ Backup del día guardado en {len(split_files)} archivos")
+            return True
+        print("❌ Error en la verificación de las partes del día")
+        return False
+    
     def _split_backup_file(self, source_file, target_folder):
-        """Dividir el archivo de backup en partes más pequeñas"""
+        """
+        Dividir el archivo de backup en partes más pequeñas.
+
+        El backup se lee por bloques en un buffer fijo y cada bloque pasa a la
+        parte en curso en cuanto se lee, contando bytes sin decodificar: la
+        memoria no depende del tamaño de las partes. Solo se corta en un fin
+        de sentencia (sqlscan: fuera de cadenas y comentarios, con el DELIMITER
+        vigente) una vez alcanzado el tamaño máximo, así que del bloque solo se
+        guarda la última línea incompleta (el buffer crece solo si una línea
+        entera no cabe en él).
+
+        En la misma lectura se calcula la huella BLAKE2b de cada parte y la del
+        stream completo, y se comprueban los tramos del registro de huellas
+        escrito junto al backup: el original no se vuelve a leer para verificar.
+
+        Con SPLIT_LAYOUT 'table' (siempre por streaming) además se corta antes
+        de cada tabla, vista, rutina y del pie del volcado, y se devuelve el
+        índice de tablas en 'tables'. Las partes ya cerradas con ROLLING_PARTS
+        se leen como parte del mismo stream.
+
+        Returns:
+            tuple: (partes, desplazamiento de cada parte, {'parts': huellas, 'stream': StreamCheck})
+        """
         try:
-            max_size_bytes = int(self.max_file_size_gb * 1024**3)
-            split_files = []
-            part_num = 1
-            current_size = 0
-            buffer_lines = []
-
-            with open(source_file, 'r', encoding='utf-8') as src:
-                for line in src:
-                    buffer_lines.append(line)
-                    current_size += len(line.encode('utf-8'))
-
-                    # Si superamos el umbral Y la línea acaba en ‘;’ -> cerrar parte
-                    if current_size >= max_size_bytes and line.strip().endswith(';'):
-                        part_path = os.path.join(
-                            target_folder,
-                            f"backup_part_{part_num:03d}.sql"
-                        )
-                        with open(part_path, 'w', encoding='utf-8') as part:
-                            part.writelines(buffer_lines)
-                        split_files.append(part_path)
-
-                        part_num += 1
-                        buffer_lines = []
-                        current_size = 0
-
-            # Volcar resto si queda contenido
-            if buffer_lines:
-                part_path = os.path.join(
-                    target_folder,
-                    f"backup_part_{part_num:03d}.sql"
-                )
-                with open(part_path, 'w', encoding='utf-8') as part:
-                    part.writelines(buffer_lines)
-                split_files.append(part_path)
-
-            return split_files
+            by_table = self.split_layout == 'table'
+            if (self.split_mode == 'mmap' and not by_table and not self.part_extension
+                    and compression.detect_codec(source_file) is None and os.path.getsize(source_file)):
+                return self._split_mapped(source_file, target_folder)
+
+            stream = integrity.StreamCheck(integrity.load(self._digest_file()))
+            max_size = int(self.max_file_size_gb * 1024**3)
+
+            with rolling.open_reader(source_file) as src, \
+                    (_TablePartWriter if by_table else _PartWriter)(target_folder, self.part_extension,
+                                                                    self._open_part) as parts:
+                if by_table:
+                    splitter = rolling.SectionSplitter(parts, max_size,
+                                                       (TABLE_MARKER, FOOTER_MARKER) + SERIAL_MARKERS)
+                else:
+                    splitter = rolling.StatementSplitter(parts, max_size)
+
+                def write(data):
+                    stream.update(data)
+                    splitter.write(data)
+
+                fastio.copy_stream(src, write)
+                splitter.close()
+
+            digests = {'parts': parts.digests, 'stream': stream}
+            if by_table:
+                digests['tables'] = parts.tables
+                print(f"🗂️ Backup dividido por tablas: {len(parts.tables)} tablas en {len(parts.files)} partes")
+            return parts.files, parts.offsets, digests
 
         except Exception as e:
             print(f"❌ Error al dividir archivo: {e}")
-            return []
+            return [], [], None
     
-    def _verify_split_files(self, original_file, split_files):
-        """Verificar que los archivos divididos son válidos"""
+    def _split_mapped(self, source_file, target_folder):
+        """
+        Dividir un backup sin comprimir mapeándolo en memoria.
+
+        Los cortes se buscan en el mmap a partir de cada tamaño máximo, con la
+        misma regla que el divisor por streaming (las partes salen idénticas), y
+        luego cada parte se copia dentro del kernel con copy_file_range/sendfile,
+        varias a la vez. Las huellas se calculan sobre el mmap en los mismos
+        hilos: hashlib suelta el GIL y los datos no pasan por el heap de Python.
+        """
+        max_size = int(self.max_file_size_gb * 1024**3)
+        stream = integrity.StreamCheck(integrity.load(self._digest_file()))
+
+        with open(source_file, 'rb') as src, \
+                mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            size = len(mapped)
+            bounds = [0]
+            scanner = sqlscan.Scanner()
+            while bounds[-1] < size:
+                cut = scanner.boundary(mapped, bounds[-1], size, bounds[-1] + max(max_size - 1, 0))
+                bounds.append(cut if cut > 0 else size)
+            if hasattr(mapped, 'madvise'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+            split_files = [os.path.join(target_folder, f"backup_part_{i:03d}.sql")
+                           for i in range(1, len(bounds))]
+            with memoryview(mapped) as view:
+                with ThreadPoolExecutor(max_workers=max(1, self.split_threads)) as pool:
+                    stream.submit_mapped(view, pool)
+                    copies = [pool.submit(self._copy_part, src.fileno(), view, part_path, start, end)
+                              for part_path, start, end in zip(split_files, bounds, bounds[1:])]
+                    part_digests = [copy.result() for copy in copies]
+                    stream.collect()
+
+        print(f"⚡ Backup dividido con mmap en {len(split_files)} partes ({self.split_threads} hilos)")
+        return split_files, bounds[:-1], {'parts': part_digests, 'stream': stream}
+
+    def _copy_part(self, src_fd, view, part_path, start, end):
+        """Copiar source[start:end] a una parte y devolver su huella"""
+        with open(part_path, 'wb') as part:
+            if hasattr(os, 'pread'):
+                copied = fastio.copy_range(src_fd, part.fileno(), start, end - start)
+            else:
+                # Windows: sin pread ni copia en el kernel, se escribe desde el mmap
+                with view[start:end] as data:
+                    copied = part.write(data)
+        if copied != end - start:
+            raise IOError(f"{os.path.basename(part_path)}: copiados {copied:,} de {end - start:,} bytes")
+        return integrity.hash_view(view, start, end)
+
+    def _open_part(self, part_path):
+        """Abrir una parte en modo binario, comprimida con el mismo códec que el backup"""
+        return compression.open_writer(part_path, self.config)
+    
+    def _check_stream(self, stream):
+        """Resultado de comprobar el backup original contra su registro de huellas"""
+        errors = stream.finish()
+        for error in errors:
+            print(f"❌ ERROR: El backup original no coincide con lo escrito: {error}")
+        if not errors and stream.records:
+            print(f"🔐 Backup original íntegro ({stream.index} tramos, BLAKE2b {stream.stream.hexdigest()[:16]}…)")
+        elif not errors:
+            print("ℹ️ El backup no tiene registro de huellas: no se puede comprobar el original")
+        return not errors
+    
+    def _verify_split_files(self, daily_folder, digests):
+        """
+        Verificar las partes contra las huellas de backup_info.json.
+
+        El original ya se comprobó al dividirlo; aquí se vuelven a leer solo las
+        partes, en paralelo, y cada una tiene que dar la huella y el tamaño sin
+        comprimir que se calcularon al escribirla.
+        """
         try:
-            original_size = os.path.getsize(original_file)
-            total_split_size = sum(os.path.getsize(f) for f in split_files if os.path.exists(f))
-            
             print(f"🔍 Verificando integridad...")
-            print(f"📏 Tamaño original: {original_size:,} bytes")
-            print(f"📏 Suma de partes: {total_split_size:,} bytes")
-            
-            if original_size != total_split_size:
-                print(f"❌ ERROR: Los tamaños no coinciden")
+            if 'stream' in digests and not self._check_stream(digests['stream']):
                 return False
             
-            # Verificar que todos los archivos existen
-            for split_file in split_files:
-                if not os.path.exists(split_file):
-                    print(f"❌ ERROR: Archivo no existe: {os.path.basename(split_file)}")
-                    return False
+            started = time.time()
+            errors = integrity.verify_day(daily_folder, self.config.get('VERIFY_THREADS', integrity.VERIFY_THREADS))
+            if errors is None and 'summary' in digests and digests['summary'] is None:
+                print("⚠️ Partes escritas sin huellas (BACKUP_DIGESTS desactivado): no se verifica su contenido")
+                return True
+            if errors is None:
+                print("❌ ERROR: backup_info.json no tiene las huellas de las partes")
+                return False
+            for error in errors:
+                print(f"❌ ERROR: {error}")
+            if errors:
+                return False
             
-            print("✅ Verificación de integridad exitosa")
+            size = digests['stream'].stream.size if 'stream' in digests else digests['summary']['size']
+            count = len(digests['parts'] if 'parts' in digests else digests['files'])
+            print(f"✅ Verificación de integridad exitosa ({count} partes, "
+                  f"{size / 1024**2:.1f} MB en {time.time() - started:.1f}s)")
             return True
             
         except Exception as e:
             print(f"❌ Error en verificación: {e}")
             return False
     
-    def _create_info_file(self, folder_path, split_files, backup_date):
+    def _create_info_file(self, folder_path, split_files, backup_date, dedup=None, part_offsets=None, digests=None):
         """Crear archivo de información sobre el backup"""
         try:
+            offsets = part_offsets or [None] * len(split_files)
+            if digests and 'parts' in digests:
+                extras = [{"content_bytes": digest.size, integrity.ALGORITHM: digest.hexdigest()}
+                          for digest in digests['parts']]
+            else:
+                extras = (digests or {}).get('files') or [{}] * len(split_files)
             info = {
                 "backup_date": backup_date.strftime("%Y-%m-%d"),
                 "creation_time": datetime.now().isoformat(),
                 "total_files": len(split_files),
                 "max_file_size_gb": self.max_file_size_gb,
+                "compression": compression.resolve_codec(self.config),
                 "files": [
                     {
                         "filename": os.path.basename(f),
                         "size_bytes": os.path.getsize(f),
-                        "size_mb": round(os.path.getsize(f) / (1024**2), 2)
+                        "size_mb": round(os.path.getsize(f) / (1024**2), 2),
+                        "offset": offset,
+                        **extra
                     }
-                    for f in split_files if os.path.exists(f)
+                    for f, offset, extra in zip(split_files, offsets, extras) if os.path.exists(f)
                 ],
                 "total_size_gb": round(sum(os.path.getsize(f) for f in split_files if os.path.exists(f)) / (1024**3), 2),
                 "backup_config": {
@@ -329,6 +625,24 @@ class NightlyProcessor:
                     "split_time": self.split_time
                 }
             }
+            if digests and 'stream' in digests:
+                info["digest"] = digests['stream'].summary()
+            elif digests and digests.get('summary'):
+                info["digest"] = digests['summary']
+            if digests and 'tables' in digests:
+                # SPLIT_LAYOUT 'table': partes de cada tabla para restaurarla sin leer el resto
+                info["layout"] = "table"
+                info["tables"] = digests['tables']
+            if dedup:
+                # El contenido está en el repositorio de chunks, ver backup_manifest.json
+                info["storage"] = "dedup"
+                info["chunk_store"] = self.chunk_store_dir
+                info["dedup"] = dedup
+            
+            # Índice PITR del día: hora/posición de binlog → desplazamiento en el backup
+            pitr_range = pitr.export_daily(self._pitr_index_file(), folder_path)
+            if pitr_range:
+                info["pitr"] = pitr_range
             
             info_file = os.path.join(folder_path, "backup_info.json")
             with open(info_file, 'w', encoding='utf-8') as f:
@@ -336,14 +650,26 @@ class NightlyProcessor:
             
             print(f"📋 Archivo de información creado: backup_info.json")
             
+            # Mismos datos en el catálogo, con las ejecuciones del ciclo que acaba
+            duration = (datetime.now() - self.process_started).total_seconds() if self.process_started else None
+            catalog.record_day(self.config, folder_path, info, duration)
+            
         except Exception as e:
             print(f"⚠️ Error al crear archivo de información: {e}")
     
+    def _pitr_index_file(self):
+        return pitr.index_path(os.path.join(self.backup_dir, self.state_file_name))
+    
+    def _digest_file(self):
+        return integrity.digests_path(os.path.join(self.backup_dir, self.state_file_name))
+    
     def _clean_temp_directory(self):
         """Limpiar el directorio temporal de backups"""
         try:
             backup_file = os.path.join(self.backup_dir, self.backup_file_name)
             state_file = os.path.join(self.backup_dir, self.state_file_name)
+            index_file = self._pitr_index_file()
+            digest_file = self._digest_file()
             
             files_removed = 0
             
@@ -357,6 +683,34 @@ class NightlyProcessor:
                 files_removed += 1
                 print(f"🗑️ Eliminado: {self.state_file_name}")
             
+            if os.path.exists(index_file):
+                os.remove(index_file)
+                files_removed += 1
+                print(f"🗑️ Eliminado: {os.path.basename(index_file)}")
+            
+            if os.path.exists(digest_file):
+                os.remove(digest_file)
+                files_removed += 1
+                print(f"🗑️ Eliminado: {os.path.basename(digest_file)}")
+            
+            if os.path.isdir(rolling.parts_dir(backup_file)):
+                rolling.reset(backup_file)
+                files_removed += 1
+                print(f"🗑️ Eliminado: {rolling.PARTS_DIR_NAME}/")
+            
+            dump_dir = os.path.join(self.backup_dir, DUMP_DIR_NAME)
+            if os.path.isdir(dump_dir) and self.config.get('SKIP_UNCHANGED', False):
+                # Se conserva para que el nuevo volcado reutilice las tablas sin cambios
+                prev_dir = dump_dir + PREVIOUS_SUFFIX
+                if os.path.isdir(prev_dir):
+                    shutil.rmtree(prev_dir)
+                os.replace(dump_dir, prev_dir)
+                print(f"♻️ {DUMP_DIR_NAME}/ conservado como {DUMP_DIR_NAME}{PREVIOUS_SUFFIX}/")
+            elif os.path.isdir(dump_dir):
+                shutil.rmtree(dump_dir)
+                files_removed += 1
+                print(f"🗑️ Eliminado: {DUMP_DIR_NAME}/")
+            
             if files_removed > 0:
                 print(f"🧹 Directorio temporal limpiado ({files_removed} archivos)")
             else:
@@ -376,22 +730,25 @@ class NightlyProcessor:
             
             print("🔄 Generando nuevo backup completo para iniciar ciclo...")
             
-            # Crear configuración para main.py
-            main_config = {
+            # Crear configuración para main.py (se conservan las opciones extra: hilos, compresión…)
+            main_config = dict(self.config)
+            main_config.update({
                 'HOST': self.config.get('HOST', 'localhost'),
                 'PORT': self.config.get('PORT', 3306),
                 'USER': self.config.get('USER', 'root'),
                 'PASSWORD': self.config.get('PASSWORD', ''),
                 'DB_NAME': self.config.get('DB_NAME', ''),
                 'BACKUP_DIR': self.backup_dir
-            }
+            })
             
             # Ejecutar backup completo
-            main.full_backup(backup_file, main_config)
-            
-            # Obtener y guardar estado inicial
-            file_, pos = main.get_master_status(main_config)
-            main.save_state(state_file, file_, pos)
+            with catalog.Run(main_config, 'full') as run:
+                coords = main.full_backup(backup_file, main_config)
+                
+                # Obtener y guardar estado inicial (el volcado paralelo ya trae la posición del snapshot)
+                file_, pos = coords or main.get_master_status(main_config)
+                main.save_state(state_file, file_, pos)
+                run.end = (file_, pos)
             
             print(f"✅ Nuevo ciclo inicializado. Estado: {file_}@{pos}")
             
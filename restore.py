@@ -0,0 +1,684 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import queue
+import shutil
+import tempfile
+import threading
+import subprocess
+from datetime import timedelta
+import chunkstore
+import compression
+import dbclient
+import fastio
+import pitr
+from parallel_dump import TABLE_MARKER, FOOTER_MARKER
+
+# —————— CONFIGURACIÓN DE LA RESTAURACIÓN ——————
+RESTORE_THREADS   = 4                       # ← conexiones cargando tablas a la vez
+DEFER_INDEXES     = True                    # ← crear los índices secundarios después de cargar los datos
+PROGRESS_INTERVAL = 10                      # ← segundos entre informes de progreso
+INFO_FILE_NAME    = 'backup_info.json'
+
+# Secciones del volcado que no son una tabla: se aplican en orden, después de todas las tablas
+SERIAL_MARKERS = (
+    b'-- Temporary view structure for view `',
+    b'-- Final view structure for view `',
+    b'-- Dumping routines for database',
+    b'-- Dumping events for database',
+)
+# Primeras sentencias de la salida de mysqlbinlog: a partir de aquí empieza el tramo incremental
+TAIL_MARKERS = (b'/*!50530 SET @@SESSION.PSEUDO_SLAVE_MODE=1*/;', b'DELIMITER /*!*/;')
+HEADER_DB   = re.compile(rb'^-- Host: .*Database: (\S+)')
+
+SESSION_TUNING = b"SET SESSION unique_checks = 0;\nSET SESSION foreign_key_checks = 0;\n"
+# ——————————————————————————
+
+_BACKTICKED = re.compile(rb'`((?:[^`]|``)+)`')
+_FOREIGN_KEY = re.compile(rb'FOREIGN KEY \(([^)]*)\)')
+_INDEX = re.compile(rb'\s*(?:UNIQUE )?KEY `(?:[^`]|``)+` \(((?:`(?:[^`]|``)+`(?:\(\d+\))?(?: (?:ASC|DESC))?,?)+)\)')
+
+
+class _Segment:
+    """Tramo del backup que se aplica de una vez: una tabla, un objeto final o el binlog"""
+
+    def __init__(self, kind, name, spill_dir=None):
+        self.kind = kind
+        self.name = name
+        self.size = 0
+        self.pieces = []        # (ruta, desplazamiento, longitud)
+        self._spill = None
+        self.temporary = bool(spill_dir)
+        if spill_dir:
+            # Origen comprimido: el tramo se descomprime a un temporal para leerlo en paralelo
+            fd, path = tempfile.mkstemp(prefix=f'{kind}_', suffix='.sql', dir=spill_dir)
+            self._spill = os.fdopen(fd, 'wb', buffering=fastio.BUFFER_SIZE)
+            self.pieces.append((path, 0, 0))
+
+    def add(self, line, path, offset):
+        """Añadir una línea; sin compresión basta con recordar dónde está en la parte"""
+        n = len(line)
+        if self._spill:
+            self._spill.write(line)
+        else:
+            last = self.pieces[-1] if self.pieces else None
+            if last and last[0] == path and last[1] + last[2] == offset:
+                self.pieces[-1] = (path, last[1], last[2] + n)
+            else:
+                self.pieces.append((path, offset, n))
+        self.size += n
+
+    def close(self):
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+            self.pieces[0] = (self.pieces[0][0], 0, self.size)
+
+    def open(self):
+        return io.BufferedReader(_SegmentReader(self.pieces), buffer_size=fastio.BUFFER_SIZE)
+
+    def discard(self):
+        """Borrar el temporal del tramo, si lo tiene, una vez aplicado"""
+        if self.temporary:
+            try:
+                os.remove(self.pieces[0][0])
+            except OSError:
+                pass
+
+
+class _SegmentReader(io.RawIOBase):
+    """
+    Lectura secuencial de los trozos (ruta, desplazamiento, longitud) de un tramo.
+
+    Con longitud None el trozo es una parte comprimida entera (índice de
+    tablas): se descomprime mientras se lee.
+    """
+
+    def __init__(self, pieces):
+        self.pending = list(pieces)
+        self.current = None
+        self.remaining = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                if not self.pending:
+                    return 0
+                path, offset, length = self.pending.pop(0)
+                if length is None:
+                    self.current = compression.open_reader(path)
+                else:
+                    self.current = open(path, 'rb')
+                    self.current.seek(offset)
+                self.remaining = length
+            if self.remaining is None:
+                n = self.current.readinto(buffer)
+                if n:
+                    return n
+            elif self.remaining:
+                view = memoryview(buffer)[:min(len(buffer), self.remaining)]
+                n = self.current.readinto(view)
+                if not n:
+                    raise IOError("Parte del backup truncada durante la restauración")
+                self.remaining -= n
+                return n
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current:
+            self.current.close()
+            self.current = None
+        super().close()
+
+
+def _defer_indexes(create_lines):
+    """
+    Quitar del CREATE TABLE los índices secundarios para crearlos tras cargar los datos.
+
+    Se mantienen la clave primaria, los FULLTEXT/SPATIAL (añadirlos después
+    reconstruye la tabla), el índice que necesita la columna AUTO_INCREMENT y
+    los que respaldan una clave foránea. Devuelve las líneas del CREATE TABLE y
+    las definiciones apartadas, para un único ALTER TABLE ... ADD al final.
+    """
+    definitions = [line.rstrip(b'\r\n') for line in create_lines[1:-1]]
+    definitions = [d[:-1] if d.endswith(b',') else d for d in definitions]
+
+    auto_increment = None
+    foreign_keys = []
+    for d in definitions:
+        if d.lstrip().startswith(b'`') and b' AUTO_INCREMENT' in d:
+            auto_increment = _BACKTICKED.match(d.lstrip()).group(1)
+        match = _FOREIGN_KEY.search(d)
+        if match:
+            foreign_keys.append(_BACKTICKED.findall(match.group(1)))
+
+    kept, deferred = [], []
+    for d in definitions:
+        match = _INDEX.match(d)
+        if match:
+            columns = _BACKTICKED.findall(match.group(1))
+            needed = columns[0] == auto_increment or any(columns[:len(fk)] == fk for fk in foreign_keys)
+            if not needed:
+                deferred.append(d.strip())
+                continue
+        kept.append(d)
+
+    if not deferred:
+        return create_lines, []
+    return [create_lines[0], b',\n'.join(kept) + b'\n', create_lines[-1]], deferred
+
+
+class _Progress:
+    """Bytes aplicados, velocidad y tiempo restante de la restauración"""
+
+    def __init__(self, total, exact):
+        self.total = total
+        self.exact = exact          # False: total estimado con la tasa de compresión
+        self.read_bytes = 0
+        self.disk_done = 0
+        self.disk_total = total
+        self.applied = 0
+        self.phase = "tablas"
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def add(self, n):
+        with self.lock:
+            self.applied += n
+
+    def source_done(self, disk_bytes, read_bytes):
+        """Ajustar el total estimado al terminar de leer una parte comprimida"""
+        self.disk_done += disk_bytes
+        self.read_bytes += read_bytes
+        if not self.exact and self.disk_done:
+            self.total = int(self.disk_total * self.read_bytes / self.disk_done)
+
+    def report(self, phase):
+        elapsed = max(time.time() - self.started, 0.001)
+        rate = self.applied / elapsed
+        if rate and (self.exact or self.disk_done):
+            eta = str(timedelta(seconds=int(max(self.total - self.applied, 0) / rate)))
+        else:
+            eta = "?"
+        percent = f" ({min(self.applied / self.total, 1) * 100:.0f}%)" if self.total else ""
+        approx = "" if self.exact else "~"
+        print(f"⏳ {phase}: {self.applied / 1024**3:.2f} de {approx}{self.total / 1024**3:.2f} GB"
+              f"{percent} · {rate / 1024**2:.1f} MB/s · ETA {eta}")
+
+
+def _open_client(config):
+    """Proceso mysql conectado a la base de datos destino que ejecuta lo que recibe por stdin"""
+    import main  # Importar aquí para evitar dependencias circulares
+
+    cmd = [main.tool_path('mysql'), *main.connection_args(config), config['DB_NAME']]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, bufsize=fastio.BUFFER_SIZE)
+
+
+def _finish_client(proc):
+    """Cerrar stdin y esperar al proceso mysql; error si alguna sentencia falló"""
+    try:
+        proc.stdin.close()
+    except OSError:
+        pass
+    stderr = proc.stderr.read()
+    proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(stderr.decode('utf-8', 'replace').strip()
+                           or f"mysql terminó con código {proc.returncode}")
+
+
+def _quote(name):
+    return b'`' + name.encode('utf-8').replace(b'`', b'``') + b'`'
+
+
+def _write_table(segment, write, defer):
+    """Enviar una tabla al cliente, con los índices secundarios al final si defer"""
+    deferred = []
+    with segment.open() as src:
+        if defer:
+            # Solo se recorre línea a línea la cabecera hasta el CREATE TABLE; los datos van por bloques
+            for line in iter(src.readline, b''):
+                if line.startswith(b'CREATE TABLE'):
+                    create = [line]
+                    for line in iter(src.readline, b''):
+                        create.append(line)
+                        if line.startswith(b')'):
+                            break
+                    create, deferred = _defer_indexes(create)
+                    write(b''.join(create))
+                    break
+                write(line)
+                if line.startswith((b'LOCK TABLES', b'INSERT')):
+                    break
+        fastio.copy_stream(src, write)
+    if deferred:
+        write(b"ALTER TABLE " + _quote(segment.name) + b" " +
+              b", ".join(b"ADD " + d for d in deferred) + b";\n")
+
+
+class _RestoreWorker:
+    """Hilo con una conexión que va cargando las tablas que saca de la cola"""
+
+    def __init__(self, worker_id, jobs, preamble, config, progress, abort):
+        self.worker_id = worker_id
+        self.jobs = jobs
+        self.preamble = preamble
+        self.config = config
+        self.progress = progress
+        self.abort = abort
+        self.defer = config.get('RESTORE_DEFER_INDEXES', DEFER_INDEXES)
+        self.error = None
+        self.tables = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def join(self):
+        self.thread.join()
+
+    def _write(self, data):
+        self.proc.stdin.write(data)
+        self.progress.add(len(data))
+
+    def _run(self):
+        self.proc = _open_client(self.config)
+        try:
+            self.proc.stdin.write(self.preamble() + SESSION_TUNING)
+            while True:
+                try:
+                    segment = self.jobs.get(timeout=0.5)
+                except queue.Empty:
+                    if self.abort.is_set():
+                        break
+                    continue
+                if segment is None:
+                    break
+                if self.abort.is_set():
+                    segment.discard()
+                    break
+                try:
+                    _write_table(segment, self._write, self.defer)
+                finally:
+                    segment.discard()
+                self.tables += 1
+        except Exception as e:
+            self.error = e
+            self.abort.set()
+        try:
+            _finish_client(self.proc)
+        except Exception as e:
+            self.error = e          # el error de mysql explica mejor un BrokenPipe
+            self.abort.set()
+
+
+class _BackupReader:
+    """
+    Recorrer el backup del día y repartirlo en tramos.
+
+    Cabecera de mysqldump (se repite en cada conexión), tablas (en paralelo),
+    objetos finales como vistas y rutinas (en orden, después de las tablas) y el
+    tramo incremental de mysqlbinlog (en orden, al final). Los pies y cabeceras
+    repetidos del volcado paralelo se descartan: solo restauran variables de sesión.
+    """
+
+    def __init__(self, sources, spill_dir, progress):
+        self.sources = sources
+        self.spill_dir = spill_dir
+        self.progress = progress
+        self.header = []
+        self.source_db = None
+        self.header_done = threading.Event()
+        self.serial = []
+        self.tail = None
+        self.tables = 0
+
+    def preamble(self):
+        """Sentencias de sesión de la cabecera del volcado (espera a haberla leído)"""
+        self.header_done.wait()
+        return b''.join(self.header)
+
+    def _lines(self):
+        """Líneas de todas las partes en orden, como (ruta, desplazamiento en la parte, línea)"""
+        for path, opener, disk_size in self.sources:
+            offset = 0
+            with opener() as src:
+                for line in src:
+                    yield path, offset, line
+                    offset += len(line)
+            self.progress.source_done(disk_size, offset)
+
+    def run(self, dispatch, limit=None, until=None):
+        """
+        Leer el día y repartir sus tramos.
+
+        limit corta la lectura en ese desplazamiento sin comprimir (punto de
+        corte del índice PITR). Sin índice, until corta el tramo de binlog en la
+        primera transacción posterior, revisando sus cabeceras línea a línea.
+        """
+        state = 'header'
+        current = None
+        position = 0
+        cutter = pitr.Indexer(None) if until else None
+        held = None
+
+        def close(segment):
+            if segment is None:
+                return
+            segment.close()
+            if segment.kind == 'table':
+                self.tables += 1
+                dispatch(segment)
+            elif segment.kind == 'serial':
+                self.serial.append(segment)
+            else:
+                self.tail = segment
+
+        lines = self._lines()
+        try:
+            for path, offset, line in lines:
+                if limit is not None and position >= limit:
+                    break
+                n = len(line)
+                if state == 'tail' and cutter:
+                    # El "# at" se retiene hasta ver la cabecera que dice si es el corte
+                    found = cutter.line(line, position)
+                    if found and found[1] > until:
+                        held = None
+                        break
+                    if held:
+                        current.add(*held)
+                        held = None
+                    if line.startswith(pitr.AT_PREFIX):
+                        held = (line, path, offset)
+                    else:
+                        current.add(line, path, offset)
+                elif state == 'tail':
+                    current.add(line, path, offset)
+                elif line.startswith(TAIL_MARKERS):
+                    close(current)
+                    self.header_done.set()
+                    current = _Segment('tail', None, self.spill_dir)
+                    current.add(line, path, offset)
+                    state = 'tail'
+                elif line.startswith(TABLE_MARKER) or line.startswith(SERIAL_MARKERS):
+                    close(current)
+                    self.header_done.set()
+                    if line.startswith(TABLE_MARKER):
+                        name = line[len(TABLE_MARKER):].rstrip(b'\r\n').rstrip(b'`').decode('utf-8')
+                        current = _Segment('table', name, self.spill_dir)
+                    else:
+                        current = _Segment('serial', None, self.spill_dir)
+                    current.add(line, path, offset)
+                    state = 'segment'
+                elif line.startswith(FOOTER_MARKER):
+                    close(current)
+                    current = None
+                    state = 'between'
+                elif state == 'segment':
+                    current.add(line, path, offset)
+                else:
+                    if state == 'header':
+                        self.header.append(line)
+                        match = HEADER_DB.match(line)
+                        if match:
+                            self.source_db = match.group(1).decode('utf-8')
+                    self.progress.add(n)    # cabecera y pies cuentan como ya aplicados
+                position += n
+            if held:
+                current.add(*held)
+            close(current)
+        finally:
+            lines.close()
+            self.header_done.set()
+
+
+def _sources(daily_folder, info):
+    """Partes del día en orden como (ruta, abrir, tamaño en disco), y si el total es exacto"""
+    if info.get('storage') == 'dedup':
+        manifest = chunkstore.load_manifest(daily_folder)
+        opener = lambda: chunkstore.open_day(info['chunk_store'], daily_folder)
+        return [(None, opener, manifest['size'])], manifest['size'], True, False
+
+    paths = [os.path.join(daily_folder, f['filename']) for f in info['files']]
+    missing = [p for p in paths if not os.path.exists(p)]
+    if missing:
+        raise FileNotFoundError(f"Faltan partes del backup: {', '.join(map(os.path.basename, missing))}")
+    plain = all(compression.detect_codec(p) is None for p in paths)
+    sources = [(p, (lambda p=p: compression.open_reader(p)), os.path.getsize(p)) for p in paths]
+    return sources, sum(s[2] for s in sources), plain, plain
+
+
+def _indexed_tables(daily_folder, info, only):
+    """
+    Tramos de tabla sacados del índice de SPLIT_LAYOUT 'table': cada tabla son
+    sus partes enteras, así que no hace falta recorrer el backup para encontrarlas.
+
+    Returns:
+        tuple: (tramos de las tablas pedidas, partes que ocupan todas las tablas)
+    """
+    segments, table_files = [], set()
+    for table in info['tables']:
+        table_files.update(table['files'])
+        if only is not None and table['name'] not in only:
+            continue
+        segment = _Segment('table', table['name'])
+        for filename in table['files']:
+            path = os.path.join(daily_folder, filename)
+            plain = compression.detect_codec(path) is None
+            segment.pieces.append((path, 0, os.path.getsize(path) if plain else None))
+        segment.size = table['content_bytes']
+        segments.append(segment)
+    return segments, table_files
+
+
+def restore_backup(daily_folder, config):
+    """
+    Restaurar un backup diario en la base de datos config['DB_NAME'].
+
+    Lee backup_info.json, recorre las partes (o el repositorio deduplicado) y
+    carga las tablas por RESTORE_THREADS conexiones a la vez, con las
+    comprobaciones de unicidad y claves foráneas desactivadas y los índices
+    secundarios creados después de los datos. Las vistas y rutinas se aplican
+    luego en orden, y al final el tramo incremental de binlog del día. Sin
+    compresión las conexiones leen directamente de las partes; con compresión
+    cada tabla se descomprime antes a un temporal en RESTORE_TEMP_DIR. Con
+    RESTORE_UNTIL el binlog se aplica solo hasta esa hora (PITR).
+
+    Con RESTORE_TABLES (lista de nombres) solo se cargan esas tablas, sin
+    vistas, rutinas ni binlog: el binlog toca también las demás. Si el día se
+    dividió con SPLIT_LAYOUT 'table', las tablas se leen directamente de sus
+    partes según el índice de backup_info.json y solo se recorre el resto.
+
+    Returns:
+        dict: tablas restauradas, bytes aplicados y duración
+    """
+    with open(os.path.join(daily_folder, INFO_FILE_NAME), 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    threads = max(1, int(config.get('RESTORE_THREADS', RESTORE_THREADS)))
+    sources, total, exact, direct = _sources(daily_folder, info)
+    interval = config.get('RESTORE_PROGRESS_INTERVAL', PROGRESS_INTERVAL)
+    only = set(config['RESTORE_TABLES']) if config.get('RESTORE_TABLES') else None
+    skip_tail = config.get('RESTORE_SKIP_TAIL', False) or only is not None
+
+    indexed, table_bytes = [], 0
+    if info.get('layout') == 'table' and info.get('storage') != 'dedup':
+        indexed, table_files = _indexed_tables(daily_folder, info, only)
+        table_bytes = sum(table['content_bytes'] for table in info['tables'])
+        # El recorrido secuencial se queda con cabecera, vistas, rutinas, pie y binlog
+        rest = [f for f in info['files'] if f['filename'] not in table_files]
+        if only is not None:
+            rest = [f for f in rest if f['offset'] < min((t['offset'] for t in info['tables']), default=0)]
+        names = {f['filename'] for f in rest}
+        sources = [s for s in sources if os.path.basename(s[0]) in names]
+        if all('content_bytes' in f for f in rest):
+            total = sum(f['content_bytes'] for f in rest) + sum(segment.size for segment in indexed)
+            exact = True
+
+    print(f"♻️ Restaurando {info.get('backup_date', daily_folder)} en {config['DB_NAME']} ({threads} hilos)")
+    quoted = config['DB_NAME'].replace('`', '``')
+    dbclient.query(config, f"CREATE DATABASE IF NOT EXISTS `{quoted}`")
+
+    spill_dir = None if direct else tempfile.mkdtemp(prefix='helen_restore_', dir=config.get('RESTORE_TEMP_DIR'))
+    progress = _Progress(total, exact)
+    reader = _BackupReader(sources, spill_dir, progress)
+    abort = threading.Event()
+    jobs = queue.Queue(maxsize=threads * 2)     # acota los temporales por delante de las conexiones
+    workers = [_RestoreWorker(i + 1, jobs, reader.preamble, config, progress, abort) for i in range(threads)]
+    finished = threading.Event()
+
+    def report():
+        while not finished.wait(interval):
+            progress.report(progress.phase)
+
+    checked = threading.Event()
+    feed_errors = []
+
+    def dispatch(segment):
+        if only is not None and segment.name not in only:
+            segment.discard()
+            return
+        if not checked.is_set():
+            checked.set()
+            if reader.source_db and reader.source_db != config['DB_NAME'] and not skip_tail:
+                # Las sentencias del binlog llevan su propio USE: irían a la base de datos original
+                raise RuntimeError(f"El backup es de {reader.source_db}: el tramo incremental se aplicaría sobre "
+                                   f"esa base de datos y no sobre {config['DB_NAME']} "
+                                   "(usa RESTORE_SKIP_TAIL, o --skip-tail desde la línea de órdenes)")
+        while not abort.is_set():
+            try:
+                jobs.put(segment, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        segment.discard()
+
+    def feed():
+        """Tablas del índice a las conexiones mientras el lector recorre el resto"""
+        reader.preamble()       # la cabecera dice de qué base de datos es el volcado
+        try:
+            for segment in indexed:
+                dispatch(segment)
+        except Exception as e:
+            feed_errors.append(e)
+            abort.set()
+
+    limit = until = None
+    if config.get('RESTORE_UNTIL') and only is None:
+        until = pitr.normalize_time(config['RESTORE_UNTIL'])
+        if pitr.can_seek(daily_folder, info):
+            limit = pitr.find_cut(daily_folder, info, until)
+            print(f"⏱️ Restaurando hasta {until}: " +
+                  (f"corte en el byte {limit:,} según el índice PITR" if limit is not None else "el día completo"))
+            if limit is not None:
+                limit -= table_bytes        # el lector no pasa por las tablas del índice, todas antes del binlog
+            until = None
+        else:
+            print(f"⏱️ Restaurando hasta {until} (sin índice PITR: se revisa el binlog completo)")
+
+    if only is not None:
+        print(f"📋 Solo las tablas: {', '.join(sorted(only))} (sin vistas, rutinas ni binlog)")
+    for worker in workers:
+        worker.start()
+    threading.Thread(target=report, daemon=True).start()
+    feeder = threading.Thread(target=feed, daemon=True)
+    try:
+        try:
+            feeder.start()
+            try:
+                reader.run(dispatch, limit, until)
+            except BaseException:
+                abort.set()
+                raise
+            finally:
+                feeder.join()
+        finally:
+            for _ in workers:
+                while not abort.is_set():
+                    try:
+                        jobs.put(None, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+            for worker in workers:
+                worker.join()
+
+        if feed_errors:
+            raise feed_errors[0]
+        failed = [w for w in workers if w.error]
+        if failed:
+            raise RuntimeError(f"Error en la conexión de restauración {failed[0].worker_id}: {failed[0].error}")
+        tables = sum(worker.tables for worker in workers)
+        print(f"✅ {tables} tablas cargadas")
+
+        # Vistas, rutinas y después el binlog, cada uno en orden sobre una sola conexión
+        phases = [("objetos", reader.serial if only is None else [], reader.preamble() + SESSION_TUNING)]
+        if reader.tail is not None and not skip_tail:
+            phases.append(("binlog", [reader.tail], b''))
+        for phase, segments, prefix in phases:
+            if not segments:
+                continue
+            progress.phase = phase
+            proc = _open_client(config)
+
+            def write(data):
+                proc.stdin.write(data)
+                progress.add(len(data))
+
+            try:
+                proc.stdin.write(prefix)
+                for segment in segments:
+                    with segment.open() as src:
+                        fastio.copy_stream(src, write)
+            except OSError:
+                pass        # mysql se cerró por un error: lo explica _finish_client
+            _finish_client(proc)
+            print(f"✅ Aplicado: {phase}")
+    finally:
+        finished.set()
+        for segment in reader.serial + ([reader.tail] if reader.tail else []):
+            segment.discard()
+        if spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+    duration = time.time() - progress.started
+    print(f"🎉 Restauración completada: {tables} tablas, {progress.applied / 1024**3:.2f} GB "
+          f"en {timedelta(seconds=int(duration))} ({progress.applied / 1024**2 / max(duration, 0.001):.1f} MB/s)")
+    return {
+        "tables": tables,
+        "bytes": progress.applied,
+        "duration_seconds": round(duration, 2)
+    }
+
+
+if __name__ == "__main__":
+    # Uso: python restore.py [--skip-tail] <carpeta_del_día> [base_de_datos_destino] [hilos] [hasta] [tabla,tabla...]
+    # --skip-tail no aplica el binlog del día (necesario para restaurar en otra base de datos)
+    args = [arg for arg in sys.argv[1:] if arg != '--skip-tail']
+    if not args:
+        print("Uso: python restore.py [--skip-tail] <carpeta_del_día> [base_de_datos_destino] [hilos] [hasta] "
+              "[tabla,tabla...]")
+        sys.exit(1)
+
+    import main
+
+    config = {
+        'HOST': main.HOST,
+        'PORT': main.PORT,
+        'USER': main.USER,
+        'PASSWORD': main.PASSWORD,
+        'DB_NAME': args[1] if len(args) > 1 else main.DB_NAME,
+        'RESTORE_THREADS': int(args[2]) if len(args) > 2 else RESTORE_THREADS,
+        'RESTORE_UNTIL': args[3] if len(args) > 3 and args[3] else None,
+        'RESTORE_TABLES': args[4].split(',') if len(args) > 4 else None,
+        'RESTORE_SKIP_TAIL': '--skip-tail' in sys.argv[1:]
+    }
+    restore_backup(args[0], config)
@@ -0,0 +1,391 @@
+"""
+Backup del día escrito directamente en partes.
+
+Con ROLLING_PARTS el archivo de backup (backup.sql) es solo la parte en curso:
+cuando llega a MAX_FILE_SIZE_GB se cierra en un fin de sentencia y se mueve a
+backup_parts/ como backup_part_NNN.sql, y lo siguiente empieza un backup.sql
+nuevo. parts.json apunta de cada parte cerrada su tamaño en disco y sin
+comprimir y dónde empieza en el contenido del día, así que el proceso nocturno
+solo tiene que mover archivos ya terminados a la carpeta del día.
+
+El volcado completo de un solo mysqldump se corta dentro del stream
+(StatementSplitter, la misma regla que usa el proceso nocturno); el paralelo,
+entre archivos de tabla; los incrementales y el streaming, después de un tramo
+ya confirmado.
+
+Los tamaños en disco que guardan el estado del streaming, el índice PITR y el
+registro de huellas son del día entero (partes cerradas + parte en curso): el
+recorte al último checkpoint funciona igual después de cerrar partes.
+"""
+import io
+import os
+import re
+import json
+import shutil
+import subprocess
+import compression
+import fastio
+import integrity
+import sqlscan
+
+# —————— CONFIGURACIÓN DE LAS PARTES ——————
+PARTS_DIR_NAME = 'backup_parts'             # ← junto al archivo de backup
+MANIFEST_NAME  = 'parts.json'
+PART_NAME      = 'backup_part_{:03d}.sql'   # ← mismo nombre que las partes del proceso nocturno
+# ——————————————————————————
+
+
+class StatementSplitter:
+    """
+    Repartir un stream en partes de max_size bytes cortando solo entre sentencias.
+
+    Una parte se cierra en el primer fin de sentencia (sqlscan) una vez llega a
+    max_size bytes sin comprimir. write() acepta bloques de cualquier tamaño:
+    se copian a un buffer fijo y, cuando se llena, sus líneas completas pasan
+    al destino; en él solo queda la última línea incompleta (crece si una línea
+    entera no cabe). El destino tiene write(datos), cut() y size, los bytes de
+    la parte en curso.
+    """
+
+    def __init__(self, target, max_size, buffer_size=None):
+        self.target = target
+        self.max_size = max_size
+        self.buffer = bytearray(buffer_size or fastio.BUFFER_SIZE)
+        self.filled = 0
+        self.scanner = sqlscan.Scanner()
+
+    def write(self, data):
+        with memoryview(data) as view:
+            pos = 0
+            while pos < len(view):
+                if self.filled == len(self.buffer):
+                    self._drain()
+                take = min(len(view) - pos, len(self.buffer) - self.filled)
+                self.buffer[self.filled:self.filled + take] = view[pos:pos + take]
+                self.filled += take
+                pos += take
+
+    def close(self):
+        """Pasar al destino lo que quede (la última línea puede no tener salto de línea)"""
+        self._drain(final=True)
+
+    def _drain(self, final=False):
+        end = self.filled if final else self.buffer.rfind(b'\n', 0, self.filled) + 1
+        if not end:
+            if self.filled == len(self.buffer):
+                self.buffer.extend(bytes(len(self.buffer)))     # línea más larga que el buffer
+            return
+
+        with memoryview(self.buffer) as view:
+            self._split(view, 0, end)
+        # La línea incompleta pasa al principio del buffer
+        self.buffer[:self.filled - end] = self.buffer[end:self.filled]
+        self.filled -= end
+
+    def _split(self, view, pos, end):
+        """Pasar al destino buffer[pos:end], que empieza en principio de línea, cerrando partes"""
+        while pos < end:
+            # Solo las líneas que acaban a partir del tamaño máximo pueden cerrar la parte
+            cut = self.scanner.boundary(self.buffer, pos, end, pos + max(self.max_size - self.target.size - 1, 0))
+            if cut < 0:
+                self.target.write(view[pos:end])
+                break
+            self.target.write(view[pos:cut])
+            self.target.cut()
+            pos = cut
+
+
+class SectionSplitter(StatementSplitter):
+    """
+    StatementSplitter que además cierra la parte antes de cada sección del volcado.
+
+    markers son los principios de línea que abren una sección (estructura de
+    una tabla, vistas, rutinas, pie, binlog...): cada sección empieza en una
+    parte nueva y, si pasa de max_size, sigue en varias. El destino recibe
+    además section(línea) con la línea que abre cada sección, y en su atributo
+    rows se suman las filas aproximadas de los INSERT que le llegan.
+    """
+
+    def __init__(self, target, max_size, markers, buffer_size=None):
+        super().__init__(target, max_size, buffer_size)
+        self.markers = re.compile(rb'^(?:' + rb'|'.join(re.escape(m) for m in markers) + rb')', re.MULTILINE)
+
+    def _split(self, view, pos, end):
+        search = pos
+        while pos < end:
+            found = self.markers.search(self.buffer, search, end)
+            stop = found.start() if found else end
+            # Filas aproximadas: una por INSERT más una por cada "),(" entre tuplas
+            self.target.rows += self.buffer.count(b'INSERT INTO ', pos, stop) + self.buffer.count(b'),(', pos, stop)
+            super()._split(view, pos, stop)
+            pos = search = stop
+            if found:
+                search = stop + 1
+                if self.scanner.closer is None:     # no es texto dentro de una cadena o comentario
+                    self.target.cut()
+                    line_end = self.buffer.find(b'\n', stop, end)
+                    self.target.section(bytes(self.buffer[stop:line_end if line_end >= 0 else end]))
+
+
+# ——— Partes cerradas del día ———
+
+def enabled(config):
+    import main  # Importar aquí para evitar dependencias circulares
+
+    return bool(config.get('ROLLING_PARTS', main.ROLLING_PARTS))
+
+
+def max_part_size(config):
+    return int(config.get('MAX_FILE_SIZE_GB', 1) * 1024**3)
+
+
+def parts_dir(backup_file):
+    return os.path.join(os.path.dirname(os.path.abspath(backup_file)), PARTS_DIR_NAME)
+
+
+def load(backup_file):
+    """
+    Partes cerradas en orden, cada una con filename, offset, content_bytes,
+    size_bytes y disk_end (fin de la parte en disco contando las anteriores).
+
+    Solo lee: se puede llamar desde la UI o el estado del servicio mientras se
+    escribe el backup. Una parte a medio cerrar la termina recover().
+    """
+    path = os.path.join(parts_dir(backup_file), MANIFEST_NAME)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['parts']
+
+
+def recover(backup_file):
+    """
+    Terminar de mover la última parte si el proceso se cortó entre apuntarla y moverla.
+
+    Se llama una vez al empezar a escribir (backup, streaming o proceso
+    nocturno), antes de usar los tamaños del día. Devuelve True si la movió.
+    """
+    parts = load(backup_file)
+    if not parts:
+        return False
+    last = os.path.join(parts_dir(backup_file), parts[-1]['filename'])
+    if not os.path.exists(last) and os.path.exists(backup_file) \
+            and os.path.getsize(backup_file) == parts[-1]['size_bytes']:
+        os.replace(backup_file, last)
+        print(f"📦 Parte {parts[-1]['filename']} a medio cerrar: movida a {PARTS_DIR_NAME}/")
+        return True
+    return False
+
+
+def _save(backup_file, parts):
+    path = os.path.join(parts_dir(backup_file), MANIFEST_NAME)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({"parts": parts}, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def sealed_disk(backup_file):
+    parts = load(backup_file)
+    return parts[-1]['disk_end'] if parts else 0
+
+
+def sealed_content(backup_file):
+    parts = load(backup_file)
+    return parts[-1]['offset'] + parts[-1]['content_bytes'] if parts else 0
+
+
+def exists(backup_file):
+    """Hay backup del día: parte en curso o partes cerradas"""
+    return os.path.exists(backup_file) or bool(load(backup_file))
+
+
+def disk_size(backup_file):
+    """Tamaño en disco del backup del día (partes cerradas + parte en curso)"""
+    head = os.path.getsize(backup_file) if os.path.exists(backup_file) else 0
+    return sealed_disk(backup_file) + head
+
+
+def truncate(backup_file, size):
+    """Recortar el backup del día a size bytes en disco; solo se recorta la parte en curso"""
+    head = size - sealed_disk(backup_file)
+    if head < 0:
+        raise RuntimeError(f"No se puede recortar el backup a {size:,} bytes: esa parte ya está cerrada")
+    if os.path.exists(backup_file) and os.path.getsize(backup_file) > head:
+        os.truncate(backup_file, head)
+
+
+def seal(backup_file, content_bytes):
+    """
+    Cerrar la parte en curso: moverla a backup_parts/ y apuntarla en parts.json.
+
+    content_bytes es su tamaño sin comprimir. Se apunta antes de mover, y
+    recover() termina el movimiento si se cortó entre medias. Devuelve la parte o None si
+    no había nada que cerrar.
+    """
+    if not os.path.exists(backup_file) or not os.path.getsize(backup_file):
+        return None
+    parts = load(backup_file)
+    folder = parts_dir(backup_file)
+    os.makedirs(folder, exist_ok=True)
+
+    codec = compression.detect_codec(backup_file)
+    size = os.path.getsize(backup_file)
+    part = {
+        "filename": PART_NAME.format(len(parts) + 1) + (compression.EXTENSIONS[codec] if codec else ''),
+        "offset": parts[-1]['offset'] + parts[-1]['content_bytes'] if parts else 0,
+        "content_bytes": content_bytes,
+        "size_bytes": size,
+        "disk_end": (parts[-1]['disk_end'] if parts else 0) + size
+    }
+    _save(backup_file, parts + [part])
+    os.replace(backup_file, os.path.join(folder, part['filename']))
+    return part
+
+
+def reset(backup_file):
+    """Descartar las partes cerradas (backup completo nuevo o día ya procesado)"""
+    folder = parts_dir(backup_file)
+    if os.path.isdir(folder):
+        shutil.rmtree(folder)
+
+
+def move_parts(backup_file, target_folder, head_content):
+    """
+    Mover las partes del día a target_folder, con la parte en curso como última.
+
+    Returns:
+        list: las partes (ver load) con 'path' en su nueva ubicación
+    """
+    seal(backup_file, head_content)
+    folder = parts_dir(backup_file)
+    parts = load(backup_file)
+    for part in parts:
+        part['path'] = os.path.join(target_folder, part['filename'])
+        shutil.move(os.path.join(folder, part['filename']), part['path'])
+    reset(backup_file)
+    return parts
+
+
+def group_files(contents, config):
+    """
+    Agrupar archivos que acaban en fin de sentencia en partes de MAX_FILE_SIZE_GB.
+
+    contents son los bytes sin comprimir de cada archivo, en orden. Devuelve
+    una lista de (número de archivos, bytes sin comprimir) por parte; sin
+    ROLLING_PARTS, una sola parte.
+    """
+    if not enabled(config):
+        return [(len(contents), sum(contents))]
+    max_size = max_part_size(config)
+    groups, count, size = [], 0, 0
+    for content in contents:
+        count += 1
+        size += content
+        if size >= max_size:
+            groups.append((count, size))
+            count, size = 0, 0
+    if count or not groups:
+        groups.append((count, size))
+    return groups
+
+
+class _Head:
+    """Parte en curso como destino de StatementSplitter (cada parte, un tramo del registro de huellas)"""
+
+    def __init__(self, backup_file, config, hashing):
+        self.backup_file = backup_file
+        self.config = config
+        self.hashing = hashing
+        self.writer = None
+        self.digest = None
+        self.size = 0
+        self.records = []
+        self.ends = []
+
+    def write(self, data):
+        if self.writer is None:
+            self.writer = compression.open_writer(self.backup_file, self.config)
+            self.digest = integrity.Digest() if self.hashing else None
+        self.writer.write(data)
+        if self.digest:
+            self.digest.update(data)
+        self.size += len(data)
+
+    def cut(self):
+        self.close()
+        seal(self.backup_file, self.size)
+        self.size = 0
+
+    def close(self):
+        if self.writer is None:
+            return
+        self.writer.close()
+        self.writer = None
+        if self.digest:
+            self.records.append(self.digest.record())
+            self.ends.append(disk_size(self.backup_file))
+
+
+def run_to_parts(cmd, backup_file, config, limiter=None, hashing=False):
+    """
+    Como compression.run_to_file, pero cerrando partes de MAX_FILE_SIZE_GB mientras llega la salida.
+
+    Returns:
+        tuple: (registros de huellas, fin en disco de cada uno); vacíos sin hashing
+    """
+    head = _Head(backup_file, config, hashing)
+    splitter = StatementSplitter(head, max_part_size(config))
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        compression.pump(proc.stdout, splitter, limiter)
+        splitter.close()
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        head.close()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+    return head.records, head.ends
+
+
+class _ChainReader(io.RawIOBase):
+    """Varios archivos de backup leídos uno detrás de otro como un solo stream"""
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.current = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                if not self.paths:
+                    return 0
+                self.current = compression.open_reader(self.paths.pop(0))
+            n = self.current.readinto(buffer)
+            if n:
+                return n
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+            self.current = None
+        super().close()
+
+
+def open_reader(backup_file):
+    """Contenido del día (partes cerradas + parte en curso) como un solo stream binario"""
+    folder = parts_dir(backup_file)
+    paths = [os.path.join(folder, part['filename']) for part in load(backup_file)]
+    if os.path.exists(backup_file):
+        paths.append(backup_file)
+    if len(paths) == 1:
+        return compression.open_reader(paths[0])
+    return io.BufferedReader(_ChainReader(paths), buffer_size=fastio.BUFFER_SIZE)
@@ -0,0 +1,144 @@
+"""
+Fines de sentencia en volcados SQL y salidas de mysqlbinlog.
+
+Una línea que acaba en ';' no siempre cierra una sentencia: puede estar dentro
+de una cadena de varias líneas, de un comentario o de una rutina o trigger
+entre DELIMITER ;; y DELIMITER ; (mysqldump --routines --triggers). El
+escáner sigue comillas (', " y `, con escapes con barra invertida), comentarios
+(#, -- y /* */) y los cambios de DELIMITER, y solo da por cerrada una sentencia
+en un salto de línea fuera de todo eso cuya línea acaba en el delimitador
+vigente. Los bloques BINLOG '...' de mysqlbinlog son cadenas de varias líneas.
+
+El contenido se recorre con expresiones regulares compiladas sobre ventanas
+grandes del buffer (bytes, bytearray o mmap), no byte a byte desde Python:
+las cadenas y comentarios completos se saltan de una vez.
+"""
+import re
+
+# —————— CONFIGURACIÓN DEL ESCÁNER ——————
+WINDOW_SIZE = 1024 * 1024                   # ← bytes recorridos por cada búsqueda rápida
+DEFAULT_DELIMITER = b';'
+# ——————————————————————————
+
+
+def _compile(pattern, flags=re.DOTALL):
+    """Con cuantificadores posesivos (Python 3.11+) el recorrido es unas tres veces más rápido"""
+    try:
+        return re.compile(pattern, flags)
+    except re.error:
+        return re.compile(pattern.replace(b'*+', b'*').replace(b'++', b'+'), flags)
+
+
+# Cadenas y comentarios completos (pueden ocupar varias líneas)
+_QUOTED = (rb"'[^'\\]*+(?:\\.[^'\\]*+)*+'"
+           rb'|"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+           rb"|`[^`]*+`"
+           rb"|/\*.*?\*/")
+_LINE_COMMENT = rb"#[^\n]*+|--(?=\s)[^\n]*+"
+_PLAIN = rb"[^'\"`\n#/\-]++|/(?!\*)|-(?!-\s)"
+
+# Fuera de cadenas y comentarios, saltos de línea incluidos salvo antes de DELIMITER
+_SKIP = _compile(rb"(?:" + _PLAIN + rb"|" + _QUOTED + rb"|" + _LINE_COMMENT +
+                 rb"|\n(?!(?i:delimiter)[ \t]))*+")
+# Lo mismo hasta el siguiente salto de línea fuera de cadenas y comentarios
+_LINE = _compile(rb"(?:" + _PLAIN + rb"|" + _QUOTED + rb"|(?P<comment>" + _LINE_COMMENT + rb"))*+")
+_DELIMITER = re.compile(rb"(?i:delimiter)[ \t]+(\S+)[^\n]*\n")
+
+# Resto de una cadena o comentario que empezó antes
+_CLOSERS = {
+    b"'": _compile(rb"[^'\\]*+(?:\\.[^'\\]*+)*+'"),
+    b'"': _compile(rb'[^"\\]*+(?:\\.[^"\\]*+)*+"'),
+    b'`': _compile(rb"[^`]*+`"),
+    b'/*': _compile(rb".*?\*/"),
+}
+_OPENERS = (b'/*', b"'", b'"', b'`')
+
+
+class Scanner:
+    """
+    Buscar fines de sentencia en un stream SQL leído por tramos.
+
+    Cada llamada a boundary() continúa donde acabó la anterior (el estado de
+    comillas, comentarios y delimitador pasa de un tramo a otro) y los tramos
+    empiezan y acaban en principio de línea, salvo el último del stream.
+    """
+
+    def __init__(self):
+        self.delimiter = DEFAULT_DELIMITER
+        self.closer = None          # cadena o comentario abierto al final del tramo anterior
+
+    def boundary(self, buffer, start, end, after):
+        """
+        Recorrer buffer[start:end] y devolver la posición tras el primer fin de
+        sentencia cuyo salto de línea está en after o después, o -1 si no hay
+        ninguno (el tramo queda recorrido entero).
+
+        Si lo encuentra, el estado queda en esa posición: la siguiente llamada
+        empieza ahí.
+        """
+        pos = start
+        line_start = True
+        while pos < end:
+            if self.closer:
+                match = _CLOSERS[self.closer].match(buffer, pos, end)
+                if not match:
+                    return -1
+                pos = match.end()
+                self.closer = None
+                line_start = False
+                continue
+
+            if line_start:
+                command = _DELIMITER.match(buffer, pos, end)
+                if command:
+                    # Orden del cliente mysql: cierra en su salto de línea
+                    self.delimiter = command.group(1)
+                    pos = command.end()
+                    if pos - 1 >= after:
+                        return pos
+                    continue
+
+            # Líneas anteriores a after: solo hace falta el estado
+            skip_end = self._window_end(buffer, pos, min(after, end))
+            if skip_end > pos:
+                pos = _SKIP.match(buffer, pos, skip_end).end()
+                if pos == skip_end:
+                    line_start = True
+                    continue
+            else:
+                match = _LINE.match(buffer, pos, end)
+                pos = match.end()
+                if pos < end and buffer[pos] == ord('\n'):
+                    pos += 1
+                    line_start = True
+                    if pos - 1 >= after and match.start('comment') < 0 and self._ends_statement(buffer, pos - 1):
+                        return pos
+                    continue
+                if pos == end:
+                    return -1
+
+            # Salto de línea antes de DELIMITER, o cadena/comentario que sigue más allá
+            if buffer[pos] == ord('\n'):
+                pos += 1
+                line_start = True
+                continue
+            self.closer = next(o for o in _OPENERS if buffer[pos:pos + len(o)] == o)
+            pos += len(self.closer)
+        return -1
+
+    def _ends_statement(self, buffer, newline):
+        """La línea que acaba en newline termina en el delimitador vigente"""
+        line_start = buffer.rfind(b'\n', 0, newline) + 1
+        last = newline
+        while last > line_start and buffer[last - 1] in b' \t\r\x0b\x0c':
+            last -= 1
+        begin = last - len(self.delimiter)
+        return begin >= line_start and buffer[begin:last] == self.delimiter
+
+    @staticmethod
+    def _window_end(buffer, pos, limit):
+        """Principio de línea hasta el que saltar sin buscar cortes: antes de limit y a lo sumo unos WINDOW_SIZE bytes"""
+        newline = buffer.rfind(b'\n', pos, min(limit, pos + WINDOW_SIZE))
+        if newline < 0 and limit - pos > WINDOW_SIZE:
+            newline = buffer.find(b'\n', pos + WINDOW_SIZE, limit)     # línea más larga que la ventana
+        return newline + 1
@@ -0,0 +1,87 @@
+"""
+Filtrado de binlogs por protocolo de réplica (binlog_parser.filter_remote).
+
+El servidor sigue enviando los binlogs posteriores tras el ROTATE del archivo
+pedido; con los eventos sintéticos del banco (bench/synth.py) se comprueba que
+el binlog reducido de cada tramo de la cadena es el mismo que sale de filtrar
+ese archivo descargado con --raw, sin nada de los siguientes.
+
+Uso: python -m unittest discover tests   (o python -m pytest tests)
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'bench'))
+import binlog_parser  # noqa: E402
+import synth  # noqa: E402
+
+PER_FILE = 10                               # transacciones por archivo de binlog
+STATE = dict(synth.DEFAULTS, db='prueba', tables=4, rotate=4 + PER_FILE * synth.UNIT,
+             binlog_bytes=(2 * PER_FILE + 5) * synth.UNIT)
+CONFIG = {'DB_NAME': 'prueba'}
+
+
+class FilterRemoteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+        self.requested = []
+        original = binlog_parser.dump_events
+        self.addCleanup(setattr, binlog_parser, 'dump_events', original)
+        binlog_parser.dump_events = self.dump_events
+        self.logs = synth.binary_logs(STATE)
+
+    def dump_events(self, config, file_, position):
+        self.requested.append((file_, position))
+        return (memoryview(event) for event in synth.dump_packets(STATE, file_, position))
+
+    def from_file(self, name, start):
+        """Referencia: el archivo descargado con --raw y filtrado desde disco"""
+        path = os.path.join(self.folder, name)
+        with open(path, 'wb') as f:
+            synth.raw_binlog(STATE, name, start, dict(self.logs)[name], f.write)
+        out = io.BytesIO()
+        parser = binlog_parser.filter_file(path, out, CONFIG['DB_NAME'], start=start)
+        return out.getvalue(), parser
+
+    def from_server(self, name, start, stop=None):
+        out = io.BytesIO()
+        parser = binlog_parser.filter_remote(CONFIG, name, out, start, stop)
+        return out.getvalue(), parser
+
+    def test_dump_continues_past_the_requested_file(self):
+        # El servidor falso se porta como el real: sin cortar, llegan los tres archivos
+        rotates = [bytes(event[19 + 8:-4]).decode() for event in synth.dump_packets(STATE, self.logs[0][0], 4)
+                   if event[4] == binlog_parser.ROTATE_EVENT]
+        names = [name for name, _ in self.logs]
+        self.assertEqual(rotates, names[:1] + [name for name in names[1:] for _ in ('real', 'artificial')])
+
+    def test_each_segment_reads_only_its_file(self):
+        self.assertEqual(len(self.logs), 3)
+        for name, end in self.logs:
+            for start in (4, 4 + 3 * synth.UNIT):
+                with self.subTest(file=name, start=start):
+                    expected, reference = self.from_file(name, start)
+                    data, parser = self.from_server(name, start)
+                    self.assertEqual(data, expected)
+                    self.assertEqual((parser.kept, parser.dropped), (reference.kept, reference.dropped))
+                    self.assertEqual(parser.position, end)
+
+    def test_stop_inside_the_file(self):
+        name, _ = self.logs[1]
+        stop = 4 + 6 * synth.UNIT
+        data, parser = self.from_server(name, 4, stop)
+        self.assertEqual(parser.position, stop)
+        self.assertEqual(parser.kept + parser.dropped, 6)
+        self.assertTrue(data.startswith(binlog_parser.BINLOG_MAGIC))
+
+
+if __name__ == "__main__":
+    unittest.main()
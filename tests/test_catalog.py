@@ -0,0 +1,190 @@
+"""
+Ida y vuelta de catalog.py: ejecuciones de main, días del proceso nocturno y consultas.
+
+Se apuntan un volcado completo y un incremental (con sus huellas y puntos
+PITR) sobre un BACKUP_DIR temporal, se guarda el día y se comprueba lo que
+devuelven covering, storage_by_month y summary; también que un catálogo roto
+o una ejecución fallida no paran el backup.
+
+Uso: python -m unittest discover tests   (o python -m pytest tests)
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import catalog  # noqa: E402
+import integrity  # noqa: E402
+import pitr  # noqa: E402
+
+try:
+    import main
+except ImportError:
+    main = None
+
+FULL_END = ('binlog.000001', 500)
+INCREMENTAL_END = ('binlog.000001', 900)
+
+
+@unittest.skipIf(main is None, "main.py no se puede importar")
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+        self.config = {'BACKUP_DIR': self.folder, 'DB_NAME': 'prueba'}
+        self.backup_file, state_file = main.backup_paths(self.config)
+        self.index_file = pitr.index_path(state_file)
+        self.path = catalog.catalog_path(self.config)
+        self.now = datetime.now()
+        self.first_event = pitr.normalize_time(self.now + timedelta(hours=1))
+        self.last_event = pitr.normalize_time(self.now + timedelta(hours=2))
+
+    def write(self, data):
+        """Añadir data al backup del ciclo con su huella, como hace main"""
+        with open(self.backup_file, 'ab') as f:
+            f.write(data)
+        size = os.path.getsize(self.backup_file)
+        integrity.append(main.digest_file(self.config), [{"length": len(data), "blake2b": "-"}], [size])
+        return size
+
+    def back_up(self):
+        """Volcado completo y un incremental con dos puntos PITR"""
+        with catalog.Run(self.config, 'full') as run:
+            self.write(b"x" * 1000)
+            run.end = FULL_END
+        with catalog.Run(self.config, 'incremental', FULL_END) as run:
+            size = self.write(b"y" * 300)
+            points = [{"time": self.first_event, "binlog": FULL_END[0], "pos": 600, "offset": 0},
+                      {"time": self.last_event, "binlog": FULL_END[0], "pos": 800, "offset": 120}]
+            pitr.append(self.index_file, points, 1000, size, size)
+            run.end = INCREMENTAL_END
+
+    def record(self, name='2026-10-16'):
+        """Guardar un día como el proceso nocturno: carpeta, partes y backup_info.json"""
+        day = os.path.join(self.folder, 'daily_backups', name)
+        os.makedirs(day, exist_ok=True)
+        info = {"backup_date": name, "creation_time": self.now.isoformat(), "storage": "parts",
+                "files": [{"filename": "backup_part_001.sql", "size_bytes": 800, "content_bytes": 1000, "offset": 0},
+                          {"filename": "backup_part_002.sql", "size_bytes": 250, "content_bytes": 300, "offset": 1000}]}
+        catalog.record_day(self.config, day, info, duration=12.5)
+        return os.path.abspath(day)
+
+    def query(self, sql, *args):
+        with catalog.transaction(self.path) as conn:
+            return [dict(row) for row in conn.execute(sql, args)]
+
+    def day(self, folder):
+        return self.query("SELECT * FROM days WHERE folder = ?", folder)[0]
+
+    def test_runs_and_day(self):
+        self.back_up()
+        folder = self.record()
+        day = self.day(folder)
+        runs = self.query("SELECT * FROM runs ORDER BY id")
+        self.assertEqual([run['kind'] for run in runs], ['full', 'incremental'])
+        self.assertEqual([run['day_id'] for run in runs], [day['id'], day['id']])
+        self.assertEqual([run['content_bytes'] for run in runs], [1000, 300])
+        self.assertEqual([run['disk_bytes'] for run in runs], [1000, 300])
+        self.assertEqual((runs[1]['binlog_from'], runs[1]['pos_from']), FULL_END)
+        self.assertEqual((runs[1]['first_event'], runs[1]['last_event']), (self.first_event, self.last_event))
+        self.assertEqual([run['error'] for run in runs], [None, None])
+
+        self.assertEqual((day['disk_bytes'], day['content_bytes']), (1050, 1300))
+        self.assertEqual((day['covers_from'], day['covers_to']), (runs[0]['started'], self.last_event))
+        self.assertEqual((day['binlog_to'], day['pos_to']), INCREMENTAL_END)
+        self.assertEqual(len(self.query("SELECT * FROM parts WHERE day_id = ?", day['id'])), 2)
+
+    def test_covering(self):
+        self.back_up()
+        folder = self.record()
+        inside = self.now + timedelta(minutes=90)
+        self.assertEqual([day['folder'] for day in catalog.covering(self.path, inside)], [folder])
+        self.assertEqual(catalog.covering(self.path, self.now - timedelta(days=1)), [])
+        self.assertEqual(catalog.covering(self.path, self.now + timedelta(hours=3)), [])
+
+    def test_storage_and_summary(self):
+        self.back_up()
+        self.record()
+        self.assertEqual(catalog.storage_by_month(self.path),
+                         [{"month": "2026-10", "days": 1, "disk_bytes": 1050, "content_bytes": 1300}])
+        stats = catalog.summary(self.path)
+        self.assertEqual((stats['runs'], stats['failed'], stats['days'], stats['disk_bytes']), (2, 0, 1, 1050))
+        self.assertEqual(stats['last']['kind'], 'incremental')
+        self.assertEqual(stats['covers_to'], self.last_event)
+        self.assertIsNotNone(stats['throughput'])
+
+    def test_recording_a_day_again_keeps_its_runs(self):
+        self.back_up()
+        folder = self.record()
+        day_id = self.day(folder)['id']
+        self.record()
+        self.assertEqual(self.day(folder)['id'], day_id)
+        self.assertEqual(len(self.query("SELECT * FROM runs WHERE day_id = ?", day_id)), 2)
+        self.assertEqual(self.day(folder)['covers_to'], self.last_event)
+
+    def test_deleted_days_are_forgotten(self):
+        self.back_up()
+        old = self.record('2026-10-15')
+        shutil.rmtree(old)
+        new = self.record('2026-10-16')
+        self.assertEqual([day['folder'] for day in self.query("SELECT folder FROM days")], [new])
+        self.assertEqual(self.query("SELECT * FROM runs"), [])     # eran del día borrado
+
+    def test_failed_run_is_recorded_but_not_counted(self):
+        self.back_up()
+        with self.assertRaises(RuntimeError):
+            with catalog.Run(self.config, 'incremental', INCREMENTAL_END):
+                raise RuntimeError("se perdió la conexión")
+        failed = self.query("SELECT * FROM runs ORDER BY id DESC LIMIT 1")[0]
+        self.assertEqual(failed['error'], "se perdió la conexión")
+        self.assertEqual((failed['binlog_to'], failed['pos_to']), (None, None))
+
+        folder = self.record()
+        day = self.day(folder)
+        self.assertEqual(failed['id'], self.query("SELECT id FROM runs WHERE day_id = ? ORDER BY id DESC",
+                                                  day['id'])[0]['id'])
+        self.assertEqual((day['binlog_to'], day['pos_to']), INCREMENTAL_END)
+        stats = catalog.summary(self.path)
+        self.assertEqual((stats['runs'], stats['failed']), (2, 1))
+        self.assertEqual(stats['last']['kind'], 'incremental')
+        self.assertNotEqual(stats['last_run'], None)
+
+    def test_catalog_problems_never_stop_the_backup(self):
+        with open(self.path, 'wb') as f:
+            f.write(b"esto no es una base de datos SQLite" * 100)
+        self.back_up()                                  # avisa y sigue
+        self.record()
+        with open(integrity.digests_path(main.backup_paths(self.config)[1]), 'a') as f:
+            f.write("{roto\n")
+        ran = []
+        with catalog.Run(self.config, 'incremental', INCREMENTAL_END) as run:   # no lee el registro de huellas
+            ran.append(True)
+        self.assertEqual(ran, [True])
+        self.assertIsNone(run.backup_file)
+        with catalog.Run({}, 'full'):                   # sin BACKUP_DIR
+            ran.append(True)
+        self.assertEqual(ran, [True, True])
+
+    def test_version_1_catalog_is_migrated(self):
+        old_schema = catalog._SCHEMA.replace("    error         TEXT,                     -- NULL si terminó bien\n", "")
+        self.assertNotEqual(old_schema, catalog._SCHEMA)
+        conn = sqlite3.connect(self.path)
+        conn.executescript(old_schema)
+        conn.execute("INSERT INTO runs (kind, backup_file, started, finished, duration) "
+                     "VALUES ('full', 'backup.sql', '2026-10-01 00:00:00', '2026-10-01 00:10:00', 600)")
+        conn.execute("PRAGMA user_version = 1")
+        conn.commit()
+        conn.close()
+        self.back_up()
+        stats = catalog.summary(self.path)
+        self.assertEqual((stats['runs'], stats['failed']), (3, 0))
+        self.assertEqual(self.query("PRAGMA user_version")[0]['user_version'], catalog.SCHEMA_VERSION)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Códec y nivel efectivos de compression.py.
+
+Un COMPRESSION_LEVEL pensado para zstd (hasta 22) no debe romper gzip, ni
+cuando se pide gzip con un nivel fuera de rango ni cuando zstd cae a gzip
+por no estar instalado zstandard.
+
+Uso: python -m unittest discover tests   (o python -m pytest tests)
+"""
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import compression  # noqa: E402
+
+
+class LevelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+        self.zstandard = compression.zstandard
+        self.addCleanup(setattr, compression, 'zstandard', self.zstandard)
+
+    def write(self, config):
+        path = os.path.join(self.folder, compression.backup_file_name('backup.sql', config))
+        with compression.open_writer(path, config) as f:
+            f.write(b"SELECT 1;\n" * 1000)
+        with compression.open_reader(path) as f:
+            self.assertEqual(f.read(), b"SELECT 1;\n" * 1000)
+        return path
+
+    def test_levels(self):
+        self.assertIsNone(compression.resolve_level({'COMPRESSION_LEVEL': 5}))
+        self.assertEqual(compression.resolve_level({'COMPRESSION': 'gzip'}), compression.DEFAULT_LEVELS['gzip'])
+        self.assertEqual(compression.resolve_level({'COMPRESSION': 'gzip', 'COMPRESSION_LEVEL': 4}), 4)
+        self.assertEqual(compression.resolve_level({'COMPRESSION': 'gzip', 'COMPRESSION_LEVEL': 19}), 9)
+        if self.zstandard is not None:
+            self.assertEqual(compression.resolve_level({'COMPRESSION': 'zstd', 'COMPRESSION_LEVEL': 30}), 22)
+
+    def test_gzip_level_out_of_range(self):
+        path = self.write({'COMPRESSION': 'gzip', 'COMPRESSION_LEVEL': 19})
+        self.assertEqual(compression.detect_codec(path), 'gzip')
+
+    def test_zstd_level_when_falling_back_to_gzip(self):
+        compression.zstandard = None
+        config = {'COMPRESSION': 'zstd', 'COMPRESSION_LEVEL': 19}
+        self.assertEqual(compression.resolve_codec(config), 'gzip')
+        self.assertEqual(compression.resolve_level(config), compression.DEFAULT_LEVELS['gzip'])
+        path = self.write(config)
+        self.assertTrue(path.endswith('.gz'))
+        with gzip.open(path) as f:
+            self.assertEqual(f.read(10), b"SELECT 1;\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Autenticación de la API local de daemon.py.
+
+Sin DAEMON_TOKEN se genera uno al primer arranque y se reutiliza después; los
+POST sin él, con cabecera Origin (un navegador) o sin Content-Type JSON se
+rechazan antes de tocar ningún destino.
+
+Uso: python -m unittest discover tests   (o python -m pytest tests)
+"""
+import http.client
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import daemon  # noqa: E402
+
+TOKEN = 'secreto'
+
+
+class TokenTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+        self.config_path = os.path.join(self.folder, daemon.CONFIG_FILE)
+
+    def test_generated_once_and_kept(self):
+        token = daemon.load_token({}, self.config_path)
+        self.assertGreaterEqual(len(token), 32)
+        path = os.path.join(self.folder, daemon.TOKEN_FILE)
+        if os.name == 'posix':
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+        self.assertEqual(daemon.load_token({}, self.config_path), token)
+
+    def test_setting_wins(self):
+        self.assertEqual(daemon.load_token({'DAEMON_TOKEN': TOKEN}, self.config_path), TOKEN)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, daemon.TOKEN_FILE)))
+
+
+class ApiTest(unittest.TestCase):
+
+    settings = {'DAEMON_TOKEN': TOKEN}
+
+    def setUp(self):
+        server = daemon.serve(daemon.BackupService(dict(self.settings), []), port=0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.port = server.server_address[1]
+
+    def post(self, path, **headers):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+        self.addCleanup(conn.close)
+        conn.request('POST', path, body=b'{}', headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    def test_valid_request_reaches_the_targets(self):
+        status, body = self.post('/stop?target=nada', **{'Authorization': f'Bearer {TOKEN}',
+                                                         'Content-Type': 'application/json'})
+        self.assertEqual(status, 404)
+        self.assertIn("Destino desconocido", body['error'])
+
+    def test_rejected(self):
+        valid = {'Authorization': f'Bearer {TOKEN}', 'Content-Type': 'application/json'}
+        for code, headers in ((401, dict(valid, Authorization='Bearer otro')),
+                              (401, {'Content-Type': 'application/json'}),
+                              (403, dict(valid, Origin='http://example.com')),
+                              (403, dict(valid, Origin='null')),
+                              (415, dict(valid, **{'Content-Type': 'text/plain'})),
+                              (415, {'Authorization': f'Bearer {TOKEN}'})):
+            with self.subTest(headers=headers):
+                self.assertEqual(self.post('/nightly', **headers)[0], code)
+
+
+class NoTokenApiTest(ApiTest):
+    """Un servicio sin token no acepta ningún POST"""
+
+    settings = {}
+
+    def test_valid_request_reaches_the_targets(self):
+        status, _ = self.post('/stop?target=nada', **{'Content-Type': 'application/json'})
+        self.assertEqual(status, 401)
+
+
+if __name__ == "__main__":
+    unittest.main()
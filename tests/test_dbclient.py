@@ -0,0 +1,114 @@
+"""
+Conexión persistente de dbclient.CliConnection contra el mysql falso del banco.
+
+Un error de SQL se devuelve como QueryError y la conexión sigue sirviendo
+(el proceso mysql va con --force); una conexión cortada da ConnectionLost y
+no se vuelve a usar.
+
+Uso: python -m unittest discover tests   (o python -m pytest tests)
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'bench'))
+import dbclient  # noqa: E402
+
+try:
+    import main
+    import run_bench    # solo POSIX
+except ImportError:
+    main = run_bench = None
+
+CONFIG = {'HOST': 'localhost', 'PORT': 3306, 'USER': 'root', 'PASSWORD': '', 'DB_CLIENT': 'cli'}
+
+
+class FakeServerTest(unittest.TestCase):
+    """Herramientas falsas en HELEN_MYSQL_BIN_DIR y su estado en HELEN_FAKE_STATE"""
+
+    state = {}
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+        self.state_file = os.path.join(self.folder, 'state.json')
+        self.query_log = os.path.join(self.folder, 'queries.log')
+        self.write_state()
+        for name, value in ((main.MYSQL_BIN_ENV, run_bench.install_tools(self.folder)),
+                            (run_bench.synth.STATE_ENV, self.state_file)):
+            self.addCleanup(self._restore_env, name, os.environ.get(name))
+            os.environ[name] = value
+        self.addCleanup(setattr, main, '_tools', main._tools)
+        main._tools = None
+
+    def write_state(self, **changes):
+        """Estado del servidor falso: el de la clase con changes; mysql apunta lo que recibe en query_log"""
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.state, query_log=self.query_log, **changes), f)
+
+    @staticmethod
+    def _restore_env(name, value):
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+    def connect(self):
+        conn = dbclient.CliConnection(CONFIG)
+        self.addCleanup(conn.close)
+        return conn
+
+
+@unittest.skipIf(run_bench is None, "el banco de pruebas solo funciona en POSIX")
+class CliConnectionTest(FakeServerTest):
+
+    state = {'unknown_variables': ['information_schema_stats_expiry'], 'lost_on': 'CORTAR'}
+
+    def test_rows(self):
+        conn = self.connect()
+        self.assertEqual(conn.query("SELECT 'hola'"), [('hola',)])
+        self.assertEqual(conn.query("SET SESSION wait_timeout = 60"), [])
+        self.assertEqual(conn.query("SELECT %s", ('adiós',)), [('adiós',)])
+
+    def test_values_come_back_unchanged(self):
+        conn = self.connect()
+        for value in ('a\tb', 'línea\notra\n', 'barra \\ y \\n', 'NULL', '<field name="x">&amp;</field>',
+                      "comilla ' y \"doble\"", ''):
+            with self.subTest(value=value):
+                self.assertEqual(conn.query("SELECT %s", (value,)), [(value,)])
+        self.assertEqual(conn.query("SELECT NULL"), [(None,)])
+
+    def test_sql_error_keeps_the_connection(self):
+        conn = self.connect()
+        for _ in range(3):
+            with self.assertRaises(dbclient.QueryError) as raised:
+                conn.query("SET SESSION information_schema_stats_expiry = 0")
+            self.assertNotIsInstance(raised.exception, dbclient.ConnectionLost)
+            self.assertIn("ERROR 1193", str(raised.exception))
+            self.assertTrue(conn.alive())
+            self.assertEqual(conn.query("SELECT 'sigue'"), [('sigue',)])
+
+    def test_lost_connection_is_not_reused(self):
+        conn = self.connect()
+        self.assertEqual(conn.query("SELECT 'antes'"), [('antes',)])
+        with self.assertRaises(dbclient.ConnectionLost):
+            conn.query("SELECT 'CORTAR'")
+        self.assertFalse(conn.alive())
+        with self.assertRaises(dbclient.ConnectionLost):
+            conn.query("SELECT 'despues'")
+
+    def test_pool_keeps_serving_after_errors(self):
+        pool = dbclient.ConnectionPool(CONFIG, size=1)
+        self.addCleanup(pool.close)
+        with self.assertRaises(dbclient.QueryError):
+            pool.query("SELECT @@information_schema_stats_expiry")
+        self.assertEqual(pool.query("SELECT 'otra'"), [('otra',)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+Ida y vuelta de extract.py: índice de secciones y extracción de tablas.
+
+Sobre un volcado sintético (cabecera, tablas, vista, pie y binlog del día) se
+extraen tablas de un backup.sql sin comprimir, uno gzip, un día en partes
+gzip, un día deduplicado y un día dividido por tablas, y se comparan los
+bytes con una extracción ingenua línea a línea del volcado original.
+
+Uso: python -m unittest discover tests   (o python -m pytest tests)
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chunkstore  # noqa: E402
+import compression  # noqa: E402
+import extract  # noqa: E402
+from parallel_dump import TABLE_MARKER, FOOTER_MARKER  # noqa: E402
+from restore import INFO_FILE_NAME  # noqa: E402
+
+try:
+    import process      # necesita schedule
+except ImportError:
+    process = None
+
+TABLES = ['clientes', 'pedidos', 'lineas']
+MAX_PART_BYTES = 48 * 1024
+
+
+def make_dump(rows=1500, fake_table=True):
+    """
+    Volcado al estilo de mysqldump seguido del texto de mysqlbinlog del día.
+    Con fake_table, el binlog lleva una línea con el marcador de tabla que el
+    índice no debe tomar por una tabla.
+    """
+    out = [b"-- MySQL dump 10.13  Distrib 8.0.36, for Linux (x86_64)\n",
+           b"--\n-- Host: localhost    Database: prueba\n",
+           b"-- ------------------------------------------------------\n",
+           b"/*!40101 SET @OLD_CHARACTER_SET_CLIENT=@@CHARACTER_SET_CLIENT */;\n",
+           b"/*!40103 SET TIME_ZONE='+00:00' */;\n\n"]
+    for t, name in enumerate(TABLES):
+        table = name.encode()
+        out += [b"--\n", TABLE_MARKER + table + b"`\n", b"--\n\n",
+                b"DROP TABLE IF EXISTS `" + table + b"`;\n",
+                b"CREATE TABLE `" + table + b"` (\n  `id` int NOT NULL,\n  `nota` text\n);\n\n",
+                b"--\n-- Dumping data for table `" + table + b"`\n--\n\n"]
+        for start in range(0, rows * (t + 1), 100):
+            values = b",".join(b"(%d,'fila %d de %s; -- sigue\\n')" % (i, i, table)
+                               for i in range(start, start + 100))
+            out.append(b"INSERT INTO `" + table + b"` VALUES " + values + b";\n")
+        out.append(b"\n")
+    out += [b"--\n-- Final view structure for view `resumen`\n--\n\n",
+            b"/*!50001 CREATE VIEW `resumen` AS SELECT 1 AS `uno` */;\n\n",
+            FOOTER_MARKER + b"\n",
+            b"/*!40101 SET CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;\n\n",
+            b"-- Dump completed on 2026-10-16 23:00:00\n",
+            b"/*!50530 SET @@SESSION.PSEUDO_SLAVE_MODE=1*/;\n",
+            b"DELIMITER /*!*/;\n# at 4\n"]
+    if fake_table:
+        out.append(TABLE_MARKER + b"no_es_tabla`\n")
+    out.append(b"INSERT INTO clientes VALUES (99999,'binlog')/*!*/;\n")
+    return b"".join(out)
+
+
+def naive_extract(dump, names):
+    """Cabecera + secciones de las tablas pedidas + pie, separando el volcado línea a línea"""
+    sections, kind, name, lines = [], 'header', None, []
+    for line in dump.splitlines(keepends=True):
+        found = next((k for marker, k in extract._KINDS if line.startswith(marker)), None)
+        if found == 'tail':
+            break
+        if found:
+            sections.append((kind, name, b"".join(lines)))
+            kind, lines = found, []
+            name = line[len(TABLE_MARKER):].rstrip(b"\r\n").rstrip(b"`").decode() if found == 'table' else None
+        lines.append(line)
+    sections.append((kind, name, b"".join(lines)))
+    header = b"".join(data for k, _, data in sections if k == 'header')
+    footer = next(data for k, _, data in sections if k == 'footer')
+    tables = b"".join(data for n in names for k, table, data in sections if k == 'table' and table == n)
+    return header + tables + footer
+
+
+def extracted(target, names):
+    chunks = []
+    written = extract.extract_tables(target, names, chunks.append)
+    data = b"".join(chunks)
+    assert written == len(data)
+    return data
+
+
+class ExtractTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.dump = make_dump()
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, True)
+
+    def write_backup(self, codec=None):
+        path = os.path.join(self.folder, 'backup.sql' + ('.gz' if codec else ''))
+        with compression.open_writer(path, {'COMPRESSION': codec}) as f:
+            f.write(self.dump)
+        return path
+
+    def check_round_trip(self, target):
+        for names in (['pedidos'], ['lineas', 'clientes'], TABLES):
+            with self.subTest(tables=names):
+                self.assertEqual(extracted(target, names), naive_extract(self.dump, names))
+        sizes = extract.list_tables(target)
+        self.assertEqual(sorted(sizes), sorted(TABLES))
+        self.assertTrue(all(size > 0 for size in sizes.values()))
+        with self.assertRaises(KeyError):
+            extracted(target, ['no_es_tabla'])
+
+    def test_reference_sections(self):
+        # La referencia corta donde debe: cabecera, una sola tabla y pie, sin nada del binlog
+        data = naive_extract(self.dump, ['pedidos'])
+        self.assertTrue(data.startswith(b"-- MySQL dump"))
+        self.assertIn(b"CREATE TABLE `pedidos`", data)
+        self.assertNotIn(b"CREATE TABLE `clientes`", data)
+        self.assertNotIn(b"VIEW", data)
+        self.assertTrue(data.endswith(b"CHARACTER_SET_CLIENT=@OLD_CHARACTER_SET_CLIENT */;\n\n"))
+
+    def test_plain_file(self):
+        self.check_round_trip(self.write_backup())
+
+    def test_gzip_file(self):
+        self.check_round_trip(self.write_backup('gzip'))
+
+    def test_index_is_cached_until_the_backup_changes(self):
+        path = self.write_backup()
+        extracted(path, ['pedidos'])
+        self.assertTrue(os.path.exists(path + extract.INDEX_SUFFIX))
+        original = extract.build_index
+        calls = []
+        extract.build_index = lambda day: calls.append(day) or original(day)
+        self.addCleanup(setattr, extract, 'build_index', original)
+        extracted(path, ['clientes'])
+        self.assertEqual(calls, [])
+        with open(path, 'ab') as f:
+            f.write(b"COMMIT/*!*/;\n")
+        self.assertEqual(extracted(path, ['clientes']), naive_extract(self.dump, ['clientes']))
+        self.assertEqual(len(calls), 1)
+
+    def test_dedup_day(self):
+        source = self.write_backup()
+        day = os.path.join(self.folder, 'dia')
+        store = os.path.join(self.folder, chunkstore.STORE_DIR_NAME)
+        os.makedirs(day)
+        stats = chunkstore.store_backup(source, store, day, {'DEDUP_CHUNK_SIZE': 16 * 1024})
+        with open(os.path.join(day, INFO_FILE_NAME), 'w', encoding='utf-8') as f:
+            json.dump({"files": [], "storage": "dedup", "chunk_store": store, "dedup": stats}, f)
+        self.check_round_trip(day)
+
+    def split_day(self, layout, codec):
+        """
+        Día dividido por el proceso nocturno, con su backup_info.json.
+        La división por tablas sigue los marcadores hasta el final del archivo
+        (mysqlbinlog solo escribe comentarios con '#'), así que ahí va el volcado sin la tabla falsa.
+        """
+        if layout == 'table':
+            self.dump = make_dump(fake_table=False)
+        config = {'BACKUP_DIR': self.folder, 'DAILY_BACKUP_DIR': os.path.join(self.folder, 'daily'),
+                  'COMPRESSION': codec, 'SPLIT_LAYOUT': layout, 'SPLIT_MODE': 'stream',
+                  'MAX_FILE_SIZE_GB': MAX_PART_BYTES / 1024**3}
+        nightly = process.NightlyProcessor(config)
+        day = os.path.join(self.folder, 'daily', 'dia')
+        os.makedirs(day)
+        files, offsets, digests = nightly._split_backup_file(self.write_backup(codec), day)
+        self.assertGreater(len(files), 3)
+        nightly._create_info_file(day, files, datetime(2026, 10, 16), part_offsets=offsets, digests=digests)
+        return day
+
+    @unittest.skipIf(process is None, "process.py necesita schedule")
+    def test_gzip_parts(self):
+        self.check_round_trip(self.split_day('size', 'gzip'))
+
+    @unittest.skipIf(process is None, "process.py necesita schedule")
+    def test_table_layout(self):
+        day = self.split_day('table', None)
+        index = extract.load_index(extract._Day(day))
+        self.assertIsNotNone(index['footer'])
+        self.check_round_trip(day)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Volcado completo paralelo contra las herramientas falsas del banco, con el cliente mysql.
+
+Un servidor sin information_schema_stats_expiry (MySQL 5.7, MariaDB) no debe
+recibir el SET de esa variable: se pregunta antes con SHOW VARIABLES. Vistas
+y rutinas se vuelcan con el bloqueo global tomado.
+
+Uso: python -m unittest discover tests   (o python -m pytest tests)
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from test_dbclient import CONFIG, FakeServerTest, dbclient, main, run_bench  # noqa: E402
+
+VARIABLE = 'information_schema_stats_expiry'
+
+
+@unittest.skipIf(run_bench is None, "el banco de pruebas solo funciona en POSIX")
+class ParallelDumpTest(FakeServerTest):
+
+    state = {'db': 'prueba', 'tables': 3, 'dump_mb': 0.5}
+
+    def full_backup(self):
+        self.addCleanup(dbclient.close_all)
+        config = dict(CONFIG, DB_NAME='prueba', BACKUP_DIR=os.path.join(self.folder, 'backup'),
+                      DUMP_THREADS=2, RESUME_DUMP=True)
+        os.makedirs(config['BACKUP_DIR'])
+        backup_file = main.backup_paths(config)[0]
+        file_, pos = main.full_backup(backup_file, config)
+        self.assertTrue(file_.startswith('binlog.'))
+        with open(backup_file, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data.count(b"-- Table structure for table `"), 3)
+        with open(self.query_log, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_server_without_stats_expiry(self):
+        self.write_state(unknown_variables=[VARIABLE])
+        queries = self.full_backup()
+        self.assertIn(f"SHOW VARIABLES LIKE '{VARIABLE}'", queries)
+        self.assertNotIn(f"SET SESSION {VARIABLE}", queries)
+
+    def test_server_with_stats_expiry(self):
+        self.assertIn(f"SET SESSION {VARIABLE} = 0", self.full_backup())
+
+    def test_views_and_routines_inside_the_lock(self):
+        queries = self.full_backup().splitlines()
+        routines = [i for i, line in enumerate(queries) if line.startswith('mysqldump') and ' --routines' in line]
+        self.assertEqual(len(routines), 1)
+        self.assertIn('--single-transaction', queries[routines[0]])
+        self.assertLess(queries.index("FLUSH TABLES WITH READ LOCK"), routines[0])
+        self.assertLess(routines[0], queries.index("UNLOCK TABLES"))
+
+
+if __name__ == "__main__":
+    unittest.main()
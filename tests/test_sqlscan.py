@@ -0,0 +1,214 @@
+"""
+Fines de sentencia de sqlscan.Scanner y cortes de rolling.StatementSplitter.
+
+Se comparan con una referencia que recorre el SQL byte a byte: mismos cortes
+con el texto entero de una vez (ruta mmap del proceso nocturno) y escrito en
+dos trozos partidos en cada desplazamiento posible, con buffers pequeños para
+que las cadenas, comentarios y bloques DELIMITER crucen de un tramo a otro.
+
+Uso: python -m unittest discover tests   (o python -m pytest tests)
+"""
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import rolling  # noqa: E402
+import sqlscan  # noqa: E402
+
+_WHITESPACE = b' \t\n\r\x0b\x0c'
+_DELIMITER_RE = re.compile(rb'(?i:delimiter)[ \t]+(\S+)[^\n]*\n')
+
+CASES = {
+    'plano': b"CREATE TABLE t (id int);\nINSERT INTO t VALUES (1),(2);\nSELECT 1;\n",
+    'cadenas': b"INSERT INTO t VALUES ('a;\nb;\n', \"x;\ny\");\nSELECT 'fin;';\n",
+    'escapes': b"INSERT INTO t VALUES ('it\\'s;\n', \"q\\\";\n\", 'barra\\\\');\nSELECT '\\\n;';\nSELECT 2;\n",
+    'backticks': b"CREATE TABLE `a;\nb` (`c;` int);\nSELECT 1;\n",
+    'comentarios': (b"/*!40101 SET @OLD_CHARACTER_SET_CLIENT=@@CHARACTER_SET_CLIENT */;\n"
+                    b"/* bloque;\n sigue; */ SELECT 1;\n"
+                    b"-- comentario;\n# otro;\nSELECT 2; -- despues\nSELECT 3;\n--x;\n"),
+    'delimiter': (b"DELIMITER ;;\nCREATE TRIGGER trg BEFORE INSERT ON t FOR EACH ROW BEGIN\n"
+                  b"  SET NEW.a = ';';\n  SET NEW.b = 1;\nEND ;;\ndelimiter ;\nSELECT 1;\n"
+                  b"DELIMITER $$\nCREATE PROCEDURE p() BEGIN SELECT 1; END$$\nDELIMITER ;\n"),
+    'binlog': (b"# at 4\n#231114 22:13:20 server id 1  end_log_pos 120\nBEGIN\n/*!*/;\n"
+               b"BINLOG '\nAbCd;\nEfGh\n'/*!*/;\nCOMMIT/*!*/;\n"),
+    'crlf': b"SELECT 1;\r\nSELECT ';\r\n';\r\nSELECT 2;  \r\n",
+    'sin_salto_final': b"SELECT 1;\nSELECT 2;",
+}
+
+_TOKENS = [b"SELECT 1", b";", b"\n", b" ", b"'", b'"', b"`", b"\\", b"/*", b"*/", b"--", b"-- ", b"#",
+           b"x", b";;", b"DELIMITER ;;\n", b"DELIMITER ;\n", b"\r\n", b"/*!40101 */"]
+
+
+def reference_cuts(data):
+    """Posiciones tras cada fin de sentencia, recorriendo byte a byte"""
+    cuts = []
+    delimiter = b';'
+    state = None                # comilla o '/*' abiertos
+    at_line_start = True
+    line_comment = False
+    i = 0
+    while i < len(data):
+        c = data[i:i + 1]
+        if state in (b"'", b'"'):
+            if c == b'\\':
+                i += 2
+                continue
+            if c == state:
+                state = None
+            i += 1
+            continue
+        if state == b'`':
+            if c == b'`':
+                state = None
+            i += 1
+            continue
+        if state == b'/*':
+            if data[i:i + 2] == b'*/':
+                state = None
+                i += 2
+            else:
+                i += 1
+            continue
+
+        if at_line_start:
+            command = _DELIMITER_RE.match(data, i)
+            if command:
+                delimiter = command.group(1)
+                i = command.end()
+                cuts.append(i)
+                continue
+        at_line_start = False
+        if c == b'\n':
+            line = data[data.rfind(b'\n', 0, i) + 1:i]
+            if not line_comment and line.rstrip(b' \t\r\x0b\x0c').endswith(delimiter):
+                cuts.append(i + 1)
+            at_line_start = True
+            line_comment = False
+            i += 1
+        elif c == b'#' or (data[i:i + 2] == b'--' and data[i + 2:i + 3] and data[i + 2] in _WHITESPACE):
+            end = data.find(b'\n', i)
+            i = len(data) if end < 0 else end
+            line_comment = True
+        elif data[i:i + 2] == b'/*':
+            state = b'/*'
+            i += 2
+        elif c in (b"'", b'"', b'`'):
+            state = c
+            i += 1
+        else:
+            i += 1
+    return cuts
+
+
+def reference_parts(data, max_size):
+    """Cortes de StatementSplitter: el primer fin de sentencia con la parte en max_size bytes o más"""
+    start, cuts = 0, []
+    for cut in reference_cuts(data):
+        if cut - start >= max_size:
+            cuts.append(cut)
+            start = cut
+    return cuts
+
+
+def scanner_cuts(data):
+    """Todos los fines de sentencia con un solo Scanner sobre el texto entero"""
+    scanner, cuts, pos = sqlscan.Scanner(), [], 0
+    while True:
+        cut = scanner.boundary(data, pos, len(data), pos)
+        if cut < 0:
+            return cuts
+        cuts.append(cut)
+        pos = cut
+
+
+class _Target:
+    """Destino de StatementSplitter que apunta dónde corta"""
+
+    def __init__(self):
+        self.size = 0
+        self.total = 0
+        self.cuts = []
+        self.data = bytearray()
+
+    def write(self, data):
+        self.size += len(data)
+        self.total += len(data)
+        self.data += data
+
+    def cut(self):
+        self.cuts.append(self.total)
+        self.size = 0
+
+
+def split(chunks, max_size, buffer_size):
+    target = _Target()
+    splitter = rolling.StatementSplitter(target, max_size, buffer_size)
+    for chunk in chunks:
+        splitter.write(chunk)
+    splitter.close()
+    return target
+
+
+def random_sql(seed, length=60):
+    rng = random.Random(seed)
+    return b''.join(rng.choice(_TOKENS) for _ in range(length)) + b";\n"
+
+
+class ScannerTest(unittest.TestCase):
+
+    def test_cases_match_reference(self):
+        for name, data in CASES.items():
+            with self.subTest(case=name):
+                self.assertEqual(scanner_cuts(data), reference_cuts(data))
+
+    def test_expected_cuts(self):
+        # Lo que la referencia debe dar (y no solo coincidir con el escáner)
+        data = CASES['cadenas']
+        self.assertEqual(reference_cuts(data), [data.index(b"SELECT"), len(data)])
+        data = CASES['delimiter']
+        self.assertNotIn(data.index(b"  SET NEW.b"), reference_cuts(data))
+        self.assertIn(data.index(b"delimiter ;"), reference_cuts(data))
+        data = CASES['comentarios']
+        self.assertNotIn(data.index(b"SELECT 3"), reference_cuts(data))
+
+    def test_random_sql_matches_reference(self):
+        for seed in range(300):
+            data = random_sql(seed)
+            with self.subTest(seed=seed):
+                self.assertEqual(scanner_cuts(data), reference_cuts(data))
+
+    def test_after_skips_earlier_ends(self):
+        data = CASES['plano'] * 3
+        cuts = reference_cuts(data)
+        for after in range(len(data)):
+            expected = next((cut for cut in cuts if cut - 1 >= after), -1)
+            with self.subTest(after=after):
+                self.assertEqual(sqlscan.Scanner().boundary(data, 0, len(data), after), expected)
+
+
+class StatementSplitterTest(unittest.TestCase):
+
+    def test_every_split_offset(self):
+        for name, data in CASES.items():
+            for max_size in (1, 20, 70):
+                expected = reference_parts(data, max_size)
+                for buffer_size in (8, 32):
+                    for offset in range(len(data) + 1):
+                        with self.subTest(case=name, max_size=max_size, buffer_size=buffer_size, offset=offset):
+                            target = split([data[:offset], data[offset:]], max_size, buffer_size)
+                            self.assertEqual(target.cuts, expected)
+                            self.assertEqual(bytes(target.data), data)
+
+    def test_random_sql_in_small_writes(self):
+        for seed in range(100):
+            data = random_sql(seed, 120)
+            chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+            with self.subTest(seed=seed):
+                self.assertEqual(split(chunks, 16, 16).cuts, reference_parts(data, 16))
+
+
+if __name__ == "__main__":
+    unittest.main()
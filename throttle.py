@@ -0,0 +1,195 @@
+"""
+Ritmo adaptativo de los volcados según la carga del servidor.
+
+Con THROTTLE activo un hilo consulta cada pocos segundos la carga de MySQL
+(Threads_running, lectura de filas de InnoDB y retraso de réplica) y ajusta el
+ritmo al que se leen las salidas de mysqldump y mysqlbinlog. Al leer más
+despacio la tubería se llena y la herramienta, y con ella el servidor, va más
+lenta: en reposo se vuelca a THROTTLE_MAX_MBPS (o sin límite) y con el
+servidor saturado a THROTTLE_MIN_MBPS.
+
+Todas las claves se leen de la configuración del destino, así que cada destino
+del servicio puede tener sus propios límites.
+"""
+import sys
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+import dbclient
+
+# —————— CONFIGURACIÓN DEL THROTTLE ——————
+THROTTLE_MAX_MBPS      = 0          # ← ritmo con el servidor en reposo (0 = sin límite)
+THROTTLE_MIN_MBPS      = 4          # ← ritmo con el servidor saturado
+THROTTLE_PROBE_SECONDS = 5          # ← cada cuánto se mide la carga
+THREADS_RUNNING_HIGH   = 32         # ← Threads_running (sin contar los nuestros) que se considera saturación
+ROWS_READ_HIGH         = 2000000    # ← filas/s leídas por InnoDB (incluidas las del volcado) a partir de las que se frena
+REPLICA_LAG_HIGH       = 60         # ← segundos de retraso de réplica que se consideran saturación
+IDLE_LOAD              = 0.25       # ← por debajo de esta carga relativa se va a la velocidad máxima
+
+NICE_LEVEL   = 10
+IONICE_ARGS  = ['-c', '2', '-n', '7']   # ← best-effort con la prioridad más baja (idle podría no avanzar nunca)
+
+STATUS_SQL = "SHOW GLOBAL STATUS WHERE Variable_name IN ('Threads_running', 'Innodb_rows_read')"
+REPLICA_LAG_SQL = (
+    "SELECT COALESCE(MAX(TIMESTAMPDIFF(SECOND, APPLYING_TRANSACTION_ORIGINAL_COMMIT_TIMESTAMP, NOW(6))), 0) "
+    "FROM performance_schema.replication_applier_status_by_worker WHERE APPLYING_TRANSACTION <> ''"
+)
+# ——————————————————————————
+
+
+class Throttle:
+    """Limitador de ritmo compartido por los lectores de un volcado, ajustado por un sondeo de carga"""
+
+    def __init__(self, config, own_threads=1):
+        mb = 1024 * 1024
+        self.config = config
+        self.own_threads = own_threads
+        self.max_rate = float(config.get('THROTTLE_MAX_MBPS', THROTTLE_MAX_MBPS)) * mb or None
+        self.min_rate = float(config.get('THROTTLE_MIN_MBPS', THROTTLE_MIN_MBPS)) * mb
+        self.interval = float(config.get('THROTTLE_PROBE_SECONDS', THROTTLE_PROBE_SECONDS))
+        self.limits = {
+            'threads': float(config.get('THROTTLE_THREADS_RUNNING', THREADS_RUNNING_HIGH)),
+            'rows_read': float(config.get('THROTTLE_ROWS_READ', ROWS_READ_HIGH)),
+            'lag': float(config.get('THROTTLE_REPLICA_LAG', REPLICA_LAG_HIGH))
+        }
+
+        self.rate = self.max_rate           # bytes/s; None = sin límite
+        self.load = 0.0
+        self.sample = {}
+        self.observed = None                # ritmo real medido mientras no había límite
+        self.lag_supported = True
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+        self.bytes = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._probe_loop, daemon=True)
+
+    # ——— Ritmo ———
+
+    def pace(self, nbytes):
+        """Esperar lo necesario para que nbytes más no superen el ritmo actual"""
+        with self.lock:
+            self.bytes += nbytes
+            if self.rate is None:
+                return
+            now = time.monotonic()
+            self.next_slot = max(self.next_slot, now) + nbytes / self.rate
+            delay = self.next_slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def paced(self, write):
+        """Envolver una función write para que respete el ritmo"""
+        def paced_write(data):
+            self.pace(len(data))
+            return write(data)
+        return paced_write
+
+    # ——— Sondeo de carga ———
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join(timeout=self.interval + 5)
+
+    def _probe(self):
+        """Muestra de carga: {'threads', 'rows_read' (acumulado), 'lag', 'time'}"""
+        status = {name.lower(): int(value) for name, value in dbclient.query(self.config, STATUS_SQL)}
+        sample = {
+            'threads': max(0, status.get('threads_running', 0) - self.own_threads),
+            'rows_read': status.get('innodb_rows_read', 0),
+            'lag': 0,
+            'time': time.monotonic()
+        }
+        if self.lag_supported:
+            try:
+                sample['lag'] = int(float(dbclient.query(self.config, REPLICA_LAG_SQL)[0][0] or 0))
+            except (dbclient.QueryError, IndexError, ValueError):
+                self.lag_supported = False      # MySQL < 8.0 o sin performance_schema
+        return sample
+
+    def _load(self, previous, sample):
+        """Carga relativa: 1.0 = alguno de los indicadores en su límite"""
+        elapsed = max(sample['time'] - previous['time'], 1e-6)
+        rows_rate = max(0, sample['rows_read'] - previous['rows_read']) / elapsed
+        return max(sample['threads'] / self.limits['threads'],
+                   rows_rate / self.limits['rows_read'],
+                   sample['lag'] / self.limits['lag'])
+
+    def _target_rate(self, load):
+        if load <= IDLE_LOAD:
+            return self.max_rate
+        top = self.max_rate or self.observed or self.min_rate * 10
+        if load >= 1:
+            return self.min_rate
+        share = (1 - load) / (1 - IDLE_LOAD)
+        return max(self.min_rate, self.min_rate + (top - self.min_rate) * share)
+
+    def _probe_loop(self):
+        previous = None
+        counted = (time.monotonic(), 0)
+        while not self.stop_event.wait(0 if previous is None else self.interval):
+            try:
+                sample = self._probe()
+            except dbclient.QueryError as e:
+                print(f"⚠️ No se pudo medir la carga del servidor ({e}); se mantiene el ritmo actual")
+                continue
+
+            now = time.monotonic()
+            with self.lock:
+                transferred = self.bytes - counted[1]
+                elapsed = now - counted[0]
+                unlimited = self.rate is None
+                counted = (now, self.bytes)
+            if unlimited and transferred:
+                self.observed = transferred / max(elapsed, 1e-6)
+
+            if previous is not None:
+                self.load = self._load(previous, sample)
+                rate = self._target_rate(self.load)
+                if (rate is None) != (self.rate is None) or (rate and abs(rate - self.rate) > self.rate * 0.2):
+                    speed = "sin límite" if rate is None else f"{rate / 1024**2:.1f} MB/s"
+                    print(f"🐢 Carga del servidor {self.load:.0%} (hilos {sample['threads']}, "
+                          f"réplica {sample['lag']}s): volcado a {speed}")
+                with self.lock:
+                    self.rate = rate
+            previous = sample
+            self.sample = sample
+
+    def get_status(self):
+        return {
+            "load": round(self.load, 3),
+            "rate_mbps": None if self.rate is None else round(self.rate / 1024**2, 2),
+            "threads_running": self.sample.get('threads'),
+            "replica_lag": self.sample.get('lag'),
+            "bytes": self.bytes
+        }
+
+
+@contextmanager
+def session(config, own_threads=1):
+    """Throttle en marcha durante el bloque, o None si THROTTLE no está activo"""
+    if not config.get('THROTTLE', False):
+        yield None
+        return
+    limiter = Throttle(config, own_threads)
+    limiter.start()
+    try:
+        yield limiter
+    finally:
+        limiter.stop()
+
+
+def niced(cmd, config):
+    """Anteponer nice/ionice a un comando si THROTTLE_NICE está activo (solo Linux)"""
+    if not config.get('THROTTLE_NICE', False) or not sys.platform.startswith('linux'):
+        return cmd
+    prefix = []
+    if shutil.which('ionice'):
+        prefix += ['ionice', *IONICE_ARGS]
+    if shutil.which('nice'):
+        prefix += ['nice', '-n', str(config.get('THROTTLE_NICE_LEVEL', NICE_LEVEL))]
+    return prefix + list(cmd)
@@ -10,7 +10,10 @@ from datetime import datetime
 import queue
 import json
 import main  # Importamos nuestro módulo principal
+import catalog
+import dbclient
 from process import create_nightly_processor  # Importar función del procesador nocturno
+from binlog_stream import BinlogStreamer
 from notification import TelegramNotifier   # ← IMPORT
 
 class BackupUI:
@@ -26,10 +29,15 @@ class BackupUI:
         self.password_var = tk.StringVar(value=main.PASSWORD)
         self.db_name_var = tk.StringVar(value=main.DB_NAME)
         self.backup_dir_var = tk.StringVar(value=main.BACKUP_DIR)
+        self.dump_threads_var = tk.StringVar(value=str(main.DUMP_THREADS))
+        self.compression_var = tk.StringVar(value=main.COMPRESSION or "ninguna")
+        self.compression_level_var = tk.StringVar(value=str(main.COMPRESSION_LEVEL or ""))
+        self.skip_unchanged_var = tk.BooleanVar(value=main.SKIP_UNCHANGED)
         
         # Variables para interfaz
         self.interval_hours = tk.StringVar(value="1")  # Cambiar a 1 hora por defecto
         self.interval_minutes = tk.StringVar(value="0")
+        self.streaming_var = tk.BooleanVar(value=main.STREAMING)
         
         # === NUEVAS VARIABLES PARA PROCESADOR NOCTURNO ===
         self.daily_backup_dir_var = tk.StringVar(value=os.path.join(main.BACKUP_DIR, 'daily_backups'))
@@ -37,10 +45,12 @@ class BackupUI:
         self.split_time_hour_var = tk.StringVar(value="00")
         self.split_time_minute_var = tk.StringVar(value="00")
         self.enable_nightly_processor_var = tk.BooleanVar(value=True)
+        self.dedup_var = tk.BooleanVar(value=False)
         
         self.is_running = False
         self.backup_thread = None
         self.backup_in_progress = False  # Añadir esta variable
+        self.binlog_streamer = None      # Streaming continuo de binlog (modo streaming)
         
         # Procesador nocturno
         self.nightly_processor = None
@@ -52,9 +62,8 @@ class BackupUI:
         self.check_log_queue()
         self.load_config()                       # ← ya carga la config
 
-        # ——— Notificar SISTEMA INICIADO ———
-        notifier = TelegramNotifier()
-        notifier.notify_system_start(self.get_db_config())
+        # ——— Notificar SISTEMA INICIADO (en segundo plano: no retrasa el arranque) ———
+        threading.Thread(target=self.notify_system_start, args=(self.get_db_config(),), daemon=True).start()
         # ——————————————————————————————
 
         # Si quedó habilitado el procesador nocturno
@@ -63,6 +72,12 @@ class BackupUI:
             self.add_log(f"🌙 Procesador nocturno habilitado y programado para las {split_time}", "SUCCESS")
             self.start_nightly_processor()
     
+    def notify_system_start(self, config):
+        try:
+            TelegramNotifier().notify_system_start(config)
+        except Exception as e:
+            self.log_queue.put((f"⚠️ No se pudo enviar el aviso de inicio: {e}", "WARNING"))
+    
     def setup_ui(self):
         # Configurar el estilo
         style = ttk.Style()
@@ -95,6 +110,7 @@ class BackupUI:
         notebook.add(stats_tab, text="📈 Estadísticas")
         
         self.create_stats_tab(stats_tab)
+        notebook.bind("<<NotebookTabChanged>>", self.refresh_stats)
         
         # Log inicial
         self.add_log("🚀 Sistema de backup inicializado", "SUCCESS")
@@ -170,6 +186,13 @@ class BackupUI:
         
         ttk.Label(interval_frame, text="minutos", font=("Segoe UI", 10)).pack(side=LEFT)
         
+        ttk.Checkbutton(
+            interval_frame,
+            text="📡 Streaming continuo de binlog",
+            variable=self.streaming_var,
+            bootstyle="info-round-toggle"
+        ).pack(side=LEFT, padx=(30, 0))
+        
         # Fila 2: Botones principales
         button_frame = ttk.Frame(control_frame)
         button_frame.pack(fill=X)
@@ -273,7 +296,8 @@ class BackupUI:
             ("🔌 Puerto:", self.port_var),
             ("👤 Usuario:", self.user_var),
             ("🔒 Contraseña:", self.password_var),
-            ("💾 Base de Datos:", self.db_name_var)
+            ("💾 Base de Datos:", self.db_name_var),
+            ("🧵 Hilos de volcado:", self.dump_threads_var)
         ]
         
         for i, (label_text, var) in enumerate(fields):
@@ -304,6 +328,13 @@ class BackupUI:
                 )
             entry.pack(side=LEFT, padx=(10, 0))
         
+        ttk.Checkbutton(
+            db_frame,
+            text="♻️ Reutilizar tablas sin cambios en el volcado completo",
+            variable=self.skip_unchanged_var,
+            bootstyle="info-round-toggle"
+        ).pack(anchor=W, pady=8)
+        
         # Directorio de backup temporal con botón
         dir_frame = ttk.Frame(db_frame)
         dir_frame.pack(fill=X, pady=8)
@@ -330,6 +361,42 @@ class BackupUI:
             width=5
         ).pack(side=LEFT)
         
+        # Compresión de los backups
+        compression_frame = ttk.Frame(db_frame)
+        compression_frame.pack(fill=X, pady=8)
+        
+        ttk.Label(
+            compression_frame,
+            text="🗜️ Compresión:",
+            font=("Segoe UI", 10, "bold"),
+            width=18
+        ).pack(side=LEFT)
+        
+        ttk.Combobox(
+            compression_frame,
+            textvariable=self.compression_var,
+            values=["ninguna", "gzip", "zstd"],
+            state="readonly",
+            width=10,
+            font=("Segoe UI", 10)
+        ).pack(side=LEFT, padx=(10, 5))
+        
+        ttk.Label(compression_frame, text="Nivel:", font=("Segoe UI", 10)).pack(side=LEFT, padx=(10, 5))
+        
+        ttk.Entry(
+            compression_frame,
+            textvariable=self.compression_level_var,
+            width=5,
+            font=("Segoe UI", 10)
+        ).pack(side=LEFT)
+        
+        ttk.Label(
+            compression_frame,
+            text="(vacío = nivel por defecto)",
+            font=("Segoe UI", 9),
+            foreground="gray"
+        ).pack(side=LEFT, padx=(10, 0))
+        
         # ========== CONFIGURACIÓN DEL PROCESADOR NOCTURNO ==========
         nightly_frame = ttk.LabelFrame(
             scrollable_frame, 
@@ -448,7 +515,25 @@ class BackupUI:
             font=("Segoe UI", 9),
             foreground="gray"
         ).pack(side=LEFT)
-        
+
+        # Repositorio deduplicado
+        dedup_frame = ttk.Frame(nightly_frame)
+        dedup_frame.pack(fill=X, pady=8)
+
+        ttk.Checkbutton(
+            dedup_frame,
+            text="🧩 Deduplicar backups diarios",
+            variable=self.dedup_var,
+            bootstyle="warning-round-toggle"
+        ).pack(side=LEFT)
+
+        ttk.Label(
+            dedup_frame,
+            text="(Solo se guarda lo que cambia de un día a otro)",
+            font=("Segoe UI", 9),
+            foreground="gray"
+        ).pack(side=LEFT, padx=(10, 0))
+
         # Botones del procesador nocturno
         nightly_btn_frame = ttk.Frame(nightly_frame)
         nightly_btn_frame.pack(fill=X, pady=(15, 0))
@@ -518,20 +603,22 @@ class BackupUI:
         cards_frame.pack(fill=X, pady=(0, 20))
         
         # Card 1: Último backup
-        self.create_stat_card(
+        self.last_backup_card = self.create_stat_card(
             cards_frame,
             "🕐 Último Backup",
             "No disponible",
             "primary"
-        ).pack(side=LEFT, fill=X, expand=True, padx=(0, 10))
+        )
+        self.last_backup_card.pack(side=LEFT, fill=X, expand=True, padx=(0, 10))
         
         # Card 2: Total de backups
-        self.create_stat_card(
+        self.total_backups_card = self.create_stat_card(
             cards_frame,
             "📊 Total Backups",
             "0",
             "success"
-        ).pack(side=LEFT, fill=X, expand=True, padx=5)
+        )
+        self.total_backups_card.pack(side=LEFT, fill=X, expand=True, padx=5)
         
         # Card 3: Estado del sistema
         self.create_stat_card(
@@ -541,6 +628,23 @@ class BackupUI:
             "danger"
         ).pack(side=LEFT, fill=X, expand=True, padx=(10, 0))
         
+        # Datos del catálogo de backups (catalog.db)
+        catalog_frame = ttk.LabelFrame(
+            stats_frame,
+            text="🗄️ Catálogo de Backups",
+            bootstyle="primary",
+            padding=20
+        )
+        catalog_frame.pack(fill=X, pady=(0, 20))
+        
+        self.catalog_label = ttk.Label(
+            catalog_frame,
+            text="Sin datos todavía",
+            font=("Segoe UI", 10),
+            justify=LEFT
+        )
+        self.catalog_label.pack(anchor=W)
+        
         # Área de información adicional
         info_frame = ttk.LabelFrame(
             stats_frame,
@@ -581,9 +685,39 @@ class BackupUI:
             bootstyle=bootstyle
         )
         value_label.pack()
+        card.value_label = value_label
         
         return card
     
+    def refresh_stats(self, event=None):
+        """Actualizar la pestaña de estadísticas desde el catálogo de backups"""
+        path = catalog.catalog_path(self.get_db_config())
+        if not os.path.exists(path):
+            return
+        try:
+            stats = catalog.summary(path)
+            months = catalog.storage_by_month(path)
+        except Exception as e:
+            self.add_log(f"⚠️ No se pudo leer el catálogo: {str(e)}", "WARNING")
+            return
+        
+        last = stats['last']
+        if last:
+            kind = "completo" if last['kind'] == 'full' else "incremental"
+            self.last_backup_card.value_label.config(text=f"{last['finished'][:16]} ({kind})")
+        self.total_backups_card.value_label.config(text=str(stats['runs']))
+        
+        lines = [f"📅 Días guardados: {stats['days']} ({stats['disk_bytes'] / 1024**3:.2f} GB en disco)"]
+        if stats['covers_from']:
+            lines.append(f"⏱️ Restaurable desde {stats['covers_from']} hasta {stats['covers_to']}")
+        if stats['throughput']:
+            lines.append(f"🚀 Velocidad media de las copias: {stats['throughput']:.1f} MB/s")
+        if stats['failed']:
+            lines.append(f"⚠️ Ejecuciones fallidas: {stats['failed']}")
+        for month in months[-6:]:
+            lines.append(f"🗓️ {month['month']}: {month['days']} días, {month['disk_bytes'] / 1024**3:.2f} GB")
+        self.catalog_label.config(text="\n".join(lines))
+    
     def update_status(self, status, message):
         """Actualizar el estado visual del sistema"""
         if status == "running":
@@ -623,7 +757,12 @@ class BackupUI:
             'USER': self.user_var.get(),
             'PASSWORD': self.password_var.get(),
             'DB_NAME': self.db_name_var.get(),
-            'BACKUP_DIR': self.backup_dir_var.get()
+            'BACKUP_DIR': self.backup_dir_var.get(),
+            'DUMP_THREADS': int(self.dump_threads_var.get()) if self.dump_threads_var.get().isdigit() else 1,
+            'COMPRESSION': self.compression_var.get() if self.compression_var.get() in ('gzip', 'zstd') else None,
+            'COMPRESSION_LEVEL': int(self.compression_level_var.get()) if self.compression_level_var.get().isdigit() else None,
+            'STREAMING': self.streaming_var.get(),
+            'SKIP_UNCHANGED': self.skip_unchanged_var.get()
         }
     
     def test_connection(self):
@@ -637,32 +776,19 @@ class BackupUI:
         
         def test_in_thread():
             try:
-                import subprocess
-                mysql_cmd = os.path.join(main.MYSQL_BIN_DIR, 'mysql.exe')
-                cmd = [
-                    mysql_cmd,
-                    "-h", config['HOST'], "-P", str(config['PORT']),
-                    "-u", config['USER']
-                ]
-                
-                if config['PASSWORD']:
-                    cmd.append(f"-p{config['PASSWORD']}")
-                
-                cmd.extend(["-e", "SELECT 'Conexión exitosa' as test"])
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-                
-                if result.returncode == 0:
-                    self.log_queue.put(("✅ Conexión exitosa a la base de datos", "SUCCESS"))
-                    messagebox.showinfo("Éxito", "¡Conexión exitosa a la base de datos!")
-                else:
-                    error_msg = result.stderr.strip() if result.stderr else "Error desconocido"
-                    self.log_queue.put((f"❌ Error de conexión: {error_msg}", "ERROR"))
-                    messagebox.showerror("Error", f"Error de conexión:\n{error_msg}")
-                    
-            except subprocess.TimeoutExpired:
-                self.log_queue.put(("⏰ Timeout en la conexión", "ERROR"))
-                messagebox.showerror("Error", "Timeout: La conexión tardó demasiado")
+                # Conexión nueva, fuera del pool, para probar exactamente los datos del formulario
+                conn = dbclient.connect(config)
+                try:
+                    conn.query("SELECT 'Conexión exitosa' AS test")
+                finally:
+                    conn.close()
+                self.log_queue.put(("✅ Conexión exitosa a la base de datos", "SUCCESS"))
+                messagebox.showinfo("Éxito", "¡Conexión exitosa a la base de datos!")
+
+            except dbclient.QueryError as e:
+                error_msg = str(e) or "Error desconocido"
+                self.log_queue.put((f"❌ Error de conexión: {error_msg}", "ERROR"))
+                messagebox.showerror("Error", f"Error de conexión:\n{error_msg}")
             except Exception as e:
                 self.log_queue.put((f"❌ Error al probar conexión: {str(e)}", "ERROR"))
                 messagebox.showerror("Error", f"Error al probar conexión:\n{str(e)}")
@@ -682,6 +808,7 @@ class BackupUI:
         config['max_file_size_gb'] = self.max_file_size_gb_var.get()
         config['split_time_hour'] = self.split_time_hour_var.get()
         config['split_time_minute'] = self.split_time_minute_var.get()
+        config['dedup'] = self.dedup_var.get()
         
         try:
             with open("backup_config.json", "w", encoding="utf-8") as f:
@@ -706,8 +833,13 @@ class BackupUI:
                 self.password_var.set(config.get('PASSWORD', ''))
                 self.db_name_var.set(config.get('DB_NAME', 'helensystem_data'))
                 self.backup_dir_var.set(config.get('BACKUP_DIR', r'C:\ruta\de\backup'))
+                self.dump_threads_var.set(str(config.get('DUMP_THREADS', 1)))
+                self.compression_var.set(config.get('COMPRESSION') or "ninguna")
+                self.compression_level_var.set(str(config.get('COMPRESSION_LEVEL') or ""))
                 self.interval_hours.set(config.get('interval_hours', '1'))
                 self.interval_minutes.set(config.get('interval_minutes', '0'))
+                self.streaming_var.set(config.get('STREAMING', False))
+                self.skip_unchanged_var.set(config.get('SKIP_UNCHANGED', False))
                 
                 # Configuración del procesador nocturno
                 self.enable_nightly_processor_var.set(config.get('enable_nightly_processor', True))
@@ -716,6 +848,7 @@ class BackupUI:
                 self.max_file_size_gb_var.set(config.get('max_file_size_gb', '1'))
                 self.split_time_hour_var.set(config.get('split_time_hour', '00'))
                 self.split_time_minute_var.set(config.get('split_time_minute', '00'))
+                self.dedup_var.set(config.get('dedup', False))
                 
                 self.add_log("📂 Configuración cargada desde backup_config.json", "SUCCESS")
         except Exception as e:
@@ -812,6 +945,11 @@ class BackupUI:
     
     def stop_automatic_backup(self):
         self.is_running = False
+        
+        # El streaming se detiene aquí mismo para que el procesador nocturno
+        # encuentre el archivo y el estado ya en un checkpoint coherente
+        if self.binlog_streamer:
+            self.binlog_streamer.stop()
         self.start_button.config(state=NORMAL)
         self.stop_button.config(state=DISABLED)
         self.manual_button.config(state=NORMAL)
@@ -834,6 +972,10 @@ class BackupUI:
         self.log_queue.put(("🚀 Ejecutando primer backup...", "INFO"))
         self.perform_backup()
         
+        if self.is_running and self.get_db_config().get('STREAMING'):
+            self.streaming_worker()
+            return
+        
         while self.is_running:
             # Esperar el intervalo, pero verificar cada segundo si debemos parar
             for _ in range(interval_seconds):
@@ -847,6 +989,22 @@ class BackupUI:
         
         self.log_queue.put(("⏹️ Backup automático detenido", "WARNING"))
     
+    def streaming_worker(self):
+        """Mantener el streaming de binlog mientras el backup automático esté activo"""
+        config = self.get_db_config()
+        backup_file, state_file = main.backup_paths(config)
+        
+        self.binlog_streamer = BinlogStreamer(config, backup_file, state_file)
+        self.binlog_streamer.start()
+        self.log_queue.put(("📡 Streaming continuo de binlog activo", "SUCCESS"))
+        
+        while self.is_running:
+            time.sleep(1)
+        
+        self.binlog_streamer.stop()
+        self.binlog_streamer = None
+        self.log_queue.put(("⏹️ Streaming de binlog detenido", "WARNING"))
+    
     def perform_backup(self):
         try:
             self.backup_in_progress = True  # Marcar que el backup está en progreso
@@ -955,7 +1113,8 @@ class BackupUI:
             processor_config.update({
                 'DAILY_BACKUP_DIR': daily_dir,
                 'MAX_FILE_SIZE_GB': max_size,
-                'SPLIT_TIME': split_time
+                'SPLIT_TIME': split_time,
+                'DEDUP': self.dedup_var.get()
             })
             
             # Crear y configurar procesador